@@ -38,6 +38,7 @@ def generate_competition_matrix(user_company_domain):
     from extension.drivers.serper_web_search_driver.serper_web_search_driver import (
         SerperWebSearchDriver,
     )
+    from extension.drivers.serper_web_search_driver.serper_cache import default_cache
     from extension.drivers.jina_web_scraper_driver.jina_web_scraper_driver import (
         JinaWebScraperDriver,
     )
@@ -75,7 +76,9 @@ def generate_competition_matrix(user_company_domain):
 
     web_search_tool = WebSearchTool(
         web_search_driver=SerperWebSearchDriver(
-            api_key=os.getenv("SERPER_API_KEY"), type="search"
+            api_key=os.getenv("SERPER_API_KEY"),
+            type="search",
+            cache=default_cache(),
         )
     )
     web_scraper_tool = WebScraperTool(
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import weakref
+from typing import Optional
+
+import aiohttp
+from aiolimiter import AsyncLimiter
+from attrs import Factory, define, field
+
+from extension.drivers.serper_web_search_driver.serper_session import (
+    RETRY_STATUS_CODES,
+    SERPER_BASE_URL,
+    SerperConnectionError,
+    SerperTimeoutError,
+    backoff_delay,
+    error_for_status,
+)
+from extension.drivers.serper_web_search_driver.serper_web_search_driver import (
+    SerperWebSearchDriver,
+    normalize_results,
+)
+
+
+@define
+class AsyncSerperSession:
+    """asyncio counterpart of SerperSession, limited in rate and concurrency.
+
+    aiohttp sessions and limiters belong to one event loop, so one set is
+    kept per loop that uses the session: requests_per_minute and
+    concurrency apply to each loop separately, not to the process. Use it
+    as an async context manager, or await aclose(), to close the
+    connections of the running loop.
+
+    Attributes:
+        api_key: Serper API key.
+        base_url: Serper API root the endpoints are appended to.
+        connect_timeout: Seconds to wait for the connection to open.
+        read_timeout: Seconds to wait for the response once connected.
+        max_retries: Retries after a 429, a 5xx, a timeout or a dropped connection.
+        backoff_base: Seconds of the first retry delay, doubled on every retry.
+        backoff_max: Upper bound of a single retry delay.
+        requests_per_minute: Requests started per minute on one event loop.
+        concurrency: Requests in flight at once on one event loop.
+    """
+
+    api_key: str = field(kw_only=True)
+    base_url: str = field(default=SERPER_BASE_URL, kw_only=True)
+    connect_timeout: float = field(default=5.0, kw_only=True)
+    read_timeout: float = field(default=30.0, kw_only=True)
+    max_retries: int = field(default=3, kw_only=True)
+    backoff_base: float = field(default=0.5, kw_only=True)
+    backoff_max: float = field(default=20.0, kw_only=True)
+    requests_per_minute: int = field(default=300, kw_only=True)
+    concurrency: int = field(default=10, kw_only=True)
+    _clients: weakref.WeakKeyDictionary = field(
+        factory=weakref.WeakKeyDictionary, init=False
+    )
+
+    def _client(self) -> tuple[aiohttp.ClientSession, AsyncLimiter, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client[0].closed:
+            client = (
+                aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=self.concurrency),
+                    timeout=aiohttp.ClientTimeout(
+                        sock_connect=self.connect_timeout, sock_read=self.read_timeout
+                    ),
+                ),
+                AsyncLimiter(self.requests_per_minute, 60),
+                asyncio.Semaphore(self.concurrency),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def post(self, endpoint: str, payload) -> dict | list:
+        """POST a JSON payload to a Serper endpoint and return the decoded body"""
+        session, limiter, semaphore = self._client()
+        url = f"{self.base_url}/{endpoint}"
+        headers = {"X-API-KEY": self.api_key, "Content-Type": "application/json"}
+        data = json.dumps(payload)
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                async with semaphore:
+                    await limiter.acquire()
+                    async with session.post(
+                        url, headers=headers, data=data
+                    ) as response:
+                        if response.status == 200:
+                            return await response.json(content_type=None)
+                        error = error_for_status(
+                            response.status, response.reason, response.headers
+                        )
+            except asyncio.TimeoutError as e:
+                error = SerperTimeoutError(f"Serper request timed out: {e!r}")
+            except aiohttp.ClientError as e:
+                error = SerperConnectionError(f"Could not connect to Serper: {e}")
+            else:
+                if error.status_code not in RETRY_STATUS_CODES:
+                    raise error
+                retry_after = getattr(error, "retry_after", None)
+
+            if attempt == self.max_retries:
+                raise error
+            delay = backoff_delay(
+                attempt, self.backoff_base, self.backoff_max, retry_after
+            )
+            logging.warning(f"{error}; retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        """Close the aiohttp session of the running loop"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client[0].close()
+
+    async def __aenter__(self) -> AsyncSerperSession:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+
+@define
+class AsyncSerperWebSearchDriver(SerperWebSearchDriver):
+    """SerperWebSearchDriver whose requests run on asyncio.
+
+    Await asearch / asearch_many from async code to run many searches
+    concurrently. The synchronous search and search_many of
+    BaseWebSearchDriver still work: they run on a private event loop in a
+    background thread, so they can be called from any thread, including
+    one that is already running a loop.
+
+    Rate and concurrency limits hold per event loop (see AsyncSerperSession).
+    From async code, use the driver as an async context manager to close
+    its connections on the way out:
+
+        async with AsyncSerperWebSearchDriver(api_key=key) as driver:
+            results = await driver.asearch_many(queries)
+
+    close() does the same for the background loop of the synchronous methods.
+    """
+
+    requests_per_minute: int = field(default=300, kw_only=True)
+    concurrency: int = field(default=10, kw_only=True)
+    async_session: AsyncSerperSession = field(
+        default=Factory(
+            lambda self: AsyncSerperSession(
+                api_key=self.api_key,
+                read_timeout=self.timeout,
+                max_retries=self.max_retries,
+                requests_per_minute=self.requests_per_minute,
+                concurrency=self.concurrency,
+            ),
+            takes_self=True,
+        ),
+        kw_only=True,
+    )
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, init=False)
+    _loop_lock: threading.Lock = field(factory=threading.Lock, init=False)
+
+    async def _off_loop(self, function, *args):
+        """Call a cache helper, in a thread if the cache has a disk tier"""
+        if self.cache is not None and self.cache.blocking:
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+
+    async def asearch(self, query: str, **kwargs) -> list[dict]:
+        search_type = self._search_type()
+        payload = self._build_payload(query, **kwargs)
+
+        cached = await self._off_loop(self._get_cached, search_type, payload)
+        if cached is not None:
+            return cached
+
+        data = await self.async_session.post(search_type, payload)
+        results = normalize_results(search_type, data)
+
+        await self._off_loop(self._set_cached, search_type, payload, results)
+        return results
+
+    async def asearch_many(self, queries: list[str], **kwargs) -> dict[str, list[dict]]:
+        """search_many with the batches sent concurrently"""
+        search_type = self._search_type()
+        payloads = self._build_payloads(queries, **kwargs)
+        results, pending = await self._off_loop(
+            self._split_cached, search_type, payloads
+        )
+
+        chunks = self._chunks(pending)
+        responses = await asyncio.gather(
+            *(
+                self.async_session.post(search_type, [payloads[q] for q in chunk])
+                for chunk in chunks
+            )
+        )
+        for chunk, chunk_responses in zip(chunks, responses):
+            await self._off_loop(
+                self._store_batch,
+                search_type,
+                payloads,
+                chunk,
+                chunk_responses,
+                results,
+            )
+
+        return {query: results[query] for query in payloads}
+
+    async def __aenter__(self) -> AsyncSerperWebSearchDriver:
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.async_session.aclose()
+
+    def search_many(self, queries: list[str], **kwargs) -> dict[str, list[dict]]:
+        return self._run(self.asearch_many(queries, **kwargs))
+
+    def _search_serper(self, query: str, **kwargs) -> list[dict]:
+        return self._run(self.asearch(query, **kwargs))
+
+    def _run(self, coroutine):
+        """Run a coroutine to completion on the driver's background loop"""
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever,
+                    name="serper-search-loop",
+                    daemon=True,
+                ).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self) -> None:
+        """Close the connections opened by the synchronous interface"""
+        if self._loop is not None:
+            self._run(self.async_session.aclose())
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from attrs import Factory, define, field
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# How long results stay fresh per search type; news moves fast, places rarely
+TYPE_TTLS = {
+    "news": 2 * HOUR,
+    "search": DAY,
+    "images": 7 * DAY,
+    "patents": 30 * DAY,
+    "places": 30 * DAY,
+}
+# A date-restricted query (tbs=qdr:<range>) is only as fresh as its window
+DATE_RANGE_TTLS = {
+    "h": 10 * MINUTE,
+    "d": HOUR,
+    "w": 6 * HOUR,
+    "m": DAY,
+    "y": 7 * DAY,
+}
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "serper", "results.sqlite3"
+)
+
+_default_cache: Optional[SerperResultCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def ttl_for(search_type: str, date_range: Optional[str] = None) -> int:
+    """Seconds a result of this search type and date range stays fresh"""
+    ttl = TYPE_TTLS.get(search_type, DAY)
+    if date_range:
+        ttl = min(ttl, DATE_RANGE_TTLS.get(date_range[0], ttl))
+    return ttl
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def cache_key(search_type: str, payload: dict) -> str:
+    """Key of a Serper request: its type plus the payload with the query normalized"""
+    normalized = {**payload, "q": normalize_query(payload.get("q", ""))}
+    normalized.setdefault("num", 10)
+    encoded = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(f"{search_type}\x00{encoded}".encode("utf-8")).hexdigest()
+
+
+@define
+class CacheMetrics:
+    hits: int = field(default=0)
+    misses: int = field(default=0)
+    stores: int = field(default=0)
+    # Hits per tier, by backend class name
+    tier_hits: dict = field(factory=dict)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": round(self.hit_rate, 3),
+            "tier_hits": dict(self.tier_hits),
+        }
+
+
+@define
+class MemoryCacheBackend:
+    """In-process LRU tier"""
+
+    # Lookups never wait on I/O
+    blocking = False
+
+    max_entries: int = field(default=1024, kw_only=True)
+    _entries: OrderedDict = field(factory=OrderedDict, init=False)
+    _lock: threading.Lock = field(factory=threading.Lock, init=False)
+
+    def get(self, key: str) -> Optional[tuple[list, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, results: list, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (results, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@define
+class SqliteCacheBackend:
+    """On-disk tier shared between runs"""
+
+    blocking = True
+
+    path: str = field(default=DEFAULT_CACHE_PATH, kw_only=True)
+    _connection: sqlite3.Connection = field(default=None, init=False)
+    _lock: threading.Lock = field(factory=threading.Lock, init=False)
+
+    def __attrs_post_init__(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS serper_results ("
+                "key TEXT PRIMARY KEY, results TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            # Expired rows are only dropped here, so lookups stay a single read
+            self._connection.execute(
+                "DELETE FROM serper_results WHERE expires_at <= ?", (time.time(),)
+            )
+
+    def get(self, key: str) -> Optional[tuple[list, float]]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT results, expires_at FROM serper_results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, results: list, expires_at: float) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO serper_results VALUES (?, ?, ?)",
+                (key, json.dumps(results), expires_at),
+            )
+
+
+@define
+class SerperResultCache:
+    """Normalized Serper results looked up tier by tier, fastest first.
+
+    A hit in a slower tier is copied into the faster ones with its
+    remaining lifetime.
+    """
+
+    backends: list = field(factory=lambda: [MemoryCacheBackend()], kw_only=True)
+    metrics: CacheMetrics = field(default=Factory(CacheMetrics), kw_only=True)
+
+    @property
+    def blocking(self) -> bool:
+        """Whether lookups do I/O, so async callers should run them in a thread"""
+        return any(getattr(backend, "blocking", True) for backend in self.backends)
+
+    def get(self, key: str) -> Optional[list]:
+        for index, backend in enumerate(self.backends):
+            entry = backend.get(key)
+            if entry is None:
+                continue
+            results, expires_at = entry
+            for faster in self.backends[:index]:
+                faster.set(key, results, expires_at)
+            tier = type(backend).__name__
+            self.metrics.hits += 1
+            self.metrics.tier_hits[tier] = self.metrics.tier_hits.get(tier, 0) + 1
+            return results
+        self.metrics.misses += 1
+        return None
+
+    def set(self, key: str, results: list, ttl: int) -> None:
+        expires_at = time.time() + ttl
+        for backend in self.backends:
+            backend.set(key, results, expires_at)
+        self.metrics.stores += 1
+
+
+def default_cache() -> SerperResultCache:
+    """The process-wide memory and SQLite cache; SERPER_CACHE_PATH moves the file"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SerperResultCache(
+                backends=[
+                    MemoryCacheBackend(),
+                    SqliteCacheBackend(
+                        path=os.getenv("SERPER_CACHE_PATH", DEFAULT_CACHE_PATH)
+                    ),
+                ]
+            )
+        return _default_cache
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import json
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from griptape.utils import import_optional_dependency
+
+# Query parameters that only identify the campaign or click, never the page
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "yclid",
+    "igshid",
+    "mc_cid",
+    "mc_eid",
+    "_hsenc",
+    "_hsmi",
+    "mkt_tok",
+    "ref_src",
+    "cmpid",
+    "ncid",
+    "guccounter",
+    "guce_referrer",
+    "guce_referrer_sig",
+}
+TRACKING_PREFIXES = ("utm_",)
+# Host prefixes of mobile and AMP mirrors of the same page
+MIRROR_HOST_PREFIXES = ("www.", "m.", "mobile.", "amp.")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def strip_tracking_params(url: str) -> str:
+    """The URL without tracking parameters and fragment, otherwise as given"""
+    parts = urlsplit(url)
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name)
+    ]
+    return urlunsplit(parts._replace(query=urlencode(query), fragment=""))
+
+
+def strip_mirror_prefix(host: str) -> str:
+    """Drop a www./m./amp. prefix, unless it is part of the site's own domain"""
+    for prefix in MIRROR_HOST_PREFIXES:
+        if host.startswith(prefix):
+            rest = host[len(prefix) :]
+            # amp.dev or m.com are sites of their own, not mirrors of dev or com
+            if _domain_extractor()(rest).registered_domain:
+                return rest
+            break
+    return host
+
+
+@lru_cache(maxsize=8192)
+def canonicalize_url(url: str) -> str:
+    """Key under which mirrors and tracked variants of one page compare equal"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+
+    host = strip_mirror_prefix((parts.hostname or "").lower())
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or "/"
+    if path.endswith("/amp") or path.endswith("/amp/"):
+        path = path[: path.rindex("/amp")] or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name) and name.lower() != "amp"
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+@lru_cache(maxsize=1)
+def _domain_extractor():
+    tldextract = import_optional_dependency("tldextract")
+    # Use the bundled public suffix list instead of fetching it
+    return tldextract.TLDExtract(suffix_list_urls=())
+
+
+def registrable_domain(url: str) -> str:
+    """The domain a site registered, e.g. bbc.co.uk for news.bbc.co.uk"""
+    extracted = _domain_extractor()(url)
+    return extracted.registered_domain or extracted.domain or urlsplit(url).netloc
+
+
+def result_url(result: dict) -> Optional[str]:
+    # Images link to their page under "link" rather than "url"
+    return result.get("url") or result.get("link")
+
+
+def result_key(result: dict) -> str:
+    """What makes two normalized results the same result"""
+    # Places share websites across branches, so they are told apart by cid
+    if result.get("cid"):
+        return f"cid:{result['cid']}"
+    url = result_url(result)
+    if url:
+        return canonicalize_url(url)
+    return json.dumps(result, sort_keys=True)
+
+
+def merge_results(results_by_query: dict[str, list[dict]]) -> list[dict]:
+    """Collapse duplicates across the results of several queries.
+
+    Each result is kept once, in first-seen order, with its URL stripped
+    of tracking parameters, its best position and the queries that
+    returned it.
+    """
+    merged = {}
+    for query, results in results_by_query.items():
+        for result in results:
+            key = result_key(result)
+            existing = merged.get(key)
+            if existing is None:
+                existing = dict(result)
+                for field in ("url", "link"):
+                    if existing.get(field):
+                        existing[field] = strip_tracking_params(existing[field])
+                existing["queries"] = []
+                merged[key] = existing
+            elif result.get("position") is not None and (
+                existing.get("position") is None
+                or result["position"] < existing["position"]
+            ):
+                existing["position"] = result["position"]
+            if query not in existing["queries"]:
+                existing["queries"].append(query)
+    return list(merged.values())
+
+
+def group_by_domain(results: list[dict]) -> dict[str, list[dict]]:
+    """Merged results grouped by registrable domain, in first-seen order"""
+    groups = {}
+    for result in results:
+        url = result_url(result) or result.get("website")
+        domain = registrable_domain(url) if url else ""
+        groups.setdefault(domain, []).append(result)
+    return groups
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import logging
+import random
+import threading
+import time
+from typing import Optional
+
+import requests
+from attrs import define, field
+from requests.adapters import HTTPAdapter
+
+SERPER_BASE_URL = "https://google.serper.dev"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+class SerperError(Exception):
+    """Serper request failed"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class SerperAuthError(SerperError):
+    """The API key was rejected (401/403)"""
+
+
+class SerperRateLimitError(SerperError):
+    """Serper answered 429 on every attempt"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message, status_code=429)
+        self.retry_after = retry_after
+
+
+class SerperServerError(SerperError):
+    """Serper answered 5xx on every attempt"""
+
+
+class SerperTimeoutError(SerperError):
+    """Serper did not answer within the timeout on every attempt"""
+
+
+class SerperConnectionError(SerperError):
+    """The connection to Serper failed on every attempt"""
+
+
+def get_session(pool_maxsize: int = 20) -> requests.Session:
+    """The process-wide keep-alive session shared by every Serper driver"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    try:
+        return float(headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+def error_for_status(status_code: int, reason: str, headers) -> SerperError:
+    """Map a non-200 response to its typed error"""
+    message = (
+        f"Serper API returned an error with status code "
+        f"{status_code} and reason '{reason}'"
+    )
+    if status_code in (401, 403):
+        return SerperAuthError(message, status_code=status_code)
+    if status_code == 429:
+        return SerperRateLimitError(message, retry_after=retry_after_seconds(headers))
+    if status_code >= 500:
+        return SerperServerError(message, status_code=status_code)
+    return SerperError(message, status_code=status_code)
+
+
+def backoff_delay(
+    attempt: int, base: float, maximum: float, retry_after: Optional[float] = None
+) -> float:
+    """Full-jitter exponential delay, or the server's Retry-After if given"""
+    if retry_after is not None:
+        return min(retry_after, maximum)
+    return random.uniform(0, min(base * 2**attempt, maximum))
+
+
+@define
+class SerperSession:
+    """POSTs to the Serper API over the shared connection pool.
+
+    Attributes:
+        api_key: Serper API key.
+        connect_timeout: Seconds to wait for the connection to open.
+        read_timeout: Seconds to wait for the response once connected.
+        max_retries: Retries after a 429, a 5xx, a timeout or a dropped connection.
+        backoff_base: Seconds of the first retry delay, doubled on every retry.
+        backoff_max: Upper bound of a single retry delay.
+    """
+
+    api_key: str = field(kw_only=True)
+    connect_timeout: float = field(default=5.0, kw_only=True)
+    read_timeout: float = field(default=30.0, kw_only=True)
+    max_retries: int = field(default=3, kw_only=True)
+    backoff_base: float = field(default=0.5, kw_only=True)
+    backoff_max: float = field(default=20.0, kw_only=True)
+
+    def post(self, endpoint: str, payload) -> dict | list:
+        """POST a JSON payload to a Serper endpoint and return the decoded body"""
+        url = f"{SERPER_BASE_URL}/{endpoint}"
+        headers = {"X-API-KEY": self.api_key, "Content-Type": "application/json"}
+        data = json.dumps(payload)
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = get_session().post(
+                    url,
+                    headers=headers,
+                    data=data,
+                    timeout=(self.connect_timeout, self.read_timeout),
+                )
+            except requests.Timeout as e:
+                error = SerperTimeoutError(f"Serper request timed out: {e}")
+            except requests.ConnectionError as e:
+                error = SerperConnectionError(f"Could not connect to Serper: {e}")
+            else:
+                if response.status_code == 200:
+                    return response.json()
+                error = error_for_status(
+                    response.status_code, response.reason, response.headers
+                )
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise error
+                retry_after = getattr(error, "retry_after", None)
+
+            if attempt == self.max_retries:
+                raise error
+            delay = backoff_delay(
+                attempt, self.backoff_base, self.backoff_max, retry_after
+            )
+            logging.warning(f"{error}; retrying in {delay:.1f}s")
+            time.sleep(delay)
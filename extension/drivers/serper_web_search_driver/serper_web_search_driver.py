@@ -1,13 +1,30 @@
 from __future__ import annotations
 
 import json
-import requests
-from attrs import define, field
+from attrs import Factory, define, field
 from enum import Enum
+from typing import Optional
 
 from griptape.artifacts import ListArtifact, TextArtifact
 from griptape.drivers import BaseWebSearchDriver
 
+from extension.drivers.serper_web_search_driver.serper_cache import (
+    SerperResultCache,
+    cache_key,
+    ttl_for,
+)
+from extension.drivers.serper_web_search_driver.serper_result_merging import (
+    group_by_domain,
+    merge_results,
+)
+from extension.drivers.serper_web_search_driver.serper_session import (
+    SerperError,
+    SerperSession,
+)
+
+# Serper accepts at most this many query objects in one request
+SERPER_MAX_BATCH_SIZE = 100
+
 
 class SerperType(str, Enum):
     SEARCH = "search"
@@ -17,12 +34,132 @@ class SerperType(str, Enum):
     PATENTS = "patents"
 
 
+def normalize_results(search_type: str, data: dict) -> list[dict]:
+    """Flatten one Serper response into the result dicts the driver returns"""
+    results = []
+
+    if search_type == SerperType.SEARCH.value:
+        # Extracting organic results
+        for r in data.get("organic", []):
+            results.append(
+                {
+                    "url": r["link"],
+                    "title": r["title"],
+                    "description": r["snippet"],
+                    "sitelinks": r.get("sitelinks", []),
+                    "position": r.get("position", None),
+                }
+            )
+
+        # Extract knowledge graph if present
+        knowledge_graph = data.get("knowledgeGraph", {})
+        if knowledge_graph:
+            results.append(
+                {
+                    "knowledge_graph": {
+                        "title": knowledge_graph.get("title"),
+                        "type": knowledge_graph.get("type"),
+                        "website": knowledge_graph.get("website"),
+                        "imageUrl": knowledge_graph.get("imageUrl"),
+                        "description": knowledge_graph.get("description"),
+                        "descriptionSource": knowledge_graph.get("descriptionSource"),
+                        "descriptionLink": knowledge_graph.get("descriptionLink"),
+                        "attributes": knowledge_graph.get("attributes", {}),
+                    }
+                }
+            )
+    elif search_type == SerperType.NEWS.value:
+        for r in data.get("news", []):
+            results.append(
+                {
+                    "url": r["link"],
+                    "title": r["title"],
+                    "description": r.get("snippet"),
+                    "date": r.get("date"),
+                    "source": r.get("source"),
+                }
+            )
+    elif search_type == SerperType.PLACES.value:
+        for r in data.get("places", []):
+            results.append(
+                {
+                    "position": r.get("position"),
+                    "title": r.get("title"),
+                    "address": r.get("address"),
+                    "latitude": r.get("latitude"),
+                    "longitude": r.get("longitude"),
+                    "rating": r.get("rating"),
+                    "ratingCount": r.get("ratingCount"),
+                    "category": r.get("category"),
+                    "phoneNumber": r.get("phoneNumber"),
+                    "website": r.get("website"),
+                    "cid": r.get("cid"),
+                }
+            )
+    elif search_type == SerperType.IMAGES.value:
+        for r in data.get("images", []):
+            results.append(
+                {
+                    "title": r.get("title"),
+                    "imageUrl": r.get("imageUrl"),
+                    "imageWidth": r.get("imageWidth"),
+                    "imageHeight": r.get("imageHeight"),
+                    "thumbnailUrl": r.get("thumbnailUrl"),
+                    "thumbnailWidth": r.get("thumbnailWidth"),
+                    "thumbnailHeight": r.get("thumbnailHeight"),
+                    "source": r.get("source"),
+                    "domain": r.get("domain"),
+                    "link": r.get("link"),
+                    "googleUrl": r.get("googleUrl"),
+                    "position": r.get("position"),
+                }
+            )
+    elif search_type == SerperType.PATENTS.value:
+        for r in data.get("organic", []):
+            results.append(
+                {
+                    "title": r.get("title"),
+                    "description": r.get("snippet"),
+                    "url": r.get("link"),
+                    "priorityDate": r.get("priorityDate"),
+                    "filingDate": r.get("filingDate"),
+                    "grantDate": r.get("grantDate"),
+                    "publicationDate": r.get("publicationDate"),
+                    "inventor": r.get("inventor"),
+                    "assignee": r.get("assignee"),
+                    "publicationNumber": r.get("publicationNumber"),
+                    "language": r.get("language"),
+                    "thumbnailUrl": r.get("thumbnailUrl"),
+                    "pdfUrl": r.get("pdfUrl"),
+                    "figures": r.get("figures", []),
+                    "position": r.get("position"),
+                }
+            )
+
+    return results
+
+
 @define
 class SerperWebSearchDriver(BaseWebSearchDriver):
     api_key: str = field(kw_only=True)
     type: str = field(default="search", kw_only=True)
     date_range: str = field(default=None, kw_only=True)
     num: int = field(default=10, kw_only=True)  # Default to 10 results
+    timeout: float = field(default=30.0, kw_only=True)
+    max_retries: int = field(default=3, kw_only=True)
+    session: SerperSession = field(
+        default=Factory(
+            lambda self: SerperSession(
+                api_key=self.api_key,
+                read_timeout=self.timeout,
+                max_retries=self.max_retries,
+            ),
+            takes_self=True,
+        ),
+        kw_only=True,
+    )
+    cache: Optional[SerperResultCache] = field(default=None, kw_only=True)
+    batch_size: int = field(default=SERPER_MAX_BATCH_SIZE, kw_only=True)
 
     def search(self, query: str, **kwargs) -> ListArtifact:
         return ListArtifact(
@@ -32,15 +169,40 @@ class SerperWebSearchDriver(BaseWebSearchDriver):
             ]
         )
 
-    def _search_serper(self, query: str, **kwargs) -> list[dict]:
+    def search_many(self, queries: list[str], **kwargs) -> dict[str, list[dict]]:
+        """Search several queries, sending the uncached ones in batched requests.
+
+        Returns the normalized results of each distinct query, in the order given.
+        """
+        search_type = self._search_type()
+        payloads = self._build_payloads(queries, **kwargs)
+        results, pending = self._split_cached(search_type, payloads)
+
+        for chunk in self._chunks(pending):
+            responses = self.session.post(search_type, [payloads[q] for q in chunk])
+            self._store_batch(search_type, payloads, chunk, responses, results)
+
+        return {query: results[query] for query in payloads}
+
+    def search_merged(
+        self, queries: list[str], by_domain: bool = False, **kwargs
+    ) -> list[dict] | dict[str, list[dict]]:
+        """search_many with duplicate pages across the queries collapsed.
+
+        With by_domain, the merged results are grouped by registrable domain.
+        """
+        merged = merge_results(self.search_many(queries, **kwargs))
+        return group_by_domain(merged) if by_domain else merged
+
+    def _search_type(self) -> str:
         # Default to search if type is not a valid SerperType
-        search_type = (
+        return (
             self.type
             if self.type in [t.value for t in SerperType]
             else SerperType.SEARCH.value
         )
-        url = f"https://google.serper.dev/{search_type}"
 
+    def _build_payload(self, query: str, **kwargs) -> dict:
         payload = {"q": query, **kwargs}
 
         # Only add num if it's different from the default
@@ -50,121 +212,73 @@ class SerperWebSearchDriver(BaseWebSearchDriver):
         if self.date_range:
             payload["tbs"] = f"qdr:{self.date_range}"
 
-        headers = {"X-API-KEY": self.api_key, "Content-Type": "application/json"}
+        return payload
 
-        response = requests.request(
-            "POST", url, headers=headers, data=json.dumps(payload)
-        )
+    def _build_payloads(self, queries: list[str], **kwargs) -> dict[str, dict]:
+        return {
+            query: self._build_payload(query, **kwargs)
+            for query in dict.fromkeys(queries)
+        }
+
+    def _split_cached(
+        self, search_type: str, payloads: dict[str, dict]
+    ) -> tuple[dict[str, list[dict]], list[str]]:
+        """Results of the cached queries, and the queries still to send"""
+        results = {}
+        pending = []
+        for query, payload in payloads.items():
+            cached = self._get_cached(search_type, payload)
+            if cached is not None:
+                results[query] = cached
+            else:
+                pending.append(query)
+        return results, pending
+
+    def _chunks(self, queries: list[str]) -> list[list[str]]:
+        return [
+            queries[start : start + self.batch_size]
+            for start in range(0, len(queries), self.batch_size)
+        ]
+
+    def _store_batch(self, search_type, payloads, chunk, responses, results):
+        # Serper answers a batch with one response per query, in order
+        if not isinstance(responses, list):
+            raise SerperError(
+                f"Serper answered a batch of {len(chunk)} queries with "
+                f"{type(responses).__name__} instead of a list"
+            )
+        if len(responses) != len(chunk):
+            raise SerperError(
+                f"Serper returned {len(responses)} responses for a batch of {len(chunk)} queries"
+            )
+        for query, data in zip(chunk, responses):
+            results[query] = normalize_results(search_type, data)
+            self._set_cached(search_type, payloads[query], results[query])
 
-        if response.status_code == 200:
-            data = response.json()
-            results = []
-
-            if search_type == SerperType.SEARCH.value:
-                # Extracting organic results
-                for r in data.get("organic", []):
-                    results.append(
-                        {
-                            "url": r["link"],
-                            "title": r["title"],
-                            "description": r["snippet"],
-                            "sitelinks": r.get("sitelinks", []),
-                            "position": r.get("position", None),
-                        }
-                    )
-
-                # Extract knowledge graph if present
-                knowledge_graph = data.get("knowledgeGraph", {})
-                if knowledge_graph:
-                    results.append(
-                        {
-                            "knowledge_graph": {
-                                "title": knowledge_graph.get("title"),
-                                "type": knowledge_graph.get("type"),
-                                "website": knowledge_graph.get("website"),
-                                "imageUrl": knowledge_graph.get("imageUrl"),
-                                "description": knowledge_graph.get("description"),
-                                "descriptionSource": knowledge_graph.get(
-                                    "descriptionSource"
-                                ),
-                                "descriptionLink": knowledge_graph.get(
-                                    "descriptionLink"
-                                ),
-                                "attributes": knowledge_graph.get("attributes", {}),
-                            }
-                        }
-                    )
-            elif search_type == SerperType.NEWS.value:
-                for r in data.get("news", []):
-                    results.append(
-                        {
-                            "url": r["link"],
-                            "title": r["title"],
-                            "description": r.get("snippet"),
-                            "date": r.get("date"),
-                            "source": r.get("source"),
-                        }
-                    )
-            elif search_type == SerperType.PLACES.value:
-                for r in data.get("places", []):
-                    results.append(
-                        {
-                            "position": r.get("position"),
-                            "title": r.get("title"),
-                            "address": r.get("address"),
-                            "latitude": r.get("latitude"),
-                            "longitude": r.get("longitude"),
-                            "rating": r.get("rating"),
-                            "ratingCount": r.get("ratingCount"),
-                            "category": r.get("category"),
-                            "phoneNumber": r.get("phoneNumber"),
-                            "website": r.get("website"),
-                            "cid": r.get("cid"),
-                        }
-                    )
-            elif search_type == SerperType.IMAGES.value:
-                for r in data.get("images", []):
-                    results.append(
-                        {
-                            "title": r.get("title"),
-                            "imageUrl": r.get("imageUrl"),
-                            "imageWidth": r.get("imageWidth"),
-                            "imageHeight": r.get("imageHeight"),
-                            "thumbnailUrl": r.get("thumbnailUrl"),
-                            "thumbnailWidth": r.get("thumbnailWidth"),
-                            "thumbnailHeight": r.get("thumbnailHeight"),
-                            "source": r.get("source"),
-                            "domain": r.get("domain"),
-                            "link": r.get("link"),
-                            "googleUrl": r.get("googleUrl"),
-                            "position": r.get("position"),
-                        }
-                    )
-            elif search_type == SerperType.PATENTS.value:
-                for r in data.get("organic", []):
-                    results.append(
-                        {
-                            "title": r.get("title"),
-                            "description": r.get("snippet"),
-                            "url": r.get("link"),
-                            "priorityDate": r.get("priorityDate"),
-                            "filingDate": r.get("filingDate"),
-                            "grantDate": r.get("grantDate"),
-                            "publicationDate": r.get("publicationDate"),
-                            "inventor": r.get("inventor"),
-                            "assignee": r.get("assignee"),
-                            "publicationNumber": r.get("publicationNumber"),
-                            "language": r.get("language"),
-                            "thumbnailUrl": r.get("thumbnailUrl"),
-                            "pdfUrl": r.get("pdfUrl"),
-                            "figures": r.get("figures", []),
-                            "position": r.get("position"),
-                        }
-                    )
-
-            return results
-        else:
-            raise Exception(
-                f"Serper API returned an error with status code "
-                f"{response.status_code} and reason '{response.reason}'",
+    def _get_cached(self, search_type: str, payload: dict) -> Optional[list[dict]]:
+        if self.cache is None:
+            return None
+        return self.cache.get(cache_key(search_type, payload))
+
+    def _set_cached(self, search_type: str, payload: dict, results: list[dict]):
+        if self.cache is not None:
+            self.cache.set(
+                cache_key(search_type, payload),
+                results,
+                ttl_for(search_type, self.date_range),
             )
+
+    def _search_serper(self, query: str, **kwargs) -> list[dict]:
+        search_type = self._search_type()
+        payload = self._build_payload(query, **kwargs)
+
+        cached = self._get_cached(search_type, payload)
+        if cached is not None:
+            return cached
+
+        # Raises a SerperError once retries on 429/5xx are exhausted
+        data = self.session.post(search_type, payload)
+        results = normalize_results(search_type, data)
+
+        self._set_cached(search_type, payload, results)
+        return results
@@ -0,0 +1,65 @@
+from __future__ import annotations
+from griptape.artifacts import TextArtifact, ErrorArtifact, ListArtifact
+from griptape.tools import BaseTool
+from griptape.utils.decorators import activity
+from schema import Schema, Literal
+from attr import define, field
+import json
+import logging
+
+from extension.drivers.serper_web_search_driver.serper_web_search_driver import (
+    SerperWebSearchDriver,
+)
+
+
+@define
+class MultiWebSearchTool(BaseTool):
+    web_search_driver: SerperWebSearchDriver = field(kw_only=True)
+    # Collapse pages found by several queries into one result
+    merge_results: bool = field(default=True, kw_only=True)
+    group_by_domain: bool = field(default=False, kw_only=True)
+
+    @activity(
+        config={
+            "description": "Can be used for searching the web for several queries at once. Prefer this over searching one query at a time",
+            "schema": Schema(
+                {
+                    Literal(
+                        "queries",
+                        description="Search engine requests, each returning a list of pages with titles, descriptions, and URLs",
+                    ): [str]
+                }
+            ),
+        }
+    )
+    def search_many(self, params: dict) -> ListArtifact | ErrorArtifact:
+        queries = params["values"].get("queries", [])
+        if not queries:
+            return ErrorArtifact("At least one query must be provided")
+
+        try:
+            if self.merge_results:
+                results = self.web_search_driver.search_merged(
+                    queries, by_domain=self.group_by_domain
+                )
+            else:
+                results = self.web_search_driver.search_many(queries)
+        except Exception as e:
+            logging.error(f"Error searching {len(queries)} queries: {e}")
+            return ErrorArtifact(f"Error searching {len(queries)} queries: {e}")
+
+        if self.merge_results and self.group_by_domain:
+            return ListArtifact(
+                [
+                    TextArtifact(json.dumps({"domain": domain, "results": group}))
+                    for domain, group in results.items()
+                ]
+            )
+        if self.merge_results:
+            return ListArtifact([TextArtifact(json.dumps(r)) for r in results])
+        return ListArtifact(
+            [
+                TextArtifact(json.dumps({"query": query, "results": query_results}))
+                for query, query_results in results.items()
+            ]
+        )
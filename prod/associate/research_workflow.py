@@ -22,6 +22,7 @@ from extension.drivers.jina_web_scraper_driver.jina_web_scraper_driver import (
 from extension.drivers.serper_web_search_driver.serper_web_search_driver import (
     SerperWebSearchDriver,
 )
+from extension.drivers.serper_web_search_driver.serper_cache import default_cache
 from griptape.drivers import AnthropicPromptDriver, OpenAiChatPromptDriver
 from griptape.tasks import PromptTask
 from griptape.rules import Ruleset, Rule
@@ -59,7 +60,9 @@ user_information_selected = next(
 # ---- Drivers ----
 
 web_search_tool = WebSearchTool(
-    web_search_driver=SerperWebSearchDriver(api_key=os.getenv("SERPER_API_KEY"))
+    web_search_driver=SerperWebSearchDriver(
+        api_key=os.getenv("SERPER_API_KEY"), cache=default_cache()
+    )
 )
 
 web_scraper_tool = WebScraperTool(
@@ -30,10 +30,12 @@ from griptape.structures import Agent, Pipeline, Workflow
 from extension.drivers.serper_web_search_driver.serper_web_search_driver import (
     SerperWebSearchDriver,
 )
+from extension.drivers.serper_web_search_driver.serper_cache import default_cache
 from extension.drivers.jina_web_scraper_driver.jina_web_scraper_driver import (
     JinaWebScraperDriver,
 )
 from extension.tools.apollo.apollo_tool import ApolloClient
+from extension.tools.multi_web_search.multi_web_search_tool import MultiWebSearchTool
 
 from griptape.utils import StructureVisualizer
 from griptape.configs import Defaults
@@ -81,7 +83,9 @@ Defaults.drivers_config = OpenAiDriversConfig(
 )
 
 web_search_tool = WebSearchTool(
-    web_search_driver=SerperWebSearchDriver(api_key=os.getenv("SERPER_API_KEY"))
+    web_search_driver=SerperWebSearchDriver(
+        api_key=os.getenv("SERPER_API_KEY"), cache=default_cache()
+    )
 )
 
 web_scraper_tool = WebScraperTool(
@@ -301,6 +305,7 @@ search_task = PromptTask(
     input="""
     Use the following search queries to find information about the user's prompt.  
 Search queries suggested: {{parent_outputs['analysis_task']}}
+Search all of the suggested queries together in one multi-query search.
 
 When processing these queries:
 1. Focus on finding concrete, actionable business signals
@@ -329,9 +334,12 @@ Important guidelines:
     """,
     id="search_task",
     tools=[
-        WebSearchTool(
+        MultiWebSearchTool(
             web_search_driver=SerperWebSearchDriver(
-                api_key=os.getenv("SERPER_API_KEY"), num=75, date_range="w"
+                api_key=os.getenv("SERPER_API_KEY"),
+                num=75,
+                date_range="w",
+                cache=default_cache(),
             )
         )
     ],
@@ -418,3 +426,9 @@ if "structure_task" in output_data["analysis_results"]:
     )
     rprint(f"\n[green]Analysis results saved to: {output_file}[/green]")
     rprint(f"[yellow]Found {signals_count} signals based on your search query[/yellow]")
+
+search_cache_metrics = default_cache().metrics
+rprint(
+    f"[yellow]Search cache: {search_cache_metrics.hits} hits, "
+    f"{search_cache_metrics.misses} misses ({search_cache_metrics.hit_rate:.0%})[/yellow]"
+)
@@ -0,0 +1,37 @@
+import re
+from email.utils import getaddresses
+from functools import lru_cache
+
+EMAIL_PATTERN = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+
+
+def extract_email_addresses(text):
+    """Extract email addresses from text strings"""
+    if not text:
+        return []
+    return EMAIL_PATTERN.findall(text)
+
+
+@lru_cache(maxsize=65536)
+def parse_addresses(header_value):
+    """Parse an address header into (name, lower-cased email) pairs.
+
+    Cached per header string, since the same From/To values recur across
+    every message of a thread.
+    """
+    if not header_value:
+        return ()
+    pairs = tuple(
+        (name, address.lower())
+        for name, address in getaddresses([header_value])
+        if "@" in address
+    )
+    if pairs or "@" not in header_value:
+        return pairs
+    # getaddresses gave up on a malformed header; salvage bare addresses
+    return tuple(("", address.lower()) for address in EMAIL_PATTERN.findall(header_value))
+
+
+def parse_address_list(header_value):
+    """Parse an address header into a fresh list of (name, email) pairs"""
+    return list(parse_addresses(header_value))
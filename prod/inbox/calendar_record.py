@@ -0,0 +1,191 @@
+import json
+from datetime import datetime, timedelta
+
+from address_parsing import extract_email_addresses
+from date_parsing import parse_datetime, to_utc
+
+
+def normalize_datetime(dt_str):
+    """Convert various datetime formats to ISO format"""
+    if not dt_str:
+        return None
+
+    dt = parse_datetime(dt_str)
+    return dt.isoformat() if dt is not None else dt_str
+
+
+def event_status_for(start, now):
+    """Classify an event start time relative to now"""
+    event_status = "upcoming"
+    event_start = parse_datetime(start)
+    if event_start is None:
+        return event_status
+
+    # All-day events have naive dates; compare everything in UTC
+    event_start = to_utc(event_start)
+    now = to_utc(now)
+    if event_start < now:
+        event_status = "past"
+    elif event_start < now + timedelta(days=1):
+        event_status = "today"
+    elif event_start < now + timedelta(days=7):
+        event_status = "this_week"
+    return event_status
+
+
+def starts_within(event, window_start, window_end=None):
+    """Whether an event record starts inside [window_start, window_end].
+
+    Without window_end the window is open towards the future.
+    """
+    start = parse_datetime(event.get("start_time"))
+    if start is None:
+        return False
+    start = to_utc(start)
+    if start < to_utc(window_start):
+        return False
+    return window_end is None or start <= to_utc(window_end)
+
+
+def parse_event(event, calendar_id, calendar_name, now):
+    """Convert a Calendar API event into the event record we store"""
+    # Extract start and end times
+    start = event["start"].get("dateTime", event["start"].get("date"))
+    end = event["end"].get("dateTime", event["end"].get("date"))
+
+    # Normalize to ISO format
+    start_iso = normalize_datetime(start)
+    end_iso = normalize_datetime(end)
+
+    # Extract attendees
+    attendees = event.get("attendees", [])
+
+    # Extract emails from description for better context
+    description = event.get("description", "")
+    emails_in_description = extract_email_addresses(description)
+
+    # Determine event status relative to now
+    event_status = event_status_for(start, now)
+
+    # Create structured event data
+    return {
+        "id": event["id"],
+        "calendar_id": calendar_id,
+        "calendar_name": calendar_name,
+        "summary": event.get("summary", "No title"),
+        "description": description,
+        "location": event.get("location", ""),
+        "start_time": start_iso,
+        "end_time": end_iso,
+        "status": event.get("status", ""),
+        "event_status": event_status,  # relative to current time
+        "attendees": [
+            {
+                "email": attendee.get("email", ""),
+                "response_status": attendee.get("responseStatus", ""),
+                "name": attendee.get("displayName", ""),
+                "organizer": attendee.get("organizer", False),
+                "self": attendee.get("self", False),
+            }
+            for attendee in attendees
+        ],
+        "organizer": {
+            "email": event.get("organizer", {}).get("email", ""),
+            "self": event.get("organizer", {}).get("self", False),
+        },
+        "created": event.get("created", ""),
+        "updated": event.get("updated", ""),
+        "html_link": event.get("htmlLink", ""),
+        "is_recurring": "recurringEventId" in event,
+        "recurring_event_id": event.get("recurringEventId", ""),
+        "related_emails": emails_in_description,
+        "is_all_day": "date" in event.get("start", {})
+        and "dateTime" not in event.get("start", {}),
+    }
+
+
+EVENT_STATUSES = ["past", "today", "this_week", "upcoming"]
+
+# Version 2 stores each event once and the groupings as index lists;
+# files without a format_version hold full event copies in every grouping
+CALENDAR_FORMAT_VERSION = 2
+
+
+def event_date_key(event):
+    """Return the YYYY-MM-DD grouping key of an event"""
+    start = parse_datetime(event.get("start_time"))
+    if start is None:
+        # If date parsing fails, add to 'unknown' category
+        return "unknown"
+    return start.strftime("%Y-%m-%d")
+
+
+def build_calendar_output(all_events, date_range):
+    """Build the calendar_events.json structure from a list of event records"""
+    # Groupings hold positions in the events list instead of event copies
+    events_by_status = {status: [] for status in EVENT_STATUSES}
+    events_by_date = {}
+    for index, event in enumerate(all_events):
+        events_by_status.setdefault(event["event_status"], []).append(index)
+        events_by_date.setdefault(event_date_key(event), []).append(index)
+
+    return {
+        "format_version": CALENDAR_FORMAT_VERSION,
+        "timestamp": datetime.now().isoformat(),
+        "date_range": date_range,
+        "total_events": len(all_events),
+        "events_by_status": events_by_status,
+        "events_by_date": events_by_date,
+        "events": all_events,
+    }
+
+
+class CalendarEvents:
+    """Read access to calendar_events.json in either the old or new layout"""
+
+    def __init__(self, data):
+        self.data = data
+        self.events = data.get("events", [])
+        self._by_status = None
+        self._by_date = None
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def is_indexed(self):
+        return self.data.get("format_version", 1) >= 2
+
+    def _index_groups(self, key):
+        """Return a grouping as event positions, computing it if not stored"""
+        if self.is_indexed and key in self.data:
+            return self.data[key]
+
+        groups = {}
+        for index, event in enumerate(self.events):
+            if key == "events_by_status":
+                group = event.get("event_status", "")
+            else:
+                group = event_date_key(event)
+            groups.setdefault(group, []).append(index)
+        return groups
+
+    def by_status(self, status):
+        """Events with the given relative status (past/today/this_week/upcoming)"""
+        if self._by_status is None:
+            self._by_status = self._index_groups("events_by_status")
+        return [self.events[i] for i in self._by_status.get(status, [])]
+
+    def by_date(self, date_key):
+        """Events starting on a YYYY-MM-DD date"""
+        if self._by_date is None:
+            self._by_date = self._index_groups("events_by_date")
+        return [self.events[i] for i in self._by_date.get(date_key, [])]
+
+    def dates(self):
+        """Every date that has at least one event"""
+        if self._by_date is None:
+            self._by_date = self._index_groups("events_by_date")
+        return sorted(self._by_date)
@@ -1,43 +1,324 @@
+import argparse
+import hashlib
 import json
 import os
+from itertools import chain
 from datetime import datetime, timezone
-from dateutil import parser
-import re
+from address_parsing import extract_email_addresses
+from calendar_record import CalendarEvents
+from date_parsing import parse_datetime, to_utc
+from domain_registry import InternalDomainRegistry
+from message_record import ParsedMessage
+from timeline_record import PersonTimeline, build_timeline_output
+
+# Bump when the index layout changes; an index with another version is
+# discarded and the timeline is rebuilt from scratch
+PERSON_INDEX_VERSION = 3
+
+# The tenant whose mailbox the timeline is built from
+DEFAULT_COMPANY = "GodmodeHQ"
+
+
+def interaction_fingerprint(interaction, names):
+    """Hash an interaction and the people it is applied to"""
+    payload = json.dumps([interaction, names], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def insert_newest_first(interaction_ids, key, interactions):
+    """Insert an interaction key into a list kept newest first"""
+    # Equal timestamps are ordered by key, so the order does not depend on
+    # which run applied them
+    position = (interactions[key]["timestamp"], key)
+    lo, hi = 0, len(interaction_ids)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        other = interaction_ids[mid]
+        if (interactions[other]["timestamp"], other) > position:
+            lo = mid + 1
+        else:
+            hi = mid
+    interaction_ids.insert(lo, key)
 
 
 class PersonTimelineCreator:
-    def __init__(self):
+    def __init__(self, company=DEFAULT_COMPANY, domain_registry=None):
         # Get the directory where this script is located
         script_dir = os.path.dirname(os.path.abspath(__file__))
+        project_root = os.path.dirname(os.path.dirname(script_dir))
 
         # Define file paths relative to the script location
         self.email_file = os.path.join(script_dir, "primary_emails.json")
         self.calendar_file = os.path.join(script_dir, "calendar_events.json")
         self.output_file = os.path.join(script_dir, "person_timeline.json")
-        self.your_domains = ["troylabs.io", "godmodehq.com"]  # Your email domains
+        self.index_file = os.path.join(script_dir, "person_index.json")
+        self.user_info_file = os.path.join(
+            project_root, "test", "data", "user_information.json"
+        )
+
+        # Your email domains, from the company's user information
+        self.domain_registry = domain_registry or InternalDomainRegistry.load(
+            self.user_info_file, company
+        )
 
     def extract_email_addresses(self, text):
         """Extract email addresses from text strings"""
-        if not text:
-            return []
-        email_pattern = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
-        return re.findall(email_pattern, text)
-
-    def get_email_domain(self, email):
-        """Extract domain from email address"""
-        if not email or "@" not in email:
-            return ""
-        return email.split("@")[1].lower()
+        return extract_email_addresses(text)
 
     def is_your_email(self, email):
         """Check if the email belongs to you"""
-        if not email:
-            return False
-        domain = self.get_email_domain(email)
-        return domain in self.your_domains
+        return self.domain_registry.is_internal(email)
+
+    def empty_index(self):
+        return {
+            "version": PERSON_INDEX_VERSION,
+            "sources": {},
+            "interactions": {},
+            "people": {},
+        }
+
+    def load_index(self):
+        """Load the persisted person index, or start an empty one"""
+        empty = self.empty_index()
+        if not os.path.exists(self.index_file):
+            return empty
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Could not read person index, rebuilding: {e}")
+            return empty
+        if index.get("version") != PERSON_INDEX_VERSION:
+            return empty
+        return index
+
+    def save_index(self, index):
+        """Persist the person index, replacing the file atomically"""
+        tmp_path = f"{self.index_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_file)
+
+    def email_sources(self, email_threads, now):
+        """Yield (source key, interaction, {email: name}) for each past message"""
+        for thread in email_threads:
+            thread_id = thread.get("thread_id")
+            messages = thread.get("messages", [])
+
+            # Skip empty threads
+            if not messages:
+                continue
+
+            # Parse each message once; records written by the fetcher
+            # already carry their epoch timestamp and address lists
+            parsed_messages = [
+                ParsedMessage.from_record(message) for message in messages
+            ]
+
+            # Get all participants in this thread
+            all_participants = set()
+            for parsed in parsed_messages:
+                all_participants.update(parsed.addresses)
+
+            # Remove your own emails from participants
+            external_participants = set()
+            for email in all_participants:
+                if not self.is_your_email(email):
+                    external_participants.add(email)
+
+            # Process each message in the thread
+            for message, parsed in zip(messages, parsed_messages):
+                message_date = message.get("date", "")
+                if parsed.timestamp is None:
+                    print(f"Error parsing date '{message_date}'")
+                    continue
+
+                # Skip future messages (shouldn't exist but just in case)
+                if parsed.timestamp > now.timestamp():
+                    continue
+
+                timestamp = datetime.fromtimestamp(
+                    parsed.timestamp, timezone.utc
+                ).isoformat()
+
+                # Get sender and determine direction
+                sender_email = parsed.sender_email
+                if not sender_email:
+                    continue
+
+                is_inbound = not self.is_your_email(sender_email)
+
+                # Create interaction item
+                interaction = {
+                    "id": message.get("id", ""),
+                    "thread_id": thread_id,
+                    "timestamp": timestamp,
+                    "date": message_date,
+                    "type": "email",
+                    "direction": "inbound" if is_inbound else "outbound",
+                    "subject": message.get("subject", ""),
+                    "body": message.get("body", ""),
+                    "snippet": message.get("snippet", ""),
+                    "from": message.get("from", ""),
+                    "to": message.get("to", ""),
+                    "participants": sorted(all_participants),
+                }
+
+                # The sender's display name is the only name we can infer
+                names = {
+                    email: (parsed.sender_name if email == sender_email else "")
+                    for email in sorted(external_participants)
+                }
+                yield f"email:{interaction['id']}", interaction, names
+
+    def calendar_sources(self, calendar_events, now):
+        """Yield (source key, interaction, {email: name}) for each past event"""
+        for event in calendar_events:
+            event_id = event.get("id", "")
+            summary = event.get("summary", "")
+            description = event.get("description", "")
+            start_time = event.get("start_time", "")
+            end_time = event.get("end_time", "")
+            location = event.get("location", "")
+
+            # Skip events without valid timestamps
+            if not start_time:
+                continue
+
+            # Parse date for sorting
+            parsed_date = parse_datetime(start_time)
+            if parsed_date is None:
+                print(f"Error parsing date '{start_time}'")
+                continue
+
+            # Compare and store in UTC, like email timestamps, so the ISO
+            # strings of both sort in time order
+            parsed_date = to_utc(parsed_date)
+
+            # Skip future events
+            if parsed_date > now:
+                continue
+
+            timestamp = parsed_date.isoformat()
+
+            # Get all attendees' emails
+            attendee_emails = set()
+            for attendee in event.get("attendees", []):
+                if "email" in attendee and attendee["email"]:
+                    email = attendee["email"].lower()
+                    if not self.is_your_email(email):
+                        attendee_emails.add(email)
 
-    def create_person_timeline(self):
-        """Create person-centric timeline of all interactions up to current time"""
+            # Also check description for additional emails
+            description_emails = self.extract_email_addresses(description)
+            for email in description_emails:
+                email = email.lower()
+                if not self.is_your_email(email):
+                    attendee_emails.add(email)
+
+            # Create interaction item
+            interaction = {
+                "id": event_id,
+                "timestamp": timestamp,
+                "date": start_time,
+                "end_time": end_time,
+                "type": "calendar",
+                "summary": summary,
+                "description": description,
+                "location": location,
+                "status": event.get("status", ""),
+                "event_status": event.get("event_status", ""),
+                "attendees": event.get("attendees", []),
+                "organizer": event.get("organizer", {}),
+                "is_all_day": event.get("is_all_day", False),
+            }
+
+            # Use the attendee's display name where the event has one
+            attendee_names = {}
+            for attendee in event.get("attendees", []):
+                email = attendee.get("email", "").lower()
+                if attendee.get("name") and email not in attendee_names:
+                    attendee_names[email] = attendee["name"]
+            names = {
+                email: attendee_names.get(email, "") for email in sorted(attendee_emails)
+            }
+
+            calendar_id = event.get("calendar_id", "")
+            yield f"calendar:{calendar_id}:{event_id}", interaction, names
+
+    def remove_source(self, index, key):
+        """Take a previously applied interaction off every person it was added to"""
+        source = index["sources"].pop(key)
+        interaction = index["interactions"].pop(key, None)
+        if interaction is None:
+            return
+
+        people = index["people"]
+        for email in source["people"]:
+            person = people.get(email)
+            if person is None or key not in person["interaction_ids"]:
+                continue
+
+            interaction_ids = person["interaction_ids"]
+            interaction_ids.remove(key)
+            person["interaction_count"] -= 1
+            if interaction["type"] == "email":
+                person["email_count"] -= 1
+            else:
+                person["event_count"] -= 1
+
+            if interaction_ids:
+                person["last_interaction_date"] = index["interactions"][
+                    interaction_ids[0]
+                ]["timestamp"]
+            else:
+                del people[email]
+
+    def apply_source(self, index, key, fingerprint, interaction, names):
+        """Add an interaction to the timeline of each person it involves"""
+        index["sources"][key] = {"fingerprint": fingerprint, "people": list(names)}
+        if not names:
+            return
+
+        # The interaction is stored once; people only hold its key
+        interactions = index["interactions"]
+        interactions[key] = interaction
+        people = index["people"]
+        for email, name in names.items():
+            if email not in people:
+                # Initialize new person
+                people[email] = {
+                    "email": email,
+                    "name": "",  # Will be filled in later if available
+                    "company": "",  # Will be filled in later if available
+                    "interaction_ids": [],
+                    "last_interaction_date": "",
+                    "interaction_count": 0,
+                    "email_count": 0,
+                    "event_count": 0,
+                }
+
+            person = people[email]
+            insert_newest_first(person["interaction_ids"], key, interactions)
+            person["last_interaction_date"] = interactions[
+                person["interaction_ids"][0]
+            ]["timestamp"]
+            person["interaction_count"] += 1
+            if interaction["type"] == "email":
+                person["email_count"] += 1
+            else:
+                person["event_count"] += 1
+
+            # Update name if it's blank and we can infer it
+            if not person["name"] and name:
+                person["name"] = name
+
+    def create_person_timeline(self, rebuild=False):
+        """Create person-centric timeline of all interactions up to current time.
+
+        Only messages and events that are new, changed or gone since the
+        last run are applied to the persisted person index.
+        """
         try:
             # Load email data
             if not os.path.exists(self.email_file):
@@ -52,238 +333,69 @@ class PersonTimelineCreator:
                 print(f"Calendar file {self.calendar_file} not found!")
                 return
 
-            with open(self.calendar_file, "r", encoding="utf-8") as f:
-                calendar_data = json.load(f)
+            calendar_data = CalendarEvents.load(self.calendar_file)
 
             # Extract threads and events
             email_threads = email_data.get("threads", [])
-            calendar_events = calendar_data.get("events", [])
+            calendar_events = calendar_data.events
 
             # Get current time for filtering future events
             now = datetime.now(timezone.utc)
 
-            # Create a dictionary to hold person data
-            people = {}
-
-            # Process email threads into person data structure
-            print("Processing email threads...")
-            for thread in email_threads:
-                thread_id = thread.get("thread_id")
-                messages = thread.get("messages", [])
-
-                # Skip empty threads
-                if not messages:
+            index = self.empty_index() if rebuild else self.load_index()
+            applied = index["sources"]
+
+            # Fingerprint every current interaction, keeping only the changed ones
+            print("Processing email threads and calendar events...")
+            current = set()
+            changed = []
+            for key, interaction, names in chain(
+                self.email_sources(email_threads, now),
+                self.calendar_sources(calendar_events, now),
+            ):
+                if key in current:
                     continue
-
-                # Get all participants in this thread
-                all_participants = set()
-                for message in messages:
-                    # Extract from 'from' field
-                    from_emails = self.extract_email_addresses(message.get("from", ""))
-                    for email in from_emails:
-                        all_participants.add(email.lower())
-
-                    # Extract from 'to' field
-                    to_emails = self.extract_email_addresses(message.get("to", ""))
-                    for email in to_emails:
-                        all_participants.add(email.lower())
-
-                # Remove your own emails from participants
-                external_participants = set()
-                for email in all_participants:
-                    if not self.is_your_email(email):
-                        external_participants.add(email)
-
-                # Process each message in the thread
-                for message in messages:
-                    message_date = message.get("date", "")
-                    try:
-                        # Parse date for sorting
-                        parsed_date = parser.parse(message_date)
-                        # Make sure parsed_date is timezone-aware
-                        if parsed_date.tzinfo is None:
-                            parsed_date = parsed_date.replace(tzinfo=timezone.utc)
-
-                        # Skip future messages (shouldn't exist but just in case)
-                        if parsed_date > now:
-                            continue
-
-                        timestamp = parsed_date.isoformat()
-                    except Exception as e:
-                        print(f"Error parsing date '{message_date}': {str(e)}")
-                        continue
-
-                    # Get sender and determine direction
-                    sender_emails = self.extract_email_addresses(
-                        message.get("from", "")
-                    )
-                    if not sender_emails:
-                        continue
-
-                    sender_email = sender_emails[0].lower()
-                    is_inbound = not self.is_your_email(sender_email)
-
-                    # Create interaction item
-                    interaction = {
-                        "id": message.get("id", ""),
-                        "thread_id": thread_id,
-                        "timestamp": timestamp,
-                        "date": message_date,
-                        "type": "email",
-                        "direction": "inbound" if is_inbound else "outbound",
-                        "subject": message.get("subject", ""),
-                        "body": message.get("body", ""),
-                        "snippet": message.get("snippet", ""),
-                        "from": message.get("from", ""),
-                        "to": message.get("to", ""),
-                        "participants": list(all_participants),
-                    }
-
-                    # Add this interaction to each external participant's timeline
-                    for email in external_participants:
-                        if email not in people:
-                            # Initialize new person
-                            people[email] = {
-                                "email": email,
-                                "name": "",  # Will be filled in later if available
-                                "company": "",  # Will be filled in later if available
-                                "interactions": [],
-                                "last_interaction_date": "",
-                                "interaction_count": 0,
-                                "email_count": 0,
-                                "event_count": 0,
-                            }
-
-                        # Add interaction to person's timeline
-                        people[email]["interactions"].append(interaction)
-                        people[email]["email_count"] += 1
-                        people[email]["interaction_count"] += 1
-
-                        # Update name if it's blank and we can infer it
-                        if not people[email]["name"]:
-                            from_name = message.get("from", "")
-                            if email in from_name.lower():
-                                name_part = from_name.split("<")[0].strip()
-                                if name_part:
-                                    people[email]["name"] = name_part
-
-            # Process calendar events into person data structure
-            print("Processing calendar events...")
-            for event in calendar_events:
-                event_id = event.get("id", "")
-                summary = event.get("summary", "")
-                description = event.get("description", "")
-                start_time = event.get("start_time", "")
-                end_time = event.get("end_time", "")
-                location = event.get("location", "")
-
-                # Skip events without valid timestamps
-                if not start_time:
+                current.add(key)
+                fingerprint = interaction_fingerprint(interaction, names)
+                if key in applied and applied[key]["fingerprint"] == fingerprint:
                     continue
+                changed.append((key, fingerprint, interaction, names))
 
-                try:
-                    # Parse date for sorting
-                    parsed_date = parser.parse(start_time)
-                    # Make sure parsed_date is timezone-aware
-                    if parsed_date.tzinfo is None:
-                        parsed_date = parsed_date.replace(tzinfo=timezone.utc)
-
-                    # Skip future events
-                    if parsed_date > now:
-                        # Optional: Comment out or remove this line to reduce output noise
-                        # print(f"Skipping future event: {start_time}")
-                        continue
-
-                    timestamp = parsed_date.isoformat()
-                except Exception as e:
-                    print(f"Error parsing date '{start_time}': {str(e)}")
-                    continue
+            removed = [key for key in applied if key not in current]
+            for key in removed:
+                self.remove_source(index, key)
+            for key, fingerprint, interaction, names in changed:
+                if key in applied:
+                    self.remove_source(index, key)
+                self.apply_source(index, key, fingerprint, interaction, names)
 
-                # Get all attendees' emails
-                attendee_emails = set()
-                for attendee in event.get("attendees", []):
-                    if "email" in attendee and attendee["email"]:
-                        email = attendee["email"].lower()
-                        if not self.is_your_email(email):
-                            attendee_emails.add(email)
-
-                # Also check description for additional emails
-                description_emails = self.extract_email_addresses(description)
-                for email in description_emails:
-                    email = email.lower()
-                    if not self.is_your_email(email):
-                        attendee_emails.add(email)
+            print(
+                f"Applied {len(changed)} new or changed and {len(removed)} removed "
+                f"interactions ({len(current) - len(changed)} unchanged)"
+            )
 
-                # Create interaction item
-                interaction = {
-                    "id": event_id,
-                    "timestamp": timestamp,
-                    "date": start_time,
-                    "end_time": end_time,
-                    "type": "calendar",
-                    "summary": summary,
-                    "description": description,
-                    "location": location,
-                    "status": event.get("status", ""),
-                    "event_status": event.get("event_status", ""),
-                    "attendees": event.get("attendees", []),
-                    "organizer": event.get("organizer", {}),
-                    "is_all_day": event.get("is_all_day", False),
-                }
-
-                # Add this interaction to each attendee's timeline
-                for email in attendee_emails:
-                    if email not in people:
-                        # Initialize new person
-                        people[email] = {
-                            "email": email,
-                            "name": "",
-                            "company": "",
-                            "interactions": [],
-                            "last_interaction_date": "",
-                            "interaction_count": 0,
-                            "email_count": 0,
-                            "event_count": 0,
-                        }
-
-                    # Add interaction to person's timeline
-                    people[email]["interactions"].append(interaction)
-                    people[email]["event_count"] += 1
-                    people[email]["interaction_count"] += 1
-
-                    # Update name if we can find it in attendees
-                    if not people[email]["name"]:
-                        for attendee in event.get("attendees", []):
-                            if attendee.get("email", "").lower() == email:
-                                name = attendee.get("name", "")
-                                if name:
-                                    people[email]["name"] = name
-                                    break
-
-            # Sort each person's interactions by timestamp
-            for email, person in people.items():
-                person["interactions"].sort(key=lambda x: x["timestamp"], reverse=True)
-
-                # Update last interaction date
-                if person["interactions"]:
-                    person["last_interaction_date"] = person["interactions"][0][
-                        "timestamp"
-                    ]
+            if not changed and not removed and os.path.exists(self.output_file):
+                print(f"Person timeline is up to date: {self.output_file}")
+                return PersonTimeline.load(self.output_file).data
 
             # Sort people by most recent interaction
-            people_list = list(people.values())
-            people_list.sort(key=lambda x: x["last_interaction_date"], reverse=True)
-
-            # Create final output data structure
-            timeline_data = {
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "total_people": len(people_list),
-                "people": people_list,
-            }
+            people_list = list(index["people"].values())
+            people_list.sort(
+                key=lambda x: (x["last_interaction_date"], x["email"]), reverse=True
+            )
+
+            # Create final output data structure; interactions are written
+            # once and people reference them by key
+            timeline_data = build_timeline_output(
+                people_list,
+                index["interactions"],
+                datetime.now(timezone.utc).isoformat(),
+            )
 
             # Save to file
             with open(self.output_file, "w", encoding="utf-8") as f:
                 json.dump(timeline_data, f, indent=2, ensure_ascii=False)
+            self.save_index(index)
 
             print(f"Successfully created person timeline file: {self.output_file}")
 
@@ -295,9 +407,22 @@ class PersonTimelineCreator:
 
 
 def main():
-    creator = PersonTimelineCreator()
+    arg_parser = argparse.ArgumentParser(description="Build the person timeline")
+    arg_parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Ignore the person index and rebuild every timeline from scratch",
+    )
+    arg_parser.add_argument(
+        "--company",
+        default=DEFAULT_COMPANY,
+        help="Company in user_information.json whose domains are internal",
+    )
+    args = arg_parser.parse_args()
+
+    creator = PersonTimelineCreator(company=args.company)
     try:
-        creator.create_person_timeline()
+        creator.create_person_timeline(rebuild=args.rebuild)
     except Exception as e:
         print(f"Failed to create person timeline: {e}")
         raise
@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+
+from dateutil import parser
+
+
+@lru_cache(maxsize=65536)
+def parse_datetime(value):
+    """Parse an ISO 8601 or RFC 2822 date string, or return None.
+
+    Calendar times are ISO 8601 and Gmail Date headers are RFC 2822, so
+    both get a format-specific parser; dateutil only sees the odd ones out.
+    Results are cached since threads and recurring events repeat dates.
+    """
+    if not value:
+        return None
+
+    # ISO strings start with the year, RFC 2822 ones usually with a weekday
+    if value[0].isdigit():
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        pass
+
+    try:
+        return parser.parse(value)
+    except (ValueError, OverflowError):
+        return None
+
+
+def to_utc(dt):
+    """Return an aware UTC datetime, reading naive values as UTC"""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def parse_epoch(value):
+    """Parse a date string into epoch seconds, or None"""
+    dt = parse_datetime(value)
+    if dt is None:
+        return None
+    return to_utc(dt).timestamp()
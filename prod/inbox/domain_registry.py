@@ -0,0 +1,72 @@
+import json
+from urllib.parse import urlparse
+
+
+def domain_of(value):
+    """Return the lower-cased domain of an email address or website"""
+    if not value:
+        return ""
+    value = value.strip().lower()
+    if "@" in value:
+        return value.rsplit("@", 1)[1].rstrip(".")
+    host = urlparse(value if "//" in value else f"//{value}").hostname or ""
+    return host.removeprefix("www.").rstrip(".")
+
+
+class InternalDomainRegistry:
+    """The email domains of one tenant's own organization.
+
+    Subdomains of a registered domain count as internal, so mail from
+    eu.example.com is a colleague's when example.com is registered.
+    Lookups are memoized per address.
+    """
+
+    def __init__(self, domains=()):
+        self.domains = {domain_of(d) for d in domains if domain_of(d)}
+        self._by_address = {}
+
+    @classmethod
+    def from_user_information(cls, user):
+        """Build the registry from one user_information.json entry.
+
+        The domains of "email", "email_address" and "website" are internal,
+        plus any listed under "domain_aliases".
+        """
+        values = [user.get("email"), user.get("email_address"), user.get("website")]
+        values.extend(user.get("domain_aliases", []))
+        return cls(v for v in values if v)
+
+    @classmethod
+    def load(cls, user_info_path, company):
+        """Load the registry of a company from user_information.json"""
+        with open(user_info_path, "r", encoding="utf-8") as f:
+            users = json.load(f)
+        for user in users:
+            if user.get("company", "").lower() == company.lower():
+                return cls.from_user_information(user)
+        raise ValueError(f"Company {company!r} not found in {user_info_path}")
+
+    def add(self, domain):
+        """Register another internal domain or alias"""
+        domain = domain_of(domain)
+        if domain:
+            self.domains.add(domain)
+            self._by_address.clear()
+
+    def is_internal_domain(self, domain):
+        """Check a domain and each of its parent domains against the set"""
+        labels = domain.split(".")
+        # Stop before the bare TLD so "com" can never match
+        return any(
+            ".".join(labels[i:]) in self.domains for i in range(len(labels) - 1)
+        )
+
+    def is_internal(self, email):
+        """Check if an email address belongs to the organization"""
+        if not email or "@" not in email:
+            return False
+        internal = self._by_address.get(email)
+        if internal is None:
+            internal = self.is_internal_domain(domain_of(email))
+            self._by_address[email] = internal
+        return internal
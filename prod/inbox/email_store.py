@@ -0,0 +1,101 @@
+import json
+import os
+import zlib
+from collections import defaultdict
+
+
+class EmailStore:
+    """Append-only JSON Lines message store, partitioned by thread ID.
+
+    Every message of a thread lands in the same partition file, so threads can
+    be rebuilt one partition at a time without loading the whole mailbox.
+    Records are never rewritten in place: a newer record for the same message
+    ID replaces the older one on read, and a tombstone record removes it.
+    """
+
+    def __init__(self, store_dir="emails", num_partitions=16):
+        self.store_dir = store_dir
+        self.num_partitions = num_partitions
+
+    def partition_path(self, partition):
+        """Return the file path of a partition"""
+        return os.path.join(self.store_dir, f"part-{partition:03d}.jsonl")
+
+    def partition_for(self, thread_id):
+        """Map a thread ID to its partition number"""
+        return zlib.crc32(thread_id.encode("utf-8")) % self.num_partitions
+
+    def exists(self):
+        """Check whether the store has been written before"""
+        return os.path.isdir(self.store_dir) and any(
+            os.path.exists(self.partition_path(p)) for p in range(self.num_partitions)
+        )
+
+    def reset(self):
+        """Remove every partition so a full fetch starts from an empty store"""
+        for partition in range(self.num_partitions):
+            path = self.partition_path(partition)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def append(self, records):
+        """Append message records (each carrying a thread_id) to their partitions"""
+        by_partition = defaultdict(list)
+        for record in records:
+            by_partition[self.partition_for(record["thread_id"])].append(record)
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        for partition, partition_records in by_partition.items():
+            with open(self.partition_path(partition), "a", encoding="utf-8") as f:
+                for record in partition_records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def delete(self, message_id, thread_id):
+        """Record a tombstone for a message"""
+        self.append([{"id": message_id, "thread_id": thread_id, "deleted": True}])
+
+    def read_partition(self, partition):
+        """Return the live records of a partition keyed by message ID"""
+        records = {}
+        path = self.partition_path(partition)
+        if not os.path.exists(path):
+            return records
+
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if record.get("deleted"):
+                    records.pop(record["id"], None)
+                else:
+                    records[record["id"]] = record
+        return records
+
+    def get_thread(self, thread_id):
+        """Return the live messages of a single thread"""
+        records = self.read_partition(self.partition_for(thread_id))
+        return [r for r in records.values() if r["thread_id"] == thread_id]
+
+    def iter_threads(self):
+        """Yield (thread_id, messages) pairs, one partition in memory at a time"""
+        for partition in range(self.num_partitions):
+            threads = defaultdict(list)
+            for record in self.read_partition(partition).values():
+                threads[record["thread_id"]].append(record)
+            yield from threads.items()
+
+    def compact(self):
+        """Rewrite every partition with only its live records"""
+        for partition in range(self.num_partitions):
+            path = self.partition_path(partition)
+            if not os.path.exists(path):
+                continue
+
+            records = self.read_partition(partition)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for record in records.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp_path, path)
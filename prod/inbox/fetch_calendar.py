@@ -1,23 +1,41 @@
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
 import os
 import pickle
-from datetime import datetime, timedelta
+import threading
+from datetime import datetime, timedelta, timezone
 import json
 from typing import List, Dict
 import pytz
-from dateutil import parser
+from address_parsing import extract_email_addresses
+from calendar_record import (
+    build_calendar_output,
+    event_status_for,
+    normalize_datetime,
+    parse_event,
+    starts_within,
+)
 
 
 class CalendarFetcher:
-    def __init__(self):
+    def __init__(self, max_concurrency=8):
         os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
         self.SCOPES = ["https://www.googleapis.com/auth/calendar.readonly"]
         self.creds = None
         self.credentials_file = "client_secrets.json"
         self.output_file = "calendar_events.json"
+        # Every synced event, future ones included; the output is a window of it
+        self.store_file = "calendar_event_store.json"
+        self.sync_state_file = "calendar_sync_state.json"
+        self.max_concurrency = max_concurrency
+        self.service = None
+        self._thread_local = threading.local()
 
     def authenticate(self):
         """Handle Google Calendar authentication using OAuth"""
@@ -52,11 +70,46 @@ class CalendarFetcher:
             print(f"\nAuthentication error: {e}")
             raise
 
-    def list_calendars(self):
-        """List all available calendars"""
+    def get_service(self):
+        """Build the Calendar discovery client once and reuse it"""
+        if self.service is None:
+            self.service = build("calendar", "v3", credentials=self.creds)
+        return self.service
+
+    def get_http(self):
+        """Return an authorized HTTP transport owned by the calling thread"""
+        # The discovery client can be shared across threads, but httplib2
+        # transports cannot, so each worker executes requests on its own
+        http = getattr(self._thread_local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self.creds, http=httplib2.Http())
+            self._thread_local.http = http
+        return http
+
+    def for_each_calendar(self, calendars, fetch):
+        """Run fetch(calendar) concurrently, isolating per-calendar failures"""
+        results = {}
+        if not calendars:
+            return results
+
+        workers = min(self.max_concurrency, len(calendars))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                calendar["id"]: executor.submit(fetch, calendar)
+                for calendar in calendars
+            }
+            for calendar in calendars:
+                try:
+                    results[calendar["id"]] = futures[calendar["id"]].result()
+                except Exception as e:
+                    print(f"Error fetching calendar {calendar['summary']}: {e}")
+        return results
+
+    def list_calendars(self, raise_errors=False):
+        """List all available calendars, or [] on failure unless raise_errors"""
         try:
-            service = build("calendar", "v3", credentials=self.creds)
-            calendars = service.calendarList().list().execute()
+            service = self.get_service()
+            calendars = service.calendarList().list().execute(http=self.get_http())
 
             print("\nAvailable calendars:")
             for calendar in calendars["items"]:
@@ -65,29 +118,212 @@ class CalendarFetcher:
             return calendars["items"]
         except Exception as e:
             print(f"Error fetching calendars: {e}")
+            if raise_errors:
+                raise
             return []
 
     def extract_email_addresses(self, text):
         """Extract email addresses from text strings"""
-        if not text:
-            return []
-
-        # Simple regex-like extraction
-        import re
-
-        email_pattern = r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}"
-        return re.findall(email_pattern, text)
+        return extract_email_addresses(text)
 
     def normalize_datetime(self, dt_str):
         """Convert various datetime formats to ISO format"""
-        if not dt_str:
-            return None
-
+        return normalize_datetime(dt_str)
+
+    def load_sync_state(self):
+        """Load the per-calendar sync tokens"""
+        if not os.path.exists(self.sync_state_file):
+            return {}
+        with open(self.sync_state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_sync_state(self, state):
+        """Persist the per-calendar sync tokens"""
+        with open(self.sync_state_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+
+    def load_events(self):
+        """Load stored events keyed by (calendar_id, event_id)"""
+        if not os.path.exists(self.store_file):
+            return {}
+        with open(self.store_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {(e["calendar_id"], e["id"]): e for e in data.get("events", [])}
+
+    def save_events(self, events):
+        """Write the event store atomically"""
+        tmp_file = self.store_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"events": list(events)}, f, ensure_ascii=False)
+        os.replace(tmp_file, self.store_file)
+
+    def list_events(
+        self,
+        service,
+        calendar_id,
+        sync_token=None,
+        time_min=None,
+        time_max=None,
+        order_by=None,
+    ):
+        """Page through a calendar's events, returning them and the next sync token"""
+        events = []
+        page_token = None
+
+        while True:
+            params = {
+                "calendarId": calendar_id,
+                "singleEvents": True,
+                "maxResults": 2500,
+                "pageToken": page_token,
+            }
+            # A sync token cannot be combined with timeMin/timeMax or orderBy,
+            # so only the initial sync is bounded in time; callers trim the
+            # incremental changes to their window
+            if sync_token:
+                params["syncToken"] = sync_token
+            else:
+                params["timeMin"] = time_min
+                if time_max:
+                    params["timeMax"] = time_max
+                if order_by:
+                    params["orderBy"] = order_by
+
+            response = service.events().list(**params).execute(http=self.get_http())
+            events.extend(response.get("items", []))
+
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return events, response.get("nextSyncToken")
+
+    def sync_events(self, weeks_back=4, weeks_forward=0):
+        """Pull only changed events per calendar using stored sync tokens.
+
+        The store keeps every event from weeks_back before now onwards,
+        however far ahead, since a sync token only reports an event again
+        when it changes. The output holds the events from weeks_back before
+        now to weeks_forward after it.
+        """
         try:
-            dt = parser.parse(dt_str)
-            return dt.isoformat()
-        except:
-            return dt_str
+            print("Authenticating...")
+            self.authenticate()
+
+            print("Building Calendar service...")
+            service = self.get_service()
+
+            now = datetime.now(timezone.utc)
+            window_start = now - timedelta(weeks=weeks_back)
+            window_end = now + timedelta(weeks=weeks_forward)
+            start_time = window_start.isoformat()
+            end_time = window_end.isoformat()
+
+            state = self.load_sync_state()
+            if not os.path.exists(self.store_file):
+                # Sync tokens are only good together with the events they led to
+                state = {}
+            events = self.load_events()
+            # Failing here rather than on an empty list keeps the store and
+            # tokens of calendars that only could not be listed this time
+            calendars = self.list_calendars(raise_errors=True)
+
+            # Forget calendars that are no longer in the calendar list
+            calendar_ids = {calendar["id"] for calendar in calendars}
+            events = {k: e for k, e in events.items() if k[0] in calendar_ids}
+            state = {k: v for k, v in state.items() if k in calendar_ids}
+
+            def sync_calendar(calendar):
+                sync_token = state.get(calendar["id"], {}).get("sync_token")
+                try:
+                    items, next_sync_token = self.list_events(
+                        service,
+                        calendar["id"],
+                        sync_token=sync_token,
+                        time_min=start_time,
+                    )
+                except HttpError as e:
+                    # 410 Gone means the sync token expired; start over
+                    if e.resp.status != 410:
+                        raise
+                    print(f"Sync token expired for {calendar['summary']}, resyncing...")
+                    sync_token = None
+                    items, next_sync_token = self.list_events(
+                        service,
+                        calendar["id"],
+                        time_min=start_time,
+                    )
+                return items, next_sync_token, not sync_token
+
+            # Calendars are fetched concurrently; one that fails keeps its
+            # previous events and sync token
+            results = self.for_each_calendar(calendars, sync_calendar)
+
+            for calendar in calendars:
+                calendar_id = calendar["id"]
+                calendar_name = calendar["summary"]
+                if calendar_id not in results:
+                    continue
+                items, next_sync_token, full_sync = results[calendar_id]
+
+                if full_sync:
+                    # A full sync replaces whatever we had for this calendar
+                    events = {k: e for k, e in events.items() if k[0] != calendar_id}
+
+                print(f"{calendar_name}: {len(items)} changed events")
+                for item in items:
+                    key = (calendar_id, item["id"])
+                    if item.get("status") == "cancelled":
+                        events.pop(key, None)
+                        continue
+                    events[key] = parse_event(item, calendar_id, calendar_name, now)
+
+                state[calendar_id] = {
+                    "sync_token": next_sync_token,
+                    "synced_at": now.isoformat(),
+                }
+
+            # Incremental changes are not bounded in time, and the window moves
+            # on every run, so evict what has dropped behind it; future events
+            # stay until they do
+            events = {
+                k: e for k, e in events.items() if starts_within(e, window_start)
+            }
+
+            # Statuses are relative to now, so refresh them for unchanged events too
+            for event in events.values():
+                event["event_status"] = event_status_for(event["start_time"], now)
+
+            all_events = sorted(
+                (
+                    e
+                    for e in events.values()
+                    if starts_within(e, window_start, window_end)
+                ),
+                key=lambda e: e["start_time"] or "",
+            )
+            output_data = build_calendar_output(
+                all_events,
+                {
+                    "start": start_time,
+                    "end": end_time,
+                    "weeks_back": weeks_back,
+                    "weeks_forward": weeks_forward,
+                },
+            )
+
+            with open(self.output_file, "w", encoding="utf-8") as f:
+                json.dump(output_data, f, indent=2, ensure_ascii=False)
+            self.save_events(events.values())
+            self.save_sync_state(state)
+
+            print(
+                f"\nSuccessfully saved {len(all_events)} events to {self.output_file}"
+            )
+
+            return output_data
+
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            raise
 
     def fetch_and_save_events(self, weeks_back=4, weeks_forward=0):
         """Fetch calendar events from the past weeks until now and save to JSON file"""
@@ -96,7 +332,7 @@ class CalendarFetcher:
             self.authenticate()
 
             print("Building Calendar service...")
-            service = build("calendar", "v3", credentials=self.creds)
+            service = self.get_service()
 
             # Calculate time range
             now = datetime.utcnow()
@@ -109,132 +345,38 @@ class CalendarFetcher:
             calendars = self.list_calendars()
             all_events = []
 
+            def fetch_calendar(calendar):
+                print(f"\nFetching events from calendar: {calendar['summary']}")
+                events, _ = self.list_events(
+                    service,
+                    calendar["id"],
+                    time_min=start_time,
+                    time_max=end_time,
+                    order_by="startTime",
+                )
+                return events
+
+            results = self.for_each_calendar(calendars, fetch_calendar)
+
             for calendar in calendars:
                 calendar_id = calendar["id"]
                 calendar_name = calendar["summary"]
 
-                print(f"\nFetching events from calendar: {calendar_name}")
-
-                events_result = (
-                    service.events()
-                    .list(
-                        calendarId=calendar_id,
-                        timeMin=start_time,
-                        timeMax=end_time,
-                        maxResults=2500,
-                        singleEvents=True,
-                        orderBy="startTime",
-                    )
-                    .execute()
-                )
-
-                events = events_result.get("items", [])
-
-                for event in events:
-                    # Extract start and end times
-                    start = event["start"].get("dateTime", event["start"].get("date"))
-                    end = event["end"].get("dateTime", event["end"].get("date"))
-
-                    # Normalize to ISO format
-                    start_iso = self.normalize_datetime(start)
-                    end_iso = self.normalize_datetime(end)
-
-                    # Extract attendees
-                    attendees = event.get("attendees", [])
-
-                    # Extract emails from description for better context
-                    description = event.get("description", "")
-                    emails_in_description = self.extract_email_addresses(description)
-
-                    # Determine event status relative to now
-                    event_status = "upcoming"
-                    try:
-                        event_start = parser.parse(start)
-                        if event_start < now:
-                            event_status = "past"
-                        elif event_start < now + timedelta(days=1):
-                            event_status = "today"
-                        elif event_start < now + timedelta(days=7):
-                            event_status = "this_week"
-                    except:
-                        pass
-
-                    # Create structured event data
-                    event_data = {
-                        "id": event["id"],
-                        "calendar_id": calendar_id,
-                        "calendar_name": calendar_name,
-                        "summary": event.get("summary", "No title"),
-                        "description": description,
-                        "location": event.get("location", ""),
-                        "start_time": start_iso,
-                        "end_time": end_iso,
-                        "status": event.get("status", ""),
-                        "event_status": event_status,  # relative to current time
-                        "attendees": [
-                            {
-                                "email": attendee.get("email", ""),
-                                "response_status": attendee.get("responseStatus", ""),
-                                "name": attendee.get("displayName", ""),
-                                "organizer": attendee.get("organizer", False),
-                                "self": attendee.get("self", False),
-                            }
-                            for attendee in attendees
-                        ],
-                        "organizer": {
-                            "email": event.get("organizer", {}).get("email", ""),
-                            "self": event.get("organizer", {}).get("self", False),
-                        },
-                        "created": event.get("created", ""),
-                        "updated": event.get("updated", ""),
-                        "html_link": event.get("htmlLink", ""),
-                        "is_recurring": "recurringEventId" in event,
-                        "recurring_event_id": event.get("recurringEventId", ""),
-                        "related_emails": emails_in_description,
-                        "is_all_day": "date" in event.get("start", {})
-                        and "dateTime" not in event.get("start", {}),
-                    }
-
+                for event in results.get(calendar_id, []):
+                    event_data = parse_event(event, calendar_id, calendar_name, now)
                     all_events.append(event_data)
                     print(f"Processed event: {event_data['summary']}")
 
-            # Group events by date for easier processing
-            events_by_date = {}
-            for event in all_events:
-                try:
-                    date_key = parser.parse(event["start_time"]).strftime("%Y-%m-%d")
-                    if date_key not in events_by_date:
-                        events_by_date[date_key] = []
-                    events_by_date[date_key].append(event)
-                except:
-                    # If date parsing fails, add to 'unknown' category
-                    if "unknown" not in events_by_date:
-                        events_by_date["unknown"] = []
-                    events_by_date["unknown"].append(event)
-
             # Save to JSON file with enhanced structure
-            output_data = {
-                "timestamp": datetime.now().isoformat(),
-                "date_range": {
+            output_data = build_calendar_output(
+                all_events,
+                {
                     "start": start_time,
                     "end": end_time,
                     "weeks_back": weeks_back,
                     "weeks_forward": weeks_forward,
                 },
-                "total_events": len(all_events),
-                "events_by_status": {
-                    "past": [e for e in all_events if e["event_status"] == "past"],
-                    "today": [e for e in all_events if e["event_status"] == "today"],
-                    "this_week": [
-                        e for e in all_events if e["event_status"] == "this_week"
-                    ],
-                    "upcoming": [
-                        e for e in all_events if e["event_status"] == "upcoming"
-                    ],
-                },
-                "events_by_date": events_by_date,
-                "events": all_events,
-            }
+            )
 
             # Save to JSON file
             with open(self.output_file, "w", encoding="utf-8") as f:
@@ -254,7 +396,7 @@ class CalendarFetcher:
 def main():
     fetcher = CalendarFetcher()
     try:
-        fetcher.fetch_and_save_events(weeks_back=4, weeks_forward=0)
+        fetcher.sync_events(weeks_back=4, weeks_forward=0)
     except Exception as e:
         print(f"Failed to fetch calendar events: {e}")
         raise
@@ -2,18 +2,50 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+import argparse
+import httplib2
 import os
 import pickle
+import random
+import threading
+import time
 from datetime import datetime
 import json
-from collections import defaultdict
-import base64
-import email
-from email.utils import parsedate_to_datetime
+from email_store import EmailStore
+from message_record import (
+    extract_plain_text_body,
+    message_timestamp,
+    parse_api_message,
+)
+from text_normalizer import clean_text
+
+
+# Failures of the connection itself (timeouts, resets, DNS) rather than
+# answers from Gmail; the whole batch is worth retrying like a 5xx
+TRANSPORT_ERRORS = (OSError, httplib2.HttpLib2Error)
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items from any iterable"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
 
 
 class GmailFetcher:
-    def __init__(self):
+    # Headers requested by the metadata-only tier; everything downstream of
+    # the fetcher keys off these four
+    METADATA_HEADERS = ["From", "To", "Date", "Subject"]
+    # Syncs a message that keeps failing to fetch is retried for before
+    # it is given up on (it may have been deleted meanwhile)
+    MAX_PENDING_ATTEMPTS = 5
+
+    def __init__(
+        self, batch_size=50, max_concurrency=2, max_retries=5, fetch_format="full"
+    ):
         # Allow OAuth to work in development
         os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
         self.SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
@@ -22,6 +54,19 @@ class GmailFetcher:
             "client_secrets.json"  # Make sure this matches your downloaded file name
         )
         self.output_file = "primary_emails.json"
+        self.sync_state_file = "gmail_sync_state.json"
+        self.store = EmailStore("emails")
+
+        # Gmail accepts up to 100 calls per batch request, but recommends 50
+        # to stay clear of the per-user concurrent request limit
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        # "metadata" fetches only headers and snippet; bodies are hydrated
+        # later for the threads that actually need them
+        self.fetch_format = fetch_format
+        self.failed_messages = {}
+        self._thread_local = threading.local()
 
     def authenticate(self):
         """Handle Gmail authentication using OAuth"""
@@ -84,203 +129,497 @@ class GmailFetcher:
 
     def get_email_body(self, payload):
         """Extract only plain text body from email payload"""
-        body = ""
-
-        if payload.get("body") and payload["body"].get("data"):
-            # Handle single-part message
-            data = base64.urlsafe_b64decode(
-                payload["body"]["data"].encode("UTF-8")
-            ).decode("UTF-8")
-            if payload.get("mimeType") == "text/plain":
-                body = data
-
-        elif payload.get("parts"):
-            # Handle multipart message
-            for part in payload["parts"]:
-                mimeType = part.get("mimeType")
-                if part.get("body") and part["body"].get("data"):
-                    data = base64.urlsafe_b64decode(
-                        part["body"]["data"].encode("UTF-8")
-                    ).decode("UTF-8")
-                    if mimeType == "text/plain":
-                        body = data
-                        break  # Stop after finding plain text
-
-                # Handle nested multipart messages
-                if part.get("parts"):
-                    nested_body = self.get_email_body(part)
-                    if nested_body:
-                        body = nested_body
-                        break
-
-        return body
+        return extract_plain_text_body(payload)
 
     def clean_text(self, text):
         """Remove invisible Unicode characters and normalize whitespace"""
-        if not text:
-            return ""
-
-        # Define ranges of invisible characters to remove
-        invisible_chars = (
-            # Zero-width characters
-            "\u200B-\u200D\uFEFF"  # Zero-width space, joiner, non-joiner, and BOM
-            # Various spaces
-            "\u2000-\u200A"  # Different width spaces
-            "\u2028\u2029"  # Line and paragraph separators
-            "\u00A0"  # Non-breaking space
-        )
+        return clean_text(text)
 
-        import re
+    def get_service(self):
+        """Return a Gmail service client owned by the calling thread"""
+        # httplib2 is not thread-safe, so every worker thread builds its own client
+        service = getattr(self._thread_local, "service", None)
+        if service is None:
+            service = build("gmail", "v1", credentials=self.creds)
+            self._thread_local.service = service
+        return service
+
+    def is_retryable_error(self, error):
+        """Check whether an API error is a quota limit or transient backend error"""
+        if not isinstance(error, HttpError):
+            return False
+        if error.resp.status == 429:
+            return True
+        if error.resp.status == 403:
+            details = (
+                error.error_details if isinstance(error.error_details, list) else []
+            )
+            reasons = [d.get("reason") for d in details if isinstance(d, dict)]
+            return any(
+                reason in ("rateLimitExceeded", "userRateLimitExceeded")
+                for reason in reasons
+            )
+        return error.resp.status in (500, 503)
+
+    def execute_batch(self, service, message_ids, format="full"):
+        """Fetch a group of messages in a single HTTP batch request"""
+        fetched = {}
+        retry_ids = []
+        errors = {}
+
+        def callback(request_id, response, exception):
+            # Each item succeeds or fails on its own, so one bad message
+            # does not take the rest of the batch down with it
+            if exception is None:
+                fetched[request_id] = response
+            elif self.is_retryable_error(exception):
+                retry_ids.append(request_id)
+            else:
+                errors[request_id] = str(exception)
+
+        params = {"format": format}
+        if format == "metadata":
+            params["metadataHeaders"] = self.METADATA_HEADERS
+
+        batch = service.new_batch_http_request(callback=callback)
+        for message_id in message_ids:
+            batch.add(
+                service.users().messages().get(userId="me", id=message_id, **params),
+                request_id=message_id,
+            )
+        batch.execute()
+
+        return fetched, retry_ids, errors
+
+    def fetch_batch_with_backoff(self, message_ids, format="full"):
+        """Fetch one batch, retrying rate limited items and dropped connections"""
+        service = self.get_service()
+        pending = list(message_ids)
+        fetched = {}
+        errors = {}
+        transport_error = None
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                batch_fetched, pending, batch_errors = self.execute_batch(
+                    service, pending, format=format
+                )
+            except HttpError as e:
+                if not self.is_retryable_error(e):
+                    for message_id in pending:
+                        errors[message_id] = str(e)
+                    return fetched, errors
+                transport_error = None
+                batch_fetched, batch_errors = {}, {}
+            except TRANSPORT_ERRORS as e:
+                transport_error = e
+                batch_fetched, batch_errors = {}, {}
+            else:
+                transport_error = None
+
+            fetched.update(batch_fetched)
+            errors.update(batch_errors)
+
+            if not pending:
+                break
+
+            if attempt < self.max_retries:
+                delay = min(2**attempt + random.random(), 64)
+                reason = repr(transport_error) if transport_error else "Rate limited"
+                print(
+                    f"{reason} on {len(pending)} messages, retrying in {delay:.1f}s..."
+                )
+                time.sleep(delay)
 
-        # Remove invisible characters
-        cleaned = re.sub(f"[{invisible_chars}]", "", text)
-        # Normalize whitespace (replace multiple spaces with single space)
-        cleaned = re.sub(r"\s+", " ", cleaned)
-        return cleaned.strip()
+        for message_id in pending:
+            errors[message_id] = (
+                f"Retries exhausted: {transport_error!r}"
+                if transport_error
+                else "Rate limit retries exhausted"
+            )
 
-    def fetch_and_save_primary_emails(self, limit=20):
-        """Fetch both received and sent email threads and save to JSON file"""
-        try:
-            print("Authenticating...")
-            self.authenticate()
+        return fetched, errors
+
+    def collect_batches(self, futures):
+        """Yield the messages of finished batch futures, recording failures"""
+        for future in futures:
+            fetched, errors = future.result()
+            self.failed_messages.update(errors)
+            yield from fetched.values()
+
+    def fetch_messages(self, message_ids, format="full"):
+        """Fetch messages in concurrent batches, yielding them as batches complete"""
+        self.failed_messages = {}
+        # Only keep a couple of batches per worker in flight so a long ID
+        # stream is never materialized in memory
+        max_in_flight = self.max_concurrency * 2
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            in_flight = set()
+            for batch in chunked(message_ids, self.batch_size):
+                in_flight.add(
+                    executor.submit(self.fetch_batch_with_backoff, batch, format)
+                )
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    yield from self.collect_batches(done)
+            yield from self.collect_batches(in_flight)
+
+        if self.failed_messages:
+            print(f"Failed to fetch {len(self.failed_messages)} messages:")
+            for message_id, error in self.failed_messages.items():
+                print(f"  {message_id}: {error}")
+
+    def parse_message(self, msg, include_body=True):
+        """Convert a Gmail API message into a ParsedMessage"""
+        return parse_api_message(msg, include_body=include_body)
+
+    def is_primary_message(self, labels):
+        """Check whether a message belongs to the primary inbox or sent mail"""
+        labels = set(labels or [])
+        return "SENT" in labels or {"INBOX", "CATEGORY_PERSONAL"} <= labels
+
+    def build_thread(self, thread_id, messages):
+        """Build a thread record with its messages sorted newest first"""
+        # Sort messages within thread by their pre-parsed epoch timestamps
+        messages.sort(key=lambda x: message_timestamp(x) or 0, reverse=True)
+
+        return {
+            "thread_id": thread_id,
+            "subject": messages[0]["subject"],
+            "messages": messages,
+            "message_count": len(messages),
+            "latest_date": messages[0]["date"],
+            "latest_timestamp": message_timestamp(messages[0]),
+            "participants": list(
+                set([m["from"] for m in messages] + [m["to"] for m in messages])
+            ),
+        }
+
+    def export_threads(self):
+        """Stream the stored threads into the primary_emails.json layout"""
+        # Threads are written one partition at a time in store order rather
+        # than sorted by date, so the export never holds the whole mailbox
+        total_threads = 0
+        tmp_file = self.output_file + ".tmp"
+
+        print(f"\nSaving to {self.output_file}...")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            timestamp = json.dumps(datetime.now().isoformat())
+            f.write(f'{{\n"timestamp": {timestamp},\n"threads": [')
+            for thread_id, messages in self.store.iter_threads():
+                thread = self.build_thread(thread_id, messages)
+                f.write("," if total_threads else "")
+                f.write("\n" + json.dumps(thread, ensure_ascii=False))
+                total_threads += 1
+            f.write(f'\n],\n"total_threads": {total_threads}\n}}\n')
+        os.replace(tmp_file, self.output_file)
+
+        print(
+            f"\nSuccessfully saved {total_threads} email threads to {self.output_file}"
+        )
 
-            print("Building Gmail service...")
-            service = build("gmail", "v1", credentials=self.creds)
+    def iter_message_ids(self, service, label_ids, max_results=None):
+        """Yield message IDs for the given labels, following every result page"""
+        page_token = None
+        remaining = max_results
 
-            # First, get primary inbox messages
-            print(f"Fetching inbox messages...")
-            inbox_results = (
+        while remaining is None or remaining > 0:
+            page_size = 500 if remaining is None else min(500, remaining)
+            response = (
                 service.users()
                 .messages()
                 .list(
                     userId="me",
-                    maxResults=limit * 2,  # Increased to account for sent messages too
-                    labelIds=["INBOX", "CATEGORY_PERSONAL"],
+                    labelIds=label_ids,
+                    maxResults=page_size,
+                    pageToken=page_token,
                 )
                 .execute()
             )
-            inbox_messages = inbox_results.get("messages", [])
 
-            # Next, get sent messages
-            print(f"Fetching sent messages...")
-            sent_results = (
+            messages = response.get("messages", [])
+            for message in messages:
+                yield message["id"]
+            if remaining is not None:
+                remaining -= len(messages)
+
+            page_token = response.get("nextPageToken")
+            if not page_token or not messages:
+                break
+
+    def load_hydrated_bodies(self, messages, bodies, read_partitions):
+        """Add the stored bodies of hydrated messages to bodies, by message ID.
+
+        Only partitions not in read_partitions are read, so a sync reads
+        each partition once however many of its batches touch it.
+        """
+        for partition in {self.store.partition_for(m["threadId"]) for m in messages}:
+            if partition in read_partitions:
+                continue
+            read_partitions.add(partition)
+            for message_id, record in self.store.read_partition(partition).items():
+                if record.get("hydrated", True):
+                    bodies[message_id] = record.get("body")
+
+    def store_messages(self, messages, include_body=True, keep_bodies=True):
+        """Parse fetched messages and stream them into the store.
+
+        A metadata-only copy of a message keeps the body already stored for
+        it unless keep_bodies is off, e.g. right after the store was reset.
+        """
+        count = 0
+        bodies = {}
+        read_partitions = set()
+        for batch in chunked(messages, self.batch_size):
+            if keep_bodies and not include_body:
+                self.load_hydrated_bodies(batch, bodies, read_partitions)
+            records = []
+            for msg in batch:
+                if not self.is_primary_message(msg.get("labelIds")):
+                    self.store.delete(msg["id"], msg["threadId"])
+                    continue
+                parsed = self.parse_message(msg, include_body=include_body)
+                record = parsed.to_record()
+                if msg["id"] in bodies:
+                    # A label change must not throw away a body fetched earlier
+                    record["body"] = bodies[msg["id"]]
+                    record["hydrated"] = True
+                records.append(record)
+                print(f"Processed email: {parsed.subject}")
+            self.store.append(records)
+            count += len(records)
+        return count
+
+    def hydrate_threads(self, thread_ids):
+        """Fetch full bodies for the not yet hydrated messages of some threads"""
+        message_ids = [
+            message["id"]
+            for thread_id in thread_ids
+            for message in self.store.get_thread(thread_id)
+            if message.get("hydrated") is False
+        ]
+        if not message_ids:
+            return 0
+
+        print(f"Hydrating {len(message_ids)} message bodies...")
+        return self.store_messages(self.fetch_messages(message_ids, format="full"))
+
+    def get_thread(self, thread_id):
+        """Return a thread's messages, hydrating their bodies on first access"""
+        messages = self.store.get_thread(thread_id)
+        if any(message.get("hydrated") is False for message in messages):
+            if self.creds is None:
+                self.authenticate()
+            self.hydrate_threads([thread_id])
+            messages = self.store.get_thread(thread_id)
+        return messages
+
+    def load_sync_state(self):
+        """Load the per-account history checkpoints"""
+        if not os.path.exists(self.sync_state_file):
+            return {}
+        with open(self.sync_state_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_sync_state(self, account, history_id, pending=None):
+        """Persist the latest historyId seen for an account.
+
+        pending maps the IDs of changed messages that failed to fetch to how
+        many syncs have tried them; the next sync fetches them again, since
+        the history after history_id no longer mentions them.
+        """
+        state = self.load_sync_state()
+        state[account] = {
+            "history_id": str(history_id),
+            "synced_at": datetime.now().isoformat(),
+            "pending_message_ids": pending or {},
+        }
+        with open(self.sync_state_file, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+
+    def pending_after_fetch(self, previous=None):
+        """Carry the messages that failed this fetch over to the next sync"""
+        previous = previous or {}
+        pending = {}
+        for message_id in self.failed_messages:
+            attempts = previous.get(message_id, 0) + 1
+            if attempts < self.MAX_PENDING_ATTEMPTS:
+                pending[message_id] = attempts
+            else:
+                print(f"Giving up on message {message_id} after {attempts} syncs")
+        return pending
+
+    def get_profile(self, service):
+        """Return the mailbox address and its current historyId"""
+        profile = service.users().getProfile(userId="me").execute()
+        return profile["emailAddress"], profile["historyId"]
+
+    def list_history_changes(self, service, start_history_id):
+        """Collect the messages changed or deleted since a history checkpoint.
+
+        Changed messages map to their latest history entry, which carries
+        their thread and, usually, their labels at that point.
+        """
+        changed = {}
+        deleted_ids = {}
+        latest_history_id = start_history_id
+        page_token = None
+
+        while True:
+            response = (
                 service.users()
-                .messages()
+                .history()
                 .list(
                     userId="me",
-                    maxResults=limit * 2,  # Doubled to ensure we get enough
-                    labelIds=["SENT"],
+                    startHistoryId=start_history_id,
+                    historyTypes=[
+                        "messageAdded",
+                        "messageDeleted",
+                        "labelAdded",
+                        "labelRemoved",
+                    ],
+                    pageToken=page_token,
                 )
                 .execute()
             )
-            sent_messages = sent_results.get("messages", [])
-
-            # Combine messages from both sources
-            all_message_ids = {}
-
-            # Add inbox messages first
-            for message in inbox_messages:
-                all_message_ids[message["id"]] = message
-
-            # Add sent messages
-            for message in sent_messages:
-                all_message_ids[message["id"]] = message
-
-            combined_messages = list(all_message_ids.values())
-
-            threads = defaultdict(list)
-
-            for message in combined_messages:
-                msg = (
-                    service.users()
-                    .messages()
-                    .get(userId="me", id=message["id"], format="full")
-                    .execute()
-                )
-
-                headers = msg["payload"]["headers"]
-                body_content = self.get_email_body(msg["payload"])
 
-                email_data = {
-                    "id": msg["id"],
-                    "subject": self.clean_text(
-                        next(
-                            (h["value"] for h in headers if h["name"] == "Subject"),
-                            "No subject",
-                        )
-                    ),
-                    "from": self.clean_text(
-                        next(
-                            (h["value"] for h in headers if h["name"] == "From"),
-                            "Unknown",
-                        )
-                    ),
-                    "to": self.clean_text(
-                        next(
-                            (h["value"] for h in headers if h["name"] == "To"),
-                            "Unknown",
-                        )
-                    ),
-                    "date": self.clean_text(
-                        next(
-                            (h["value"] for h in headers if h["name"] == "Date"),
-                            "Unknown",
-                        )
-                    ),
-                    "snippet": self.clean_text(msg.get("snippet", "")),
-                    "body": self.clean_text(body_content),
-                    "labels": msg.get("labelIds", []),
-                }
-
-                thread_id = msg["threadId"]
-                threads[thread_id].append(email_data)
-                print(f"Processed email: {email_data['subject']}")
-
-            # Convert threads to list and sort by the most recent email in each thread
-            thread_list = []
-            for thread_id, messages in threads.items():
-                # Sort messages within thread by date using email.utils parser
-                messages.sort(
-                    key=lambda x: parsedate_to_datetime(x["date"]),
-                    reverse=True,
+            for record in response.get("history", []):
+                for key in ("messagesAdded", "labelsAdded", "labelsRemoved"):
+                    for item in record.get(key, []):
+                        # Records come oldest first, so the last one wins
+                        changed[item["message"]["id"]] = item["message"]
+                for item in record.get("messagesDeleted", []):
+                    message = item["message"]
+                    deleted_ids[message["id"]] = message["threadId"]
+
+            latest_history_id = response.get("historyId", latest_history_id)
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+
+        # A message added and then deleted within the window only needs removing
+        for message_id in deleted_ids:
+            changed.pop(message_id, None)
+        return changed, deleted_ids, latest_history_id
+
+    def sync_primary_emails(self, limit=20):
+        """Apply only the mailbox changes since the last run, or do a full fetch"""
+        try:
+            print("Authenticating...")
+            self.authenticate()
+            service = self.get_service()
+
+            account, _ = self.get_profile(service)
+            checkpoint = self.load_sync_state().get(account)
+            if not checkpoint or not self.store.exists():
+                print(f"No sync checkpoint for {account}, running full fetch...")
+                return self.fetch_and_save_primary_emails(limit=limit)
+
+            print(f"Syncing {account} from historyId {checkpoint['history_id']}...")
+            try:
+                changed, deleted_ids, latest_history_id = self.list_history_changes(
+                    service, checkpoint["history_id"]
                 )
+            except HttpError as e:
+                # History is only kept for about a week; an expired checkpoint
+                # comes back as 404 and needs a full resync
+                if e.resp.status == 404:
+                    print("History checkpoint expired, running full fetch...")
+                    return self.fetch_and_save_primary_emails(limit=limit)
+                raise
+
+            # Messages that failed to fetch last time are not in this history
+            # window any more, so they are fetched again explicitly
+            previous_pending = {
+                message_id: attempts
+                for message_id, attempts in checkpoint.get(
+                    "pending_message_ids", {}
+                ).items()
+                if message_id not in deleted_ids
+            }
 
-                thread_list.append(
-                    {
-                        "thread_id": thread_id,
-                        "subject": messages[0]["subject"],
-                        "messages": messages,
-                        "message_count": len(messages),
-                        "latest_date": messages[0]["date"],
-                        "participants": list(
-                            set(
-                                [m["from"] for m in messages]
-                                + [m["to"] for m in messages]
-                            )
-                        ),
-                    }
-                )
+            # History already tells which changed messages left the primary
+            # inbox and sent mail (promotions, spam, drafts...); those are
+            # tombstoned without downloading them
+            left_primary = {
+                message_id: message["threadId"]
+                for message_id, message in changed.items()
+                if "labelIds" in message
+                and not self.is_primary_message(message["labelIds"])
+            }
+            changed_ids = changed.keys() - left_primary.keys()
+            changed_ids |= previous_pending.keys()
 
-            # Sort threads by the date of their most recent message
-            thread_list.sort(
-                key=lambda x: parsedate_to_datetime(x["latest_date"]),
-                reverse=True,
+            print(
+                f"Found {len(changed_ids)} changed, {len(left_primary)} non-primary "
+                f"and {len(deleted_ids)} deleted messages"
+            )
+            if not changed_ids and not left_primary and not deleted_ids:
+                self.save_sync_state(account, latest_history_id)
+                return
+
+            for message_id, thread_id in {**left_primary, **deleted_ids}.items():
+                self.store.delete(message_id, thread_id)
+
+            # Changed messages are appended as newer copies of themselves, or
+            # tombstoned if they turn out not to belong to the primary inbox or
+            # sent mail. Messages that fail to fetch keep their previous copy.
+            self.store_messages(
+                self.fetch_messages(sorted(changed_ids), format=self.fetch_format),
+                include_body=self.fetch_format == "full",
+            )
+            self.store.compact()
+            self.export_threads()
+            self.save_sync_state(
+                account, latest_history_id, self.pending_after_fetch(previous_pending)
             )
 
-            output_data = {
-                "timestamp": datetime.now().isoformat(),
-                "total_threads": len(thread_list),
-                "threads": thread_list,
-            }
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            raise
 
-            # Save to JSON file
-            print(f"\nSaving to {self.output_file}...")
-            with open(self.output_file, "w", encoding="utf-8") as f:
-                json.dump(output_data, f, indent=2, ensure_ascii=False)
+    def fetch_and_save_primary_emails(self, limit=20):
+        """Fetch both received and sent email threads and save to JSON file
 
-            print(
-                f"\nSuccessfully saved {len(thread_list)} email threads to {self.output_file}"
+        Pass limit=None to page through the whole mailbox.
+        """
+        try:
+            print("Authenticating...")
+            self.authenticate()
+
+            print("Building Gmail service...")
+            service = self.get_service()
+
+            # Record the checkpoint before listing so changes made while we
+            # fetch are picked up by the next incremental sync
+            account, history_id = self.get_profile(service)
+
+            max_results = limit * 2 if limit else None
+            seen_ids = set()
+
+            def primary_message_ids():
+                # Inbox first, then sent mail; a message can carry both labels
+                for label_ids in (["INBOX", "CATEGORY_PERSONAL"], ["SENT"]):
+                    print(f"Listing {'/'.join(label_ids)} messages...")
+                    for message_id in self.iter_message_ids(
+                        service, label_ids, max_results=max_results
+                    ):
+                        if message_id not in seen_ids:
+                            seen_ids.add(message_id)
+                            yield message_id
+
+            self.store.reset()
+            print(f"Fetching messages in batches of {self.batch_size}...")
+            count = self.store_messages(
+                self.fetch_messages(primary_message_ids(), format=self.fetch_format),
+                include_body=self.fetch_format == "full",
+                keep_bodies=False,
             )
+            print(f"Stored {count} messages in {self.store.store_dir}/")
+
+            self.export_threads()
+            self.save_sync_state(account, history_id, self.pending_after_fetch())
 
         except Exception as e:
             print(f"An error occurred: {e}")
@@ -288,9 +627,29 @@ class GmailFetcher:
 
 
 def main():
-    fetcher = GmailFetcher()
+    arg_parser = argparse.ArgumentParser(description="Fetch primary Gmail threads")
+    arg_parser.add_argument(
+        "--metadata-only",
+        action="store_true",
+        help="Fetch headers and snippets only; bodies are hydrated on demand with "
+        "--hydrate here or follow_up_detection.py --hydrate-bodies",
+    )
+    arg_parser.add_argument(
+        "--hydrate",
+        nargs="+",
+        metavar="THREAD_ID",
+        help="Fetch full bodies for the given threads instead of syncing",
+    )
+    args = arg_parser.parse_args()
+
+    fetcher = GmailFetcher(fetch_format="metadata" if args.metadata_only else "full")
     try:
-        fetcher.fetch_and_save_primary_emails()
+        if args.hydrate:
+            fetcher.authenticate()
+            fetcher.hydrate_threads(args.hydrate)
+            fetcher.export_threads()
+        else:
+            fetcher.sync_primary_emails()
     except Exception as e:
         print(f"Failed to fetch emails: {e}")
         raise  # Add this to see the full error traceback
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+
+from date_parsing import parse_datetime, to_utc
+
+# Day counts where the prompt's advice flips: "very recent (2-3 days)" and
+# "more than 7 days ago"; a decision is reused only within the same band
+AGE_THRESHOLDS_DAYS = (3, 7)
+MAX_ENTRY_AGE_DAYS = 30
+# New decisions to gather before save_if_due rewrites the file
+SAVE_EVERY = 25
+
+
+def age_bucket(last_interaction_date, now):
+    """Which AGE_THRESHOLDS_DAYS band the last interaction falls in"""
+    last = parse_datetime(last_interaction_date or "")
+    if last is None:
+        return "unknown"
+    days = (now - to_utc(last)).days
+    return str(bisect_right(AGE_THRESHOLDS_DAYS, days))
+
+
+def still_current(result, last_interaction_date, now):
+    """Whether a result decided earlier still holds: same last interaction, same band"""
+    analyzed_at = parse_datetime(result.get("analyzed_at") or "")
+    if analyzed_at is None:
+        return False
+    return result.get("last_interaction_date") == last_interaction_date and (
+        age_bucket(last_interaction_date, to_utc(analyzed_at))
+        == age_bucket(last_interaction_date, now)
+    )
+
+
+def decision_key(person_context, last_interaction_date, now, salt=""):
+    """Cache key of a follow-up decision: the compacted context plus its age band.
+
+    salt should capture everything else the answer depends on, such as the
+    prompt, the model and the company.
+    """
+    digest = hashlib.sha1(f"{salt}\x00{person_context}".encode("utf-8")).hexdigest()
+    return f"{digest}:{age_bucket(last_interaction_date, now)}"
+
+
+class DecisionCache:
+    """Follow-up decisions from earlier runs, persisted as JSON"""
+
+    def __init__(
+        self, cache_file, max_entry_age_days=MAX_ENTRY_AGE_DAYS, save_every=SAVE_EVERY
+    ):
+        self.cache_file = cache_file
+        self.max_entry_age = timedelta(days=max_entry_age_days)
+        self.save_every = save_every
+        self.unsaved = 0
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        if not os.path.exists(self.cache_file):
+            return self
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Could not read decision cache, starting empty: {e}")
+            self.entries = {}
+        return self
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["result"]
+
+    def put(self, key, result):
+        self.entries[key] = {
+            "result": result,
+            "cached_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.unsaved += 1
+
+    def save_if_due(self):
+        """Save once save_every decisions have been added since the last save"""
+        if self.unsaved >= self.save_every:
+            self.save()
+
+    def save(self):
+        """Drop entries past their maximum age and write the file atomically"""
+        cutoff = datetime.now(timezone.utc) - self.max_entry_age
+        self.entries = {
+            key: entry
+            for key, entry in self.entries.items()
+            if datetime.fromisoformat(entry["cached_at"]) >= cutoff
+        }
+        tmp_path = f"{self.cache_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_file)
+        self.unsaved = 0
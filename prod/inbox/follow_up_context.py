@@ -0,0 +1,157 @@
+import json
+import re
+from functools import lru_cache
+
+DEFAULT_TOKEN_BUDGET = 3000
+MAX_INTERACTIONS = 10
+MAX_BODY_CHARS = 1500
+# Bodies are never cut below this while fitting the budget; older
+# interactions are dropped instead
+MIN_BODY_CHARS = 200
+
+# Bodies are whitespace-normalized to one line, so reply markers are matched
+# inline rather than at line starts
+QUOTED_REPLY_RE = re.compile(
+    r"\s(?:On [^<>]{0,120}?(?:<[^<>@\s]+@[^<>\s]+>)?,? ?wrote:"
+    r"|-{2,} ?(?:Original|Forwarded) [Mm]essage ?-{2,}"
+    r"|_{5,} ?From:"
+    r"|From: [^<>]{0,120}?<?[^<>@\s]+@[^<>\s]+>? Sent:)"
+)
+SUBJECT_PREFIX_RE = re.compile(r"^(?:(?:re|fwd?|aw|wg)\s*:\s*)+", re.IGNORECASE)
+
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """The tokenizer of the follow-up model, or None if it cannot be loaded"""
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model("gpt-4o-mini")
+    except Exception:
+        # tiktoken downloads its vocabulary on first use; offline we estimate
+        return None
+
+
+def count_tokens(text):
+    """Count prompt tokens, estimating 4 characters per token without tiktoken"""
+    encoding = get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def strip_quoted_reply(body):
+    """Drop the quoted earlier messages from a reply body"""
+    if not body:
+        return ""
+    match = QUOTED_REPLY_RE.search(body)
+    return body[: match.start()].rstrip() if match else body
+
+
+def truncate(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + " [...]"
+
+
+def normalized_subject(subject):
+    return SUBJECT_PREFIX_RE.sub("", subject or "").strip().lower()
+
+
+def compact_interaction(interaction, previous_in_thread, max_body_chars):
+    """Keep the fields the analysis needs, with headers repeated in a thread elided"""
+    if interaction.get("type") == "calendar":
+        return {
+            "type": "meeting",
+            "date": interaction.get("timestamp", ""),
+            "summary": interaction.get("summary", ""),
+            "status": interaction.get("status", ""),
+            "event_status": interaction.get("event_status", ""),
+            "attendees": [
+                f"{a.get('email', '')} ({a.get('response_status', '')})"
+                for a in interaction.get("attendees", [])
+            ],
+            "description": truncate(
+                interaction.get("description") or "", max_body_chars
+            ),
+        }
+
+    compact = {
+        "type": "email",
+        "date": interaction.get("timestamp", ""),
+        "thread_id": interaction.get("thread_id", ""),
+        "direction": interaction.get("direction", ""),
+        "from": interaction.get("from", ""),
+    }
+    if "sender_role" in interaction:
+        compact["sender_role"] = interaction["sender_role"]
+    if previous_in_thread is None or previous_in_thread.get("to") != interaction.get(
+        "to"
+    ):
+        compact["to"] = interaction.get("to", "")
+    if previous_in_thread is None or normalized_subject(
+        previous_in_thread.get("subject")
+    ) != normalized_subject(interaction.get("subject")):
+        compact["subject"] = interaction.get("subject", "")
+
+    body = strip_quoted_reply(interaction.get("body") or interaction.get("snippet"))
+    compact["body"] = truncate(body, max_body_chars)
+    return compact
+
+
+def compact_interactions(interactions, max_body_chars):
+    """Compact interactions, newest first, eliding headers seen earlier in a thread"""
+    compacted = []
+    # Walk oldest to newest so each message is compared with the one before it
+    previous_by_thread = {}
+    for interaction in reversed(interactions):
+        thread_id = interaction.get("thread_id")
+        previous = previous_by_thread.get(thread_id) if thread_id else None
+        compacted.append(compact_interaction(interaction, previous, max_body_chars))
+        if thread_id:
+            previous_by_thread[thread_id] = interaction
+    compacted.reverse()
+    return compacted
+
+
+def render_context(context):
+    return json.dumps(context, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_person_context(
+    person,
+    token_budget=DEFAULT_TOKEN_BUDGET,
+    max_interactions=MAX_INTERACTIONS,
+    max_body_chars=MAX_BODY_CHARS,
+):
+    """Summarize a person's timeline for the prompt within a token budget.
+
+    Returns the rendered context and its token count. Bodies are shortened
+    first and then the oldest interactions are dropped until it fits.
+    """
+    interactions = person.get("interactions", [])[:max_interactions]
+    context = {
+        "name": person.get("name", ""),
+        "email": person.get("email", ""),
+        "company": person.get("company", ""),
+        "last_interaction_date": person.get("last_interaction_date", ""),
+        "email_count": person.get("email_count", 0),
+        "meeting_count": person.get("event_count", 0),
+    }
+
+    while True:
+        context["interactions"] = compact_interactions(interactions, max_body_chars)
+        context["omitted_interactions"] = len(person.get("interactions", [])) - len(
+            interactions
+        )
+        rendered = render_context(context)
+        tokens = count_tokens(rendered)
+        if tokens <= token_budget or not interactions:
+            return rendered, tokens
+        if max_body_chars > MIN_BODY_CHARS:
+            max_body_chars = max(max_body_chars // 2, MIN_BODY_CHARS)
+        elif len(interactions) > 1:
+            interactions = interactions[:-1]
+        else:
+            # A single interaction with minimal bodies is the floor
+            return rendered, tokens
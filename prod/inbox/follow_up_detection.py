@@ -2,12 +2,11 @@ import os
 import sys
 import logging
 import json
-import questionary
-from rich.pretty import pprint
+import argparse
+import asyncio
+import openai
 import schema
 from rich import print as rprint
-from rich import print_json
-import requests
 
 # Add the project root directory to Python path
 sys.path.append(
@@ -21,51 +20,30 @@ sys.path.append(
     )
 )
 
-from griptape.configs.defaults_config import LoggingConfig
+from griptape.artifacts import ErrorArtifact
 from griptape.configs.logging import JsonFormatter
-from griptape.structures import Agent, Pipeline, Workflow
-
-# tools
-from extension.drivers.serper_web_search_driver.serper_web_search_driver import (
-    SerperWebSearchDriver,
-)
-from extension.drivers.jina_web_scraper_driver.jina_web_scraper_driver import (
-    JinaWebScraperDriver,
-)
-from extension.tools.apollo.apollo_tool import ApolloClient
-
-from griptape.utils import StructureVisualizer
 from griptape.configs import Defaults
-from griptape.loaders import WebLoader
-from griptape.tools import (
-    WebSearchTool,
-    WebScraperTool,
-    PromptSummaryTool,
-)
-from griptape.events import (
-    BaseEvent,
-    EventBus,
-    EventListener,
-    FinishActionsSubtaskEvent,
-    FinishPromptEvent,
-    FinishTaskEvent,
-    StartActionsSubtaskEvent,
-    StartPromptEvent,
-    StartTaskEvent,
-)
-from griptape.configs.drivers import (
-    OpenAiDriversConfig,
-    AnthropicDriversConfig,
-    GoogleDriversConfig,
-)
 from griptape.drivers.prompt.openai import OpenAiChatPromptDriver
 from griptape.drivers.prompt.anthropic import AnthropicPromptDriver
 from griptape.drivers.prompt.google import GooglePromptDriver
 from griptape.tasks import PromptTask
+from griptape.utils import import_optional_dependency
 from griptape.rules import Ruleset, Rule
-from datetime import datetime
-import json
-
+from datetime import datetime, timezone
+
+from address_parsing import parse_addresses
+from domain_registry import InternalDomainRegistry
+from follow_up_cache import DecisionCache, decision_key, still_current
+from follow_up_context import (
+    DEFAULT_TOKEN_BUDGET,
+    MAX_INTERACTIONS,
+    build_person_context,
+    count_tokens,
+)
+from follow_up_results import FollowUpResultSink, compact_results, completed_people
+from follow_up_rules import prefilter_person
+from follow_up_runner import FollowUpJob, FollowUpRunner, RateLimitedError
+from timeline_record import PersonTimeline
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -74,117 +52,42 @@ logger = logging.getLogger(Defaults.logging_config.logger_name)
 logger.setLevel(logging.INFO)
 logger.handlers[0].setFormatter(JsonFormatter())
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+
+# Default model and account rate limits per provider; override them on the
+# command line to match your tier
+PROVIDERS = {
+    "openai": {
+        "model": "gpt-4o-mini",
+        "requests_per_minute": 500,
+        "tokens_per_minute": 200_000,
+    },
+    "anthropic": {
+        "model": "claude-3-5-haiku-latest",
+        "requests_per_minute": 50,
+        "tokens_per_minute": 50_000,
+    },
+    "google": {
+        "model": "gemini-2.0-flash",
+        "requests_per_minute": 1_000,
+        "tokens_per_minute": 1_000_000,
+    },
+}
 
-def load_person_timeline():
-    # Get the directory where this script is located
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Define file path relative to the script location
-    person_timeline_file = os.path.join(script_dir, "person_timeline.json")
-
-    # Check if file exists
-    if not os.path.exists(person_timeline_file):
-        print(f"Error: File not found: {person_timeline_file}")
-        return {
-            "timestamp": datetime.now().isoformat(),
-            "total_people": 0,
-            "people": [],
-        }
-
-    with open(person_timeline_file, "r") as f:
-        return json.load(f)
-
-
-people = load_person_timeline()
-print_json(data=people["people"][0])
-
-# Define the number of people to process
-NUM_PEOPLE_TO_PROCESS = questionary.text(
-    "How many people would you like to process?",
-    validate=lambda text: text.isdigit()
-    and int(text) > 0
-    and int(text) <= len(people["people"]),
-    instruction="Enter a number between 1 and " + str(len(people["people"])),
-).ask()
-
-NUM_PEOPLE_TO_PROCESS = int(NUM_PEOPLE_TO_PROCESS)
-rprint(f"[yellow]Will process {NUM_PEOPLE_TO_PROCESS} people.[/yellow]")
-
-# Load user information using path relative to script
-script_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.dirname(
-    os.path.dirname(script_dir)
-)  # Go up two levels to project root
-user_info_path = os.path.join(project_root, "test", "data", "user_information.json")
-
-with open(user_info_path, "r") as file:
-    user_information = json.load(file)
-
-# Create company choices for selection
-company_choices = [
-    f"{user['company']} - {user['first_name']} {user['last_name']}"
-    for user in user_information
-]
-
-# Prompt user to select a company using questionary
-selected_company = questionary.select(
-    "What company would you like to analyze?", choices=company_choices
-).ask()
-
-# Get the selected company's information
-selected_company_name = selected_company.split(" - ")[0]
-user_information_selected = next(
-    user for user in user_information if user["company"] == selected_company_name
-)
-
-
-Defaults.drivers_config = OpenAiDriversConfig(
-    prompt_driver=OpenAiChatPromptDriver(model="gpt-4o-mini")
-)
-
-
-identity_ruleset = Ruleset(
-    name="User identity guidelines and information",
-    rules=[
-        Rule(
-            f"""
-            Your identity is as follows:
-            - First name: {user_information_selected["first_name"]}
-            - Last name: {user_information_selected["last_name"]}
-            - Company name: {user_information_selected["company"]}
-            - Company website: {user_information_selected["website"]}
-            - Job title: {user_information_selected["title"]}
-            - The user lives in: {user_information_selected["location"]["city"]}, {user_information_selected["location"]["country"]}
-            - Description of the product or service: {user_information_selected["product_description"]}
-            - The problems solved for the customer: {user_information_selected["value_props"]}
-            - Your booking calendar link as a call to action: {user_information_selected["calendar_link"]}
-
-            Always be factual and accurate about these details in your generation. 
+# Reserved for the model's answer when budgeting tokens per request
+OUTPUT_TOKENS = 300
 
-            """
-        ),
-    ],
-)
-web_search_tool = WebSearchTool(
-    web_search_driver=SerperWebSearchDriver(api_key=os.getenv("SERPER_API_KEY"))
-)
-web_scraper_tool = WebScraperTool(
-    web_loader=WebLoader(
-        web_scraper_driver=JinaWebScraperDriver(api_key=os.getenv("JINA_API_KEY"))
-    ),
-    off_prompt=False,
+# The part of a model result kept in the decision cache
+DECISION_FIELDS = (
+    "decided_by",
+    "follow_up_needed",
+    "explanation",
+    "thread_id_to_follow_up",
 )
 
-# Now proceed with processing using the confirmed number
-tasks = []
-for index, person in enumerate(people["people"][:NUM_PEOPLE_TO_PROCESS]):
-    rprint(
-        f"[blue]Processing:[/blue] [yellow]{person['name']}[/yellow] with email [green]{person['email']}[/green]"
-    )
+FOLLOWUP_PROMPT = """
 
-    followup_analysis_task = PromptTask(
-        input="""
-            
 You are an AI assistant tasked with analyzing customer interactions for a sales team. Your goal is to determine whether a follow-up or check-in is warranted based on the recent email exchanges and meetings with a prospect or customer.
 Your identity is as follows:
 - Your first name: {{user_first_name}}
@@ -208,7 +111,7 @@ Analyze the interactions carefully, paying attention to the following aspects:
 4. Promises or commitments made by either party
 5. The overall engagement level of the prospect/customer
 6. Mind that we will exclusively look to follow on emails that are sales and customer conversations for the sale of {{user_company}}. If it is about something else, mark it as no follow-up needed.
-7. Some interactions are initiated and run by a colleague of yours. Best way to check this is the domain name of the sender of the email and {{user_company}} If that is the case, mark it as no follow-up needed.
+7. Some interactions are initiated and run by a colleague of yours. Each email has a sender_role of "you", "colleague" or "contact"; if the conversation is run by a colleague, mark it as no follow-up needed.
 8. If the last interaction was a meeting conducted, a follow up is needed to either summarise or follow up with next steps regarding the meeting.
 
 Consider that a follow-up may be necessary if:
@@ -226,119 +129,510 @@ However, a follow-up might not be needed if:
 
 Based on your analysis, provide a recommendation on whether a follow-up is needed. Include a brief explanation of your reasoning.
 
-Present your results in the following terms: 
+Present your results in the following terms:
 - follow_up_needed: [Yes/No]
-- explanation: [Provide a short andconcise (max 2 sentences) explanation of your analysis and the key factors that influenced your decision] 
+- explanation: [Provide a short andconcise (max 2 sentences) explanation of your analysis and the key factors that influenced your decision]
 - thread_id_to_follow_up: [The thread ID (thread_id) of the interaction that the follow up should be sent to]
-            """,
-        output_schema=schema.Schema(
-            {
-                "follow_up_analysis": {
-                    "follow_up_needed": bool,
-                    "explanation": str,
-                    "thread_id_to_follow_up": str,
-                }
-            }
-        ),
-        id=f"followup_analysis_{index}",
-        rulesets=[identity_ruleset],
-        context={
-            "person": person,
-            "today_date": datetime.now().strftime("%Y-%m-%d"),
-            "user_first_name": user_information_selected["first_name"]
-            + " "
-            + user_information_selected["last_name"],
-            "user_email": user_information_selected["email"],
-            "user_company": user_information_selected["company"],
-        },
+            """
+
+
+def load_person_timeline(person_timeline_file):
+    # Check if file exists
+    if not os.path.exists(person_timeline_file):
+        print(f"Error: File not found: {person_timeline_file}")
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "total_people": 0,
+            "people": [],
+        }
+
+    # Embed the shared interaction records into each person's timeline
+    return PersonTimeline.load(person_timeline_file).to_legacy()
+
+
+def hydrate_email_bodies(people, email_store_dir, max_interactions=MAX_INTERACTIONS):
+    """Fetch the bodies a metadata-only Gmail sync left out, in place.
+
+    Only the threads of the interactions that make it into a person's
+    context are hydrated, through the Gmail fetcher's email store.
+    """
+    # Imported here so runs on fully fetched mail need no Gmail credentials
+    from email_store import EmailStore
+    from fetch_gmail import GmailFetcher
+
+    interactions = [
+        interaction
+        for person in people
+        for interaction in person.get("interactions", [])[:max_interactions]
+        if interaction.get("type") == "email"
+        and not interaction.get("body")
+        and interaction.get("thread_id")
+    ]
+    thread_ids = sorted({interaction["thread_id"] for interaction in interactions})
+    if not thread_ids:
+        return 0
+
+    fetcher = GmailFetcher()
+    fetcher.store = EmailStore(email_store_dir)
+    fetcher.authenticate()
+    fetcher.hydrate_threads(thread_ids)
+
+    bodies = {
+        message["id"]: message.get("body")
+        for thread_id in thread_ids
+        for message in fetcher.store.get_thread(thread_id)
+    }
+    hydrated = 0
+    for interaction in interactions:
+        if bodies.get(interaction.get("id")):
+            interaction["body"] = bodies[interaction["id"]]
+            hydrated += 1
+    return hydrated
+
+
+def load_user_information(user_info_path, company):
+    """Return the user_information.json entry of a company"""
+    with open(user_info_path, "r") as file:
+        user_information = json.load(file)
+
+    for user in user_information:
+        if user["company"].lower() == company.lower():
+            return user
+    companies = ", ".join(user["company"] for user in user_information)
+    raise ValueError(f"Unknown company {company!r}; expected one of: {companies}")
+
+
+def mark_sender_roles(person, domain_registry, user_emails):
+    """Copy a person's timeline, tagging who sent each email interaction"""
+    interactions = []
+    for interaction in person["interactions"]:
+        if interaction.get("type") == "email":
+            senders = parse_addresses(interaction.get("from", ""))
+            sender_email = senders[0][1] if senders else ""
+            if sender_email in user_emails:
+                sender_role = "you"
+            elif domain_registry.is_internal(sender_email):
+                sender_role = "colleague"
+            else:
+                sender_role = "contact"
+            interaction = {**interaction, "sender_role": sender_role}
+        interactions.append(interaction)
+    return {**person, "interactions": interactions}
+
+
+def build_identity_ruleset(user_information_selected):
+    return Ruleset(
+        name="User identity guidelines and information",
+        rules=[
+            Rule(
+                f"""
+            Your identity is as follows:
+            - First name: {user_information_selected["first_name"]}
+            - Last name: {user_information_selected["last_name"]}
+            - Company name: {user_information_selected["company"]}
+            - Company website: {user_information_selected["website"]}
+            - Job title: {user_information_selected["title"]}
+            - The user lives in: {user_information_selected["location"]["city"]}, {user_information_selected["location"]["country"]}
+            - Description of the product or service: {user_information_selected["product_description"]}
+            - The problems solved for the customer: {user_information_selected["value_props"]}
+            - Your booking calendar link as a call to action: {user_information_selected["calendar_link"]}
+
+            Always be factual and accurate about these details in your generation.
+
+            """
+            ),
+        ],
     )
 
-    tasks.append(followup_analysis_task)
 
-# Initialize output data structure before running the workflow
-output_data = {
-    "analysis_timestamp": datetime.now().isoformat(),
-    "total_people_analyzed": len(people["people"][:NUM_PEOPLE_TO_PROCESS]),
-    "user_company": user_information_selected["company"],
-    "follow_up_results": [],
-}
+def make_prompt_driver(provider, model):
+    """Build a prompt driver that fails fast; FollowUpRunner owns the retries"""
+    # Neither griptape (max_attempts) nor the SDK client (max_retries) may
+    # retry on their own, or each throttled call is retried several times over
+    if provider == "anthropic":
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        return AnthropicPromptDriver(
+            model=model,
+            api_key=api_key,
+            max_attempts=1,
+            client=import_optional_dependency("anthropic").Anthropic(
+                api_key=api_key, max_retries=0
+            ),
+        )
+    if provider == "google":
+        return GooglePromptDriver(
+            model=model, api_key=os.getenv("GOOGLE_API_KEY"), max_attempts=1
+        )
+    return OpenAiChatPromptDriver(
+        model=model, max_attempts=1, client=openai.OpenAI(max_retries=0)
+    )
+
+
+def is_rate_limit_error(exception):
+    """Check a provider SDK exception for an HTTP 429"""
+    if exception is None:
+        return False
+    response = getattr(exception, "response", None)
+    status = (
+        getattr(exception, "status_code", None)
+        or getattr(response, "status_code", None)
+        or getattr(exception, "code", None)
+    )
+    return status == 429 or type(exception).__name__ in (
+        "RateLimitError",
+        "ResourceExhausted",
+    )
 
-workflow = Workflow(tasks=[*tasks])
-print(StructureVisualizer(workflow).to_url())
 
-workflow.run()
+def retry_after_seconds(exception):
+    """The Retry-After header of a throttled response, if the SDK exposes it"""
+    headers = getattr(getattr(exception, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
 
-# Process all task results and collect them in the output data structure
-for task in workflow.tasks:
-    task_output = task.output.value if task.output else None
 
-    # Extract the person index from the task ID
-    task_id_parts = task.id.split("_")
-    if len(task_id_parts) > 1:
-        person_index = int(task_id_parts[-1])
-        person_data = people["people"][person_index]
+def make_analyzer(user_information_selected, identity_ruleset, prompt_driver):
+    """Build the blocking per-person analysis the runner calls from its threads"""
+    today_date = datetime.now().strftime("%Y-%m-%d")
 
-        # Process the nested follow_up_analysis structure
+    def analyze(payload):
+        index, person, person_context = payload
+        task_id = f"followup_analysis_{index}"
+        followup_analysis_task = PromptTask(
+            input=FOLLOWUP_PROMPT,
+            output_schema=schema.Schema(
+                {
+                    "follow_up_analysis": {
+                        "follow_up_needed": bool,
+                        "explanation": str,
+                        "thread_id_to_follow_up": str,
+                    }
+                }
+            ),
+            id=task_id,
+            rulesets=[identity_ruleset],
+            prompt_driver=prompt_driver,
+            context={
+                "person": person_context,
+                "today_date": today_date,
+                "user_first_name": user_information_selected["first_name"]
+                + " "
+                + user_information_selected["last_name"],
+                "user_email": user_information_selected["email"],
+                "user_company": user_information_selected["company"],
+            },
+        )
+        output = followup_analysis_task.run()
+
+        result = {
+            "task_id": task_id,
+            "person_name": person.get("name", "Unknown"),
+            "person_email": person.get("email", "Unknown"),
+        }
+        if isinstance(output, ErrorArtifact):
+            if is_rate_limit_error(output.exception):
+                raise RateLimitedError(
+                    output.value, retry_after_seconds(output.exception)
+                )
+            return {**result, "error": output.value}
+
+        task_output = output.value if output else None
+        print(f"Task id: {task_id}")
         if task_output and "follow_up_analysis" in task_output:
             analysis = task_output["follow_up_analysis"]
-
-            # Create a more accessible result structure
-            result = {
-                "task_id": task.id,
-                "person_name": person_data.get("name", "Unknown"),
-                "person_email": person_data.get("email", "Unknown"),
+            print(f"Follow-up needed: {analysis.get('follow_up_needed', False)}")
+            print(f"Explanation: {analysis.get('explanation', '')}")
+            print("-" * 80)
+            return {
+                **result,
+                "decided_by": "model",
                 "follow_up_needed": analysis.get("follow_up_needed", False),
                 "explanation": analysis.get("explanation", ""),
                 "thread_id_to_follow_up": analysis.get("thread_id_to_follow_up", ""),
             }
 
-            # Add this person's analysis to the results collection
-            output_data["follow_up_results"].append(result)
-        else:
-            # Handle case where output doesn't match expected structure
-            output_data["follow_up_results"].append(
+        # Handle case where output doesn't match expected structure
+        print(f"Task output: \n{task_output}")
+        print("-" * 80)
+        return {**result, "error": "Invalid output format", "raw_output": task_output}
+
+    return analyze
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(
+        description="Decide which contacts need a follow-up"
+    )
+    arg_parser.add_argument(
+        "--company", required=True, help="Company in user_information.json"
+    )
+    arg_parser.add_argument(
+        "--limit", type=int, default=None, help="Only the N most recent people"
+    )
+    arg_parser.add_argument(
+        "--timeline", default=os.path.join(SCRIPT_DIR, "person_timeline.json")
+    )
+    arg_parser.add_argument(
+        "--user-info",
+        default=os.path.join(PROJECT_ROOT, "test", "data", "user_information.json"),
+    )
+    arg_parser.add_argument("--provider", choices=sorted(PROVIDERS), default="openai")
+    arg_parser.add_argument("--model", default=None)
+    arg_parser.add_argument("--concurrency", type=int, default=4)
+    arg_parser.add_argument("--requests-per-minute", type=float, default=None)
+    arg_parser.add_argument("--tokens-per-minute", type=float, default=None)
+    arg_parser.add_argument("--max-retries", type=int, default=5)
+    arg_parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET)
+    arg_parser.add_argument(
+        "--results", default=None, help="JSON Lines stream of this run's results"
+    )
+    arg_parser.add_argument("--cache", default=None, help="Decision cache file")
+    arg_parser.add_argument(
+        "--hydrate-bodies",
+        action="store_true",
+        help="Fetch missing email bodies first (for mail synced with --metadata-only)",
+    )
+    arg_parser.add_argument(
+        "--email-store",
+        default="emails",
+        help="Email store directory of fetch_gmail.py, used by --hydrate-bodies",
+    )
+    arg_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-analyze everyone instead of reusing unchanged decisions",
+    )
+    arg_parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Start a new result stream instead of resuming an interrupted run",
+    )
+    return arg_parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    provider = PROVIDERS[args.provider]
+
+    user_information_selected = load_user_information(args.user_info, args.company)
+    people = load_person_timeline(args.timeline)["people"]
+    if args.limit is not None:
+        people = people[: args.limit]
+    rprint(f"[yellow]Will process {len(people)} people.[/yellow]")
+
+    # Colleagues are told apart by domain here rather than left to the model
+    domain_registry = InternalDomainRegistry.from_user_information(
+        user_information_selected
+    )
+    user_emails = {
+        user_information_selected[key].lower()
+        for key in ("email", "email_address")
+        if user_information_selected.get(key)
+    }
+    identity_ruleset = build_identity_ruleset(user_information_selected)
+    prompt_tokens = count_tokens(FOLLOWUP_PROMPT) + count_tokens(
+        identity_ruleset.rules[0].value
+    )
+    model = args.model or provider["model"]
+
+    company_slug = user_information_selected["company"].lower().replace(" ", "_")
+    decision_cache = None
+    if not args.no_cache:
+        decision_cache = DecisionCache(
+            args.cache
+            or os.path.join(SCRIPT_DIR, f"followup_decisions_{company_slug}.json")
+        ).load()
+    # Cached decisions are only valid for the same prompt, identity and model
+    cache_salt = "\x00".join(
+        [FOLLOWUP_PROMPT, identity_ruleset.rules[0].value, args.provider, model]
+    )
+
+    # Results are streamed as they are decided; an interrupted run resumes
+    # from the people whose result is still current: decided on the same
+    # last interaction and within the same age band as now
+    stream_file = args.results or os.path.join(
+        SCRIPT_DIR, f"followup_results_{company_slug}.jsonl"
+    )
+    now = datetime.now(timezone.utc)
+    last_interactions = {
+        person.get("email"): person.get("last_interaction_date") for person in people
+    }
+    completed = (
+        set()
+        if args.fresh
+        else completed_people(
+            stream_file,
+            lambda result: still_current(
+                result, last_interactions.get(result.get("person_email")), now
+            ),
+        )
+    )
+    if completed:
+        rprint(f"[yellow]Resuming: {len(completed)} people already done.[/yellow]")
+    sink = FollowUpResultSink(stream_file).open(resume=not args.fresh)
+
+    decided = 0
+    jobs = []
+    cache_keys = {}
+    candidates = []
+    for index, person in enumerate(people):
+        if person.get("email") in completed:
+            continue
+
+        # Settle the obvious cases with rules and only send the rest to the model
+        decision = prefilter_person(person, now, domain_registry, user_emails)
+        if decision is not None:
+            rprint(
+                f"[blue]Pre-filtered:[/blue] [yellow]{person['name']}[/yellow] ({decision['rule']})"
+            )
+            decided += 1
+            sink.append(
                 {
-                    "task_id": task.id,
-                    "person_name": person_data.get("name", "Unknown"),
-                    "person_email": person_data.get("email", "Unknown"),
-                    "error": "Invalid output format",
-                    "raw_output": task_output,
+                    "task_id": f"prefilter_{index}",
+                    "person_name": person.get("name", "Unknown"),
+                    "person_email": person.get("email", "Unknown"),
+                    "last_interaction_date": person.get("last_interaction_date"),
+                    "decided_by": "rules",
+                    **decision,
                 }
             )
+            continue
+        candidates.append((index, person))
+
+    if args.hydrate_bodies:
+        hydrated = hydrate_email_bodies(
+            [person for _, person in candidates], args.email_store
+        )
+        rprint(f"[yellow]Hydrated {hydrated} email bodies.[/yellow]")
+
+    for index, person in candidates:
+        # Summarize the timeline within a token budget instead of the full dict
+        person_context, context_tokens = build_person_context(
+            mark_sender_roles(person, domain_registry, user_emails),
+            token_budget=args.token_budget,
+        )
+
+        # Reuse yesterday's answer if neither the timeline nor its age band moved
+        cache_key = decision_key(
+            person_context, person.get("last_interaction_date"), now, cache_salt
+        )
+        cached = decision_cache.get(cache_key) if decision_cache else None
+        if cached is not None:
+            rprint(
+                f"[blue]Cached:[/blue] [yellow]{person['name']}[/yellow] with email [green]{person['email']}[/green]"
+            )
+            decided += 1
+            sink.append(
+                {
+                    "task_id": f"followup_analysis_{index}",
+                    "person_name": person.get("name", "Unknown"),
+                    "person_email": person.get("email", "Unknown"),
+                    "last_interaction_date": person.get("last_interaction_date"),
+                    **cached,
+                    "cached": True,
+                }
+            )
+            continue
+
+        rprint(
+            f"[blue]Queued:[/blue] [yellow]{person['name']}[/yellow] with email [green]{person['email']}[/green] ({context_tokens} context tokens)"
+        )
+        cache_keys[person["email"]] = cache_key
+        jobs.append(
+            FollowUpJob(
+                key=person["email"],
+                tokens=prompt_tokens + context_tokens + OUTPUT_TOKENS,
+                payload=(index, person, person_context),
+            )
+        )
 
-    # Print task results to console
-    print(f"Task id: {task.id}")
-    if task_output and "follow_up_analysis" in task_output:
-        analysis = task_output["follow_up_analysis"]
-        print(f"Follow-up needed: {analysis.get('follow_up_needed', False)}")
-        print(f"Explanation: {analysis.get('explanation', '')}")
-    else:
-        print(f"Task output: \n{task_output}")
-    print("-" * 80)
+    rprint(
+        f"[yellow]Rules or cache decided {decided} people; "
+        f"{len(jobs)} go to the model.[/yellow]"
+    )
 
-# After collecting all results, sort them so follow-ups needed appear first
-output_data["follow_up_results"] = sorted(
-    output_data["follow_up_results"],
-    key=lambda x: (not x.get("follow_up_needed", False)),
-)
+    def on_result(job, result):
+        index, person, _ = job.payload
+        if decision_cache is not None and "error" not in result:
+            decision_cache.put(
+                cache_keys[job.key],
+                {key: result[key] for key in DECISION_FIELDS if key in result},
+            )
+            # Persist every few decisions, so a crash loses at most a handful;
+            # rewriting the whole file per result would grow quadratically
+            decision_cache.save_if_due()
+        sink.append(
+            {
+                "task_id": f"followup_analysis_{index}",
+                "person_name": person.get("name", "Unknown"),
+                "person_email": person.get("email", "Unknown"),
+                "last_interaction_date": person.get("last_interaction_date"),
+                **result,
+            }
+        )
 
-# Save all results to a single file with timestamp
-output_file = os.path.join(
-    os.path.dirname(__file__),
-    f"followup_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-)
+    runner = FollowUpRunner(
+        make_analyzer(
+            user_information_selected,
+            identity_ruleset,
+            make_prompt_driver(args.provider, model),
+        ),
+        on_result,
+        concurrency=args.concurrency,
+        requests_per_minute=args.requests_per_minute
+        or provider["requests_per_minute"],
+        tokens_per_minute=args.tokens_per_minute or provider["tokens_per_minute"],
+        max_retries=args.max_retries,
+    )
+    try:
+        asyncio.run(runner.run(jobs))
+    finally:
+        sink.close()
+        if decision_cache is not None:
+            decision_cache.save()
+
+    # Compact the stream into the summary, follow-ups needed first
+    run_stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_data = compact_results(
+        stream_file,
+        {
+            "analysis_timestamp": datetime.now().isoformat(),
+            "total_people_analyzed": len(people),
+            "user_company": user_information_selected["company"],
+            "people_sent_to_model": len(jobs),
+            "cached_decisions": decision_cache.hits if decision_cache else 0,
+        },
+    )
 
-with open(output_file, "w") as f:
-    json.dump(output_data, f, indent=2)
+    # Save all results to a single file with timestamp
+    output_file = os.path.join(SCRIPT_DIR, f"followup_analysis_{run_stamp}.json")
 
-# Count how many follow-ups are needed for the summary
-follow_ups_count = sum(
-    1
-    for result in output_data["follow_up_results"]
-    if result.get("follow_up_needed", False)
-)
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
 
-rprint(f"\n[green]Analysis results saved to: {output_file}[/green]")
-rprint(
-    f"[yellow]Found {follow_ups_count} out of {len(output_data['follow_up_results'])} contacts requiring follow-up[/yellow]"
-)
+    errors = [r for r in output_data["follow_up_results"] if "error" in r]
+    if errors:
+        rprint(
+            f"[red]{len(errors)} analyses failed; rerun to retry them, finished ones are kept in {stream_file}[/red]"
+        )
+    else:
+        # Keep the stream next to its summary so the next run starts afresh
+        os.replace(stream_file, os.path.splitext(output_file)[0] + ".jsonl")
+
+    # Count how many follow-ups are needed for the summary
+    follow_ups_count = sum(
+        1
+        for result in output_data["follow_up_results"]
+        if result.get("follow_up_needed", False)
+    )
+
+    rprint(f"\n[green]Analysis results saved to: {output_file}[/green]")
+    rprint(
+        f"[yellow]Found {follow_ups_count} out of {len(output_data['follow_up_results'])} contacts requiring follow-up[/yellow]"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import json
+import os
+from datetime import datetime, timezone
+
+
+class FollowUpResultSink:
+    """Append-only JSON Lines stream of follow-up results for one run.
+
+    Every result is written and flushed as soon as it is known, so readers
+    see early results and a crash loses at most the line being written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def open(self, resume=True):
+        """Open the stream, keeping the lines of an interrupted run if resuming"""
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        if resume and self._file.tell() > 0:
+            # Terminate a line cut short by a crash before appending after it
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write("\n")
+        return self
+
+    def append(self, result):
+        """Write a result, stamped with when it was decided"""
+        if "analyzed_at" not in result:
+            result = {**result, "analyzed_at": datetime.now(timezone.utc).isoformat()}
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_results(path):
+    """Yield the results in a stream, skipping a line cut short by a crash"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def latest_results(path):
+    """The last result written for each person"""
+    results = {}
+    for result in read_results(path):
+        results[result.get("person_email")] = result
+    return results
+
+
+def completed_people(path, is_current=None):
+    """People with a successful result in the stream.
+
+    is_current, if given, is called with each result and drops the ones
+    that no longer hold.
+    """
+    return {
+        email
+        for email, result in latest_results(path).items()
+        if "error" not in result and (is_current is None or is_current(result))
+    }
+
+
+def compact_results(path, summary):
+    """Build the sorted summary view of a result stream.
+
+    summary holds the run metadata; the latest result per person is added
+    under follow_up_results with follow-ups needed first.
+    """
+    results = list(latest_results(path).values())
+    return {
+        **summary,
+        "follow_up_results": sorted(
+            results, key=lambda x: (not x.get("follow_up_needed", False))
+        ),
+    }
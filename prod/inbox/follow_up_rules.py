@@ -0,0 +1,113 @@
+import re
+from datetime import timedelta
+
+from address_parsing import parse_addresses
+from date_parsing import parse_datetime, to_utc
+
+# A last email this recent needs no follow-up yet (the prompt says 2-3 days)
+RECENT_DAYS = 2
+
+AUTOMATED_SENDER_RE = re.compile(
+    r"^(no-?reply|do-?not-?reply|newsletters?|notifications?|notify|"
+    r"mailer-daemon|bounces?|updates|digest|marketing)\b"
+)
+
+
+def sender_email(interaction):
+    """The sender address of an email interaction"""
+    senders = parse_addresses(interaction.get("from", ""))
+    return senders[0][1] if senders else ""
+
+
+def is_automated_sender(email):
+    """Check for no-reply and bulk mail addresses"""
+    return bool(AUTOMATED_SENDER_RE.match(email.split("@", 1)[0]))
+
+
+def is_newsletter(email_interactions):
+    """Every message came from a bulk sender or carries an unsubscribe link"""
+    return all(
+        is_automated_sender(sender_email(i))
+        or "unsubscribe" in (i.get("body") or "").lower()
+        for i in email_interactions
+    )
+
+
+def meeting_did_not_happen(event, person):
+    """The event was cancelled, or you or the person declined it"""
+    if event.get("status") == "cancelled":
+        return True
+    for attendee in event.get("attendees", []):
+        is_party = attendee.get("self") or (
+            attendee.get("email", "").lower() == person.get("email")
+        )
+        if is_party and attendee.get("response_status") == "declined":
+            return True
+    return False
+
+
+def decide(rule, explanation):
+    return {
+        "follow_up_needed": False,
+        "explanation": explanation,
+        "thread_id_to_follow_up": "",
+        "rule": rule,
+    }
+
+
+def prefilter_person(person, now, domain_registry, user_emails):
+    """Decide the obvious no-follow-up cases without the model.
+
+    Returns a follow-up analysis for the person, or None when the timeline
+    is ambiguous and should go to the model.
+    """
+    interactions = person.get("interactions", [])
+    if not interactions:
+        return decide("no_interactions", "There are no interactions with this person.")
+
+    emails = [i for i in interactions if i.get("type") == "email"]
+    outbound = [i for i in emails if i.get("direction") == "outbound"]
+    has_meetings = len(emails) < len(interactions)
+
+    if emails and not outbound and not has_meetings:
+        if is_automated_sender(person.get("email", "")) or is_newsletter(emails):
+            return decide(
+                "newsletter", "Only automated or bulk messages from this sender."
+            )
+        return decide(
+            "no_outbound",
+            "We never wrote to or met this person, so there is nothing to follow up on.",
+        )
+
+    # Colleague-run conversations are not ours to follow up on
+    outbound_senders = {sender_email(i) for i in outbound}
+    if (
+        outbound_senders
+        and not has_meetings
+        and not outbound_senders & user_emails
+        and all(domain_registry.is_internal(s) for s in outbound_senders)
+    ):
+        return decide(
+            "colleague_thread", "The conversation is run by a colleague, not by you."
+        )
+
+    last = interactions[0]
+    if last.get("type") == "calendar" and meeting_did_not_happen(last, person):
+        return decide(
+            "meeting_not_held",
+            "The last meeting was cancelled or declined, so there is nothing to recap.",
+        )
+
+    # A recent meeting still warrants a summary, so only recent emails count
+    last_time = parse_datetime(last.get("timestamp", ""))
+    if (
+        last.get("type") == "email"
+        and last_time is not None
+        and now - to_utc(last_time) < timedelta(days=RECENT_DAYS)
+    ):
+        return decide(
+            "very_recent",
+            f"The last email was less than {RECENT_DAYS} days ago.",
+        )
+
+    return None
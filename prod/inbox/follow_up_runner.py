@@ -0,0 +1,89 @@
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Any
+
+from aiolimiter import AsyncLimiter
+
+
+class RateLimitedError(Exception):
+    """The model provider answered 429; retry after a pause"""
+
+    def __init__(self, message="rate limited", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class FollowUpJob:
+    """One person to analyze, with the tokens the request is expected to use"""
+
+    key: str
+    tokens: int
+    payload: Any
+
+
+class FollowUpRunner:
+    """Run follow-up analyses concurrently under request and token rate limits.
+
+    analyze is a blocking callable taking a job payload and returning a
+    result dict, with an "error" key if the analysis failed; it raises
+    RateLimitedError when the provider throttles. on_result is called with
+    each job and its result as soon as it finishes, which is where results
+    are persisted.
+    """
+
+    def __init__(
+        self,
+        analyze,
+        on_result,
+        concurrency=4,
+        requests_per_minute=500,
+        tokens_per_minute=200_000,
+        max_retries=5,
+    ):
+        self.analyze = analyze
+        self.on_result = on_result
+        self.concurrency = concurrency
+        self.request_limiter = AsyncLimiter(requests_per_minute, 60)
+        self.token_limiter = AsyncLimiter(tokens_per_minute, 60)
+        self.max_retries = max_retries
+
+    async def run_job(self, job, semaphore):
+        """Analyze one person, backing off and retrying while rate limited"""
+        # A single request can never take more than the whole token budget
+        tokens = min(job.tokens, self.token_limiter.max_rate)
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                await self.request_limiter.acquire()
+                await self.token_limiter.acquire(tokens)
+                try:
+                    return await asyncio.to_thread(self.analyze, job.payload)
+                except RateLimitedError as e:
+                    retry_after = e.retry_after
+                except Exception as e:
+                    print(f"Analysis of {job.key} failed: {e}")
+                    return {"error": str(e)}
+
+            if attempt < self.max_retries:
+                # Retry-After: 0 means retry now, not fall back to backoff
+                if retry_after is not None:
+                    delay = retry_after
+                else:
+                    delay = min(2**attempt + random.random(), 60)
+                print(f"Rate limited on {job.key}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        return {"error": "Rate limited, retries exhausted"}
+
+    async def run(self, jobs):
+        """Run every job and return their results by job key"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = {}
+
+        async def run_and_record(job):
+            results[job.key] = await self.run_job(job, semaphore)
+            self.on_result(job, results[job.key])
+
+        await asyncio.gather(*(run_and_record(job) for job in jobs))
+        return results
@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from urllib.parse import quote
+
+import aiohttp
+from aiolimiter import AsyncLimiter
+
+from calendar_record import build_calendar_output, parse_event
+from email_store import EmailStore
+from message_record import parse_api_message
+
+GOOGLE_API_BASE_URL = "https://www.googleapis.com"
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+
+
+class GoogleApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"Google API returned {status}: {message}")
+        self.status = status
+
+
+@dataclass
+class Account:
+    """A seat whose mailbox and calendar we ingest with a stored refresh token"""
+
+    account_id: str
+    refresh_token: str
+    client_id: str
+    client_secret: str
+    access_token: Optional[str] = None
+    token_expires_at: float = 0.0
+
+
+@dataclass
+class AccountMetrics:
+    account_id: str
+    requests: int = 0
+    messages: int = 0
+    events: int = 0
+    errors: List[str] = field(default_factory=list)
+    latencies: List[float] = field(default_factory=list)
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+    def summary(self):
+        """Throughput and latency figures for the report"""
+        elapsed = max(self.finished_at - self.started_at, 1e-9)
+        latencies = sorted(self.latencies)
+        p95_index = max(int(len(latencies) * 0.95) - 1, 0)
+        return {
+            "account_id": self.account_id,
+            "requests": self.requests,
+            "messages": self.messages,
+            "events": self.events,
+            "errors": len(self.errors),
+            "elapsed_seconds": round(elapsed, 3),
+            "items_per_second": round((self.messages + self.events) / elapsed, 2),
+            "requests_per_second": round(self.requests / elapsed, 2),
+            "latency_p50_ms": (
+                round(statistics.median(latencies) * 1000, 1) if latencies else None
+            ),
+            "latency_p95_ms": (
+                round(latencies[p95_index] * 1000, 1) if latencies else None
+            ),
+        }
+
+
+@dataclass
+class AccountRun:
+    """Per-account state for a single ingestion run"""
+
+    account: Account
+    limiter: AsyncLimiter
+    semaphore: asyncio.Semaphore
+    metrics: AccountMetrics
+    store_dir: str
+    token_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+def load_accounts(accounts_file, client_secrets_file="client_secrets.json"):
+    """Load accounts from JSON, filling OAuth client details from client secrets"""
+    with open(accounts_file, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    client = {}
+    if os.path.exists(client_secrets_file):
+        with open(client_secrets_file, "r", encoding="utf-8") as f:
+            secrets = json.load(f)
+        client = secrets.get("installed") or secrets.get("web") or {}
+
+    return [
+        Account(
+            account_id=entry["account_id"],
+            refresh_token=entry["refresh_token"],
+            client_id=entry.get("client_id", client.get("client_id", "")),
+            client_secret=entry.get("client_secret", client.get("client_secret", "")),
+        )
+        for entry in entries
+    ]
+
+
+class InboxIngestionService:
+    """Fetch Gmail and Calendar data for many accounts concurrently.
+
+    Requests are throttled by a global limiter shared by all accounts and a
+    per-account limiter, and each account has a cap on in-flight requests.
+    Every account writes into its own directory under data_dir.
+    """
+
+    def __init__(
+        self,
+        accounts,
+        data_dir="accounts",
+        api_base_url=GOOGLE_API_BASE_URL,
+        token_url=GOOGLE_TOKEN_URL,
+        global_requests_per_second=50,
+        account_requests_per_second=10,
+        account_concurrency=5,
+        max_messages=None,
+        weeks_back=4,
+        max_retries=5,
+    ):
+        self.accounts = accounts
+        self.data_dir = data_dir
+        self.api_base_url = api_base_url.rstrip("/")
+        self.token_url = token_url
+        self.global_limiter = AsyncLimiter(global_requests_per_second, 1)
+        self.account_requests_per_second = account_requests_per_second
+        self.account_concurrency = account_concurrency
+        self.max_messages = max_messages
+        self.weeks_back = weeks_back
+        self.max_retries = max_retries
+        self.session = None
+
+    async def run(self):
+        """Ingest every account and return their metrics summaries"""
+        timeout = aiohttp.ClientTimeout(total=60)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            self.session = session
+            metrics = await asyncio.gather(
+                *(self.ingest_account(account) for account in self.accounts)
+            )
+        self.session = None
+        return [m.summary() for m in metrics]
+
+    async def refresh_access_token(self, run):
+        """Exchange the account's refresh token for an access token"""
+        account = run.account
+        async with run.token_lock:
+            # Another request may have refreshed while we waited for the lock
+            if account.access_token and time.monotonic() < account.token_expires_at:
+                return
+            await self.request_access_token(run)
+
+    async def request_access_token(self, run):
+        """Call the OAuth token endpoint for the account"""
+        account = run.account
+        async with self.session.post(
+            self.token_url,
+            data={
+                "grant_type": "refresh_token",
+                "refresh_token": account.refresh_token,
+                "client_id": account.client_id,
+                "client_secret": account.client_secret,
+            },
+        ) as response:
+            run.metrics.requests += 1
+            if response.status != 200:
+                raise GoogleApiError(response.status, await response.text())
+            token = await response.json()
+
+        account.access_token = token["access_token"]
+        # Refresh a minute early so in-flight requests never carry a stale token
+        account.token_expires_at = time.monotonic() + token.get("expires_in", 3600) - 60
+
+    async def request(self, run, path, params=None):
+        """GET a Google API path under both rate limits.
+
+        429s, 5xxs, dropped connections and timeouts are retried with backoff.
+        """
+        for attempt in range(self.max_retries + 1):
+            if run.account.access_token is None or (
+                time.monotonic() >= run.account.token_expires_at
+            ):
+                await self.refresh_access_token(run)
+
+            try:
+                async with run.semaphore:
+                    async with self.global_limiter, run.limiter:
+                        started = time.perf_counter()
+                        async with self.session.get(
+                            f"{self.api_base_url}{path}",
+                            params=params,
+                            headers={
+                                "Authorization": f"Bearer {run.account.access_token}"
+                            },
+                        ) as response:
+                            body = await response.text()
+                            run.metrics.requests += 1
+                            run.metrics.latencies.append(
+                                time.perf_counter() - started
+                            )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            else:
+                if response.status == 200:
+                    return json.loads(body)
+                error = GoogleApiError(response.status, body)
+                if response.status == 401:
+                    run.account.access_token = None
+                elif response.status not in (429, 500, 502, 503, 504):
+                    raise error
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(min(2**attempt + random.random(), 64))
+
+        raise error
+
+    async def list_all(self, run, path, params, items_key, max_items=None):
+        """Follow nextPageToken through a list endpoint"""
+        # Params are (name, value) pairs since Gmail repeats labelIds
+        items = []
+        page_params = list(params)
+        while max_items is None or len(items) < max_items:
+            response = await self.request(run, path, page_params)
+            items.extend(response.get(items_key, []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                break
+            page_params = list(params) + [("pageToken", page_token)]
+        return items if max_items is None else items[:max_items]
+
+    async def ingest_account(self, account):
+        """Fetch Gmail and Calendar for one account, isolating its failures"""
+        run = AccountRun(
+            account=account,
+            limiter=AsyncLimiter(self.account_requests_per_second, 1),
+            semaphore=asyncio.Semaphore(self.account_concurrency),
+            metrics=AccountMetrics(account_id=account.account_id),
+            store_dir=os.path.join(self.data_dir, account.account_id),
+        )
+        run.metrics.started_at = time.perf_counter()
+        os.makedirs(run.store_dir, exist_ok=True)
+
+        results = await asyncio.gather(
+            self.ingest_gmail(run), self.ingest_calendar(run), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                run.metrics.errors.append(str(result))
+                print(f"[{account.account_id}] Ingestion error: {result}")
+
+        run.metrics.finished_at = time.perf_counter()
+        return run.metrics
+
+    async def ingest_gmail(self, run):
+        """Fetch primary inbox and sent mail into the account's email store"""
+        message_ids = {}
+        for label_ids in (["INBOX", "CATEGORY_PERSONAL"], ["SENT"]):
+            messages = await self.list_all(
+                run,
+                "/gmail/v1/users/me/messages",
+                [("labelIds", label) for label in label_ids] + [("maxResults", 500)],
+                "messages",
+                max_items=self.max_messages,
+            )
+            for message in messages:
+                message_ids[message["id"]] = message
+
+        async def fetch(message_id):
+            try:
+                msg = await self.request(
+                    run,
+                    f"/gmail/v1/users/me/messages/{message_id}",
+                    [("format", "full")],
+                )
+                return parse_api_message(msg).to_record()
+            except (GoogleApiError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # One failing message should not sink the whole account
+                run.metrics.errors.append(f"message {message_id}: {e!r}")
+                return None
+
+        records = await asyncio.gather(*(fetch(m) for m in message_ids))
+        records = [record for record in records if record is not None]
+
+        store = EmailStore(os.path.join(run.store_dir, "emails"))
+        store.reset()
+        store.append(records)
+        run.metrics.messages += len(records)
+
+    async def ingest_calendar(self, run):
+        """Fetch recent events of every calendar into calendar_events.json"""
+        now = datetime.now(timezone.utc)
+        start_time = (now - timedelta(weeks=self.weeks_back)).isoformat()
+        end_time = now.isoformat()
+
+        calendars = await self.list_all(
+            run, "/calendar/v3/users/me/calendarList", [], "items"
+        )
+
+        async def fetch(calendar):
+            # Shared and holiday calendar IDs contain '#' and '@'
+            calendar_path = quote(calendar["id"], safe="")
+            try:
+                events = await self.list_all(
+                    run,
+                    f"/calendar/v3/calendars/{calendar_path}/events",
+                    [
+                        ("timeMin", start_time),
+                        ("timeMax", end_time),
+                        ("singleEvents", "true"),
+                        ("maxResults", 2500),
+                    ],
+                    "items",
+                )
+            except (GoogleApiError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # One failing calendar should not sink the account's others
+                run.metrics.errors.append(f"calendar {calendar['id']}: {e!r}")
+                return []
+            return [
+                parse_event(event, calendar["id"], calendar["summary"], now)
+                for event in events
+            ]
+
+        all_events = []
+        for events in await asyncio.gather(*(fetch(c) for c in calendars)):
+            all_events.extend(events)
+
+        output_data = build_calendar_output(
+            all_events,
+            {
+                "start": start_time,
+                "end": end_time,
+                "weeks_back": self.weeks_back,
+                "weeks_forward": 0,
+            },
+        )
+        output_file = os.path.join(run.store_dir, "calendar_events.json")
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(output_data, f, indent=2, ensure_ascii=False)
+        run.metrics.events += len(all_events)
+
+
+def print_report(summaries):
+    print("\nIngestion report:")
+    for s in summaries:
+        print(
+            f"{s['account_id']}: {s['messages']} messages, {s['events']} events, "
+            f"{s['requests']} requests, {s['errors']} errors in "
+            f"{s['elapsed_seconds']}s ({s['items_per_second']} items/s, "
+            f"p50 {s['latency_p50_ms']}ms, p95 {s['latency_p95_ms']}ms)"
+        )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Ingest Gmail and Calendar data for many accounts"
+    )
+    arg_parser.add_argument("accounts_file", help="JSON list of accounts")
+    arg_parser.add_argument("--data-dir", default="accounts")
+    arg_parser.add_argument("--api-base-url", default=GOOGLE_API_BASE_URL)
+    arg_parser.add_argument("--token-url", default=GOOGLE_TOKEN_URL)
+    arg_parser.add_argument("--global-rps", type=float, default=50)
+    arg_parser.add_argument("--account-rps", type=float, default=10)
+    arg_parser.add_argument("--account-concurrency", type=int, default=5)
+    arg_parser.add_argument("--max-messages", type=int, default=None)
+    arg_parser.add_argument("--weeks-back", type=int, default=4)
+    args = arg_parser.parse_args()
+
+    service = InboxIngestionService(
+        load_accounts(args.accounts_file),
+        data_dir=args.data_dir,
+        api_base_url=args.api_base_url,
+        token_url=args.token_url,
+        global_requests_per_second=args.global_rps,
+        account_requests_per_second=args.account_rps,
+        account_concurrency=args.account_concurrency,
+        max_messages=args.max_messages,
+        weeks_back=args.weeks_back,
+    )
+    print_report(asyncio.run(service.run()))
+
+
+if __name__ == "__main__":
+    main()
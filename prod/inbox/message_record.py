@@ -0,0 +1,182 @@
+import base64
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from address_parsing import parse_address_list
+from date_parsing import parse_epoch
+from text_normalizer import clean_text
+
+
+def index_headers(headers):
+    """Map lower-cased header names to their first value"""
+    index = {}
+    for header in headers:
+        index.setdefault(header["name"].lower(), header["value"])
+    return index
+
+
+def message_timestamp(record):
+    """Return the epoch timestamp of a stored message record"""
+    if "timestamp" in record:
+        return record["timestamp"]
+    return parse_epoch(record.get("date"))
+
+
+@dataclass(slots=True)
+class ParsedMessage:
+    """A Gmail message parsed once: headers indexed, date and addresses pre-parsed"""
+
+    id: str
+    thread_id: str
+    subject: str
+    sender: str
+    to: str
+    date: str
+    snippet: str
+    body: Optional[str] = None
+    labels: Optional[List[str]] = None
+    hydrated: bool = True
+    headers: Optional[Dict[str, str]] = None
+    timestamp: Optional[float] = None
+    from_addresses: Optional[List[Tuple[str, str]]] = None
+    to_addresses: Optional[List[Tuple[str, str]]] = None
+
+    def __post_init__(self):
+        if self.labels is None:
+            self.labels = []
+        if self.headers is None:
+            self.headers = {}
+        if self.timestamp is None:
+            self.timestamp = parse_epoch(self.date)
+        if self.from_addresses is None:
+            self.from_addresses = parse_address_list(self.sender)
+        if self.to_addresses is None:
+            self.to_addresses = parse_address_list(self.to)
+
+    @property
+    def sender_email(self):
+        """The first sender address, or an empty string"""
+        return self.from_addresses[0][1] if self.from_addresses else ""
+
+    @property
+    def sender_name(self):
+        """The display name of the first sender, or an empty string"""
+        return self.from_addresses[0][0] if self.from_addresses else ""
+
+    @property
+    def addresses(self):
+        """Every sender and recipient address of the message"""
+        return [address for _, address in self.from_addresses + self.to_addresses]
+
+    @classmethod
+    def from_record(cls, record):
+        """Rebuild a message from its stored dict, parsing only what is missing"""
+        from_addresses = record.get("from_addresses")
+        to_addresses = record.get("to_addresses")
+        return cls(
+            id=record.get("id", ""),
+            thread_id=record.get("thread_id", ""),
+            subject=record.get("subject", ""),
+            sender=record.get("from", ""),
+            to=record.get("to", ""),
+            date=record.get("date", ""),
+            snippet=record.get("snippet", ""),
+            body=record.get("body"),
+            labels=record.get("labels"),
+            hydrated=record.get("hydrated", True),
+            timestamp=record.get("timestamp"),
+            from_addresses=(
+                [tuple(a) for a in from_addresses]
+                if from_addresses is not None
+                else None
+            ),
+            to_addresses=(
+                [tuple(a) for a in to_addresses] if to_addresses is not None else None
+            ),
+        )
+
+    def to_record(self):
+        """Serialize to the stored dict layout (headers are not persisted)"""
+        return {
+            "id": self.id,
+            "thread_id": self.thread_id,
+            "subject": self.subject,
+            "from": self.sender,
+            "to": self.to,
+            "date": self.date,
+            "snippet": self.snippet,
+            "body": self.body,
+            "labels": self.labels,
+            "hydrated": self.hydrated,
+            "timestamp": self.timestamp,
+            "from_addresses": [list(a) for a in self.from_addresses],
+            "to_addresses": [list(a) for a in self.to_addresses],
+        }
+
+
+def extract_plain_text_body(payload):
+    """Extract only plain text body from email payload"""
+    body = ""
+
+    if payload.get("body") and payload["body"].get("data"):
+        # Handle single-part message
+        data = base64.urlsafe_b64decode(
+            payload["body"]["data"].encode("UTF-8")
+        ).decode("UTF-8")
+        if payload.get("mimeType") == "text/plain":
+            body = data
+
+    elif payload.get("parts"):
+        # Handle multipart message
+        for part in payload["parts"]:
+            mimeType = part.get("mimeType")
+            if part.get("body") and part["body"].get("data"):
+                data = base64.urlsafe_b64decode(
+                    part["body"]["data"].encode("UTF-8")
+                ).decode("UTF-8")
+                if mimeType == "text/plain":
+                    body = data
+                    break  # Stop after finding plain text
+
+            # Handle nested multipart messages
+            if part.get("parts"):
+                nested_body = extract_plain_text_body(part)
+                if nested_body:
+                    body = nested_body
+                    break
+
+    return body
+
+
+def parse_api_message(msg, include_body=True):
+    """Convert a Gmail API message into a ParsedMessage"""
+    # Index the headers once instead of scanning the list per field
+    headers = index_headers(msg["payload"]["headers"])
+
+    fields = {
+        "subject": headers.get("subject", "No subject"),
+        "from": headers.get("from", "Unknown"),
+        "to": headers.get("to", "Unknown"),
+        "date": headers.get("date", "Unknown"),
+        "snippet": msg.get("snippet", ""),
+    }
+    if include_body:
+        fields["body"] = extract_plain_text_body(msg["payload"])
+
+    # Joining the fields to clean them in one pass benchmarks no faster
+    # (test/clean_text_benchmark.py), so each is cleaned on its own
+    cleaned = {key: clean_text(value) for key, value in fields.items()}
+
+    return ParsedMessage(
+        id=msg["id"],
+        thread_id=msg["threadId"],
+        subject=cleaned["subject"],
+        sender=cleaned["from"],
+        to=cleaned["to"],
+        date=cleaned["date"],
+        snippet=cleaned["snippet"],
+        body=cleaned["body"] if include_body else None,
+        labels=msg.get("labelIds", []),
+        hydrated=include_body,
+        headers=headers,
+    )
@@ -30,6 +30,7 @@ from griptape.structures import Agent, Pipeline, Workflow
 from extension.drivers.serper_web_search_driver.serper_web_search_driver import (
     SerperWebSearchDriver,
 )
+from extension.drivers.serper_web_search_driver.serper_cache import default_cache
 from extension.drivers.jina_web_scraper_driver.jina_web_scraper_driver import (
     JinaWebScraperDriver,
 )
@@ -81,7 +82,9 @@ Defaults.drivers_config = OpenAiDriversConfig(
 )
 
 web_search_tool = WebSearchTool(
-    web_search_driver=SerperWebSearchDriver(api_key=os.getenv("SERPER_API_KEY"))
+    web_search_driver=SerperWebSearchDriver(
+        api_key=os.getenv("SERPER_API_KEY"), cache=default_cache()
+    )
 )
 
 web_scraper_tool = WebScraperTool(
@@ -172,7 +175,10 @@ for index, company in enumerate(accounts_tracked):
         tools=[
             WebSearchTool(
                 web_search_driver=SerperWebSearchDriver(
-                    api_key=os.getenv("SERPER_API_KEY"), num=50, date_range="m"
+                    api_key=os.getenv("SERPER_API_KEY"),
+                    num=50,
+                    date_range="m",
+                    cache=default_cache(),
                 )
             )
         ],
@@ -0,0 +1,24 @@
+import re
+
+# Define ranges of invisible characters to remove
+INVISIBLE_CHARS = (
+    # Zero-width characters
+    "\u200B-\u200D\uFEFF"  # Zero-width space, joiner, non-joiner, and BOM
+    # Various spaces
+    "\u2000-\u200A"  # Different width spaces
+    "\u2028\u2029"  # Line and paragraph separators
+    "\u00A0"  # Non-breaking space
+)
+# A single-character class benchmarks faster than a "+" run here, and
+# str.translate with a deletion table is slower still on non-ASCII text
+INVISIBLE_CHARS_RE = re.compile(f"[{INVISIBLE_CHARS}]")
+
+
+def clean_text(text):
+    """Remove invisible Unicode characters and normalize whitespace"""
+    if not text:
+        return ""
+    # str.split() with no argument splits on the same characters as the
+    # regex \s class and drops leading/trailing runs, so this matches
+    # re.sub(r"\s+", " ", text).strip() at a fraction of the cost
+    return " ".join(INVISIBLE_CHARS_RE.sub("", text).split())
@@ -0,0 +1,69 @@
+import json
+
+# Version 2 stores each interaction once, keyed by ID, and people list the
+# IDs of their interactions; files without a format_version embed full
+# interaction copies in every person's "interactions" list
+TIMELINE_FORMAT_VERSION = 2
+
+
+def build_timeline_output(people, interactions, timestamp):
+    """Build the person_timeline.json structure from people and interactions"""
+    return {
+        "format_version": TIMELINE_FORMAT_VERSION,
+        "timestamp": timestamp,
+        "total_people": len(people),
+        "people": people,
+        "interactions": interactions,
+    }
+
+
+class PersonTimeline:
+    """Read access to person_timeline.json in either the old or new layout"""
+
+    def __init__(self, data):
+        self.data = data
+        self.interactions = data.get("interactions", {})
+        self._people = None
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def is_indexed(self):
+        return self.data.get("format_version", 1) >= 2
+
+    @property
+    def timestamp(self):
+        return self.data.get("timestamp", "")
+
+    def interactions_for(self, person):
+        """A person's interactions, newest first"""
+        if "interactions" in person:
+            return person["interactions"]
+        return [self.interactions[i] for i in person.get("interaction_ids", [])]
+
+    def materialize(self, person):
+        """Return a person in the old shape, with interactions embedded"""
+        if not self.is_indexed:
+            return person
+        # Interaction dicts are shared between people, not copied
+        materialized = {k: v for k, v in person.items() if k != "interaction_ids"}
+        materialized["interactions"] = self.interactions_for(person)
+        return materialized
+
+    @property
+    def people(self):
+        """Every person in the old shape, most recent interaction first"""
+        if self._people is None:
+            self._people = [self.materialize(p) for p in self.data.get("people", [])]
+        return self._people
+
+    def to_legacy(self):
+        """The whole timeline in the layout used before format_version 2"""
+        return {
+            "timestamp": self.timestamp,
+            "total_people": len(self.people),
+            "people": self.people,
+        }
@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+import timeit
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prod", "inbox"
+    )
+)
+from text_normalizer import clean_text
+
+EMAIL_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "prod",
+    "inbox",
+    "primary_emails.json",
+)
+FIELDS = ["subject", "from", "to", "date", "snippet", "body"]
+
+
+def legacy_clean_text(text):
+    """The per-call regex implementation GmailFetcher.clean_text used to have"""
+    if not text:
+        return ""
+
+    invisible_chars = (
+        "\u200B-\u200D\uFEFF"
+        "\u2000-\u200A"
+        "\u2028\u2029"
+        "\u00A0"
+    )
+
+    import re
+
+    cleaned = re.sub(f"[{invisible_chars}]", "", text)
+    cleaned = re.sub(r"\s+", " ", cleaned)
+    return cleaned.strip()
+
+
+def load_messages():
+    with open(EMAIL_FILE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        {field: message.get(field) or "" for field in FIELDS}
+        for thread in data["threads"]
+        for message in thread["messages"]
+    ]
+
+
+def run_legacy(messages):
+    return [{k: legacy_clean_text(v) for k, v in m.items()} for m in messages]
+
+
+def run_clean_text(messages):
+    return [{k: clean_text(v) for k, v in m.items()} for m in messages]
+
+
+if __name__ == "__main__":
+    messages = load_messages()
+    print(f"Benchmarking on {len(messages)} messages from {EMAIL_FILE}")
+
+    expected = run_legacy(messages)
+    assert run_clean_text(messages) == expected, "clean_text output differs"
+
+    number = 20
+    baseline = None
+    for name, func in [
+        ("legacy regex", run_legacy),
+        ("clean_text", run_clean_text),
+    ]:
+        seconds = min(timeit.repeat(lambda: func(messages), number=number, repeat=5))
+        per_message_us = seconds / number / len(messages) * 1e6
+        baseline = baseline or seconds
+        print(
+            f"{name:>14}: {per_message_us:8.2f} us/message  ({baseline / seconds:.2f}x)"
+        )
@@ -0,0 +1,86 @@
+import json
+import os
+import sys
+import timeit
+
+from dateutil import parser
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prod", "inbox"
+    )
+)
+from date_parsing import parse_datetime, to_utc
+
+INBOX_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prod", "inbox"
+)
+EMAIL_FILE = os.path.join(INBOX_DIR, "primary_emails.json")
+CALENDAR_FILE = os.path.join(INBOX_DIR, "calendar_events.json")
+
+
+def load_dates():
+    """Every Gmail Date header and Calendar start/end time in the exports"""
+    with open(EMAIL_FILE, "r", encoding="utf-8") as f:
+        emails = json.load(f)
+    with open(CALENDAR_FILE, "r", encoding="utf-8") as f:
+        calendar = json.load(f)
+
+    dates = [
+        message["date"]
+        for thread in emails["threads"]
+        for message in thread["messages"]
+        if message.get("date")
+    ]
+    for event in calendar["events"]:
+        dates.extend(d for d in (event.get("start_time"), event.get("end_time")) if d)
+    return dates
+
+
+def dateutil_parse(value):
+    try:
+        return parser.parse(value)
+    except (ValueError, OverflowError):
+        return None
+
+
+def run_dateutil(dates):
+    return [dateutil_parse(d) for d in dates]
+
+
+def run_uncached(dates):
+    return [parse_datetime.__wrapped__(d) for d in dates]
+
+
+def run_cached(dates):
+    return [parse_datetime(d) for d in dates]
+
+
+def same_instant(a, b):
+    if a is None or b is None:
+        return a is b
+    return to_utc(a) == to_utc(b)
+
+
+if __name__ == "__main__":
+    dates = load_dates()
+    print(f"Benchmarking on {len(dates)} dates ({len(set(dates))} distinct)")
+
+    mismatches = [
+        d
+        for d, a, b in zip(dates, run_dateutil(dates), run_uncached(dates))
+        if not same_instant(a, b)
+    ]
+    assert not mismatches, f"parse_datetime differs from dateutil on {mismatches[:5]}"
+
+    number = 20
+    baseline = None
+    for name, func in [
+        ("dateutil", run_dateutil),
+        ("fast path", run_uncached),
+        ("warm cache", run_cached),
+    ]:
+        seconds = min(timeit.repeat(lambda: func(dates), number=number, repeat=5))
+        per_date_us = seconds / number / len(dates) * 1e6
+        baseline = baseline or seconds
+        print(f"{name:>15}: {per_date_us:8.2f} us/date  ({baseline / seconds:.2f}x)")
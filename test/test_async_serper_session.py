@@ -0,0 +1,96 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extension.drivers.serper_web_search_driver.async_serper_web_search_driver import (
+    AsyncSerperSession,
+    AsyncSerperWebSearchDriver,
+)
+from extension.drivers.serper_web_search_driver.serper_session import (
+    SerperAuthError,
+    SerperRateLimitError,
+    SerperServerError,
+)
+
+
+def run_against(statuses, call):
+    """Run call(base_url) against a server answering with the given statuses in turn"""
+    requests = []
+
+    async def handle(request):
+        body = await request.json()
+        requests.append(body)
+        status = statuses[min(len(requests), len(statuses)) - 1]
+        if status != 200:
+            return web.json_response({"message": "nope"}, status=status)
+        data = {
+            "organic": [{"link": "https://acme.com", "title": "Acme", "snippet": ""}]
+        }
+        # A batch is answered with one response per query
+        return web.json_response([data] * len(body) if isinstance(body, list) else data)
+
+    async def main():
+        app = web.Application()
+        app.router.add_post("/search", handle)
+        async with TestServer(app) as server:
+            return await call(str(server.make_url("")).rstrip("/"))
+
+    return asyncio.run(main()), requests
+
+
+def session(base_url, **kwargs):
+    return AsyncSerperSession(
+        api_key="key", base_url=base_url, backoff_base=0, backoff_max=0, **kwargs
+    )
+
+
+def test_retries_throttling_and_server_errors():
+    async def call(base_url):
+        async with session(base_url) as serper:
+            return await serper.post("search", {"q": "acme"})
+
+    data, requests = run_against([429, 503, 200], call)
+
+    assert data["organic"][0]["link"] == "https://acme.com"
+    assert len(requests) == 3
+
+
+@pytest.mark.parametrize(
+    "statuses, error, attempts",
+    [
+        ([403], SerperAuthError, 1),
+        ([429], SerperRateLimitError, 3),
+        ([502], SerperServerError, 3),
+    ],
+)
+def test_maps_statuses_to_typed_errors(statuses, error, attempts):
+    async def call(base_url):
+        async with session(base_url, max_retries=2) as serper:
+            with pytest.raises(error):
+                await serper.post("search", {"q": "acme"})
+
+    _, requests = run_against(statuses, call)
+
+    assert len(requests) == attempts
+
+
+def test_driver_closes_its_connections_on_exit():
+    async def call(base_url):
+        driver = AsyncSerperWebSearchDriver(
+            api_key="key", async_session=session(base_url)
+        )
+        async with driver:
+            results = await driver.asearch_many(["acme", "acme"])
+            client = driver.async_session._client()[0]
+        return results, client.closed
+
+    (results, closed), requests = run_against([200], call)
+
+    assert list(results) == ["acme"]
+    assert closed
+    assert requests == [[{"q": "acme"}]]
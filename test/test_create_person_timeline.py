@@ -0,0 +1,149 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prod", "inbox"
+    )
+)
+from calendar_record import build_calendar_output
+from create_person_timeline import PersonTimelineCreator
+from domain_registry import InternalDomainRegistry
+
+
+def message(message_id, thread_id, sender, to, date, subject="Hello"):
+    return {
+        "id": message_id,
+        "thread_id": thread_id,
+        "subject": subject,
+        "from": sender,
+        "to": to,
+        "date": date,
+        "snippet": "",
+        "body": f"Body of {message_id}",
+    }
+
+
+def event(event_id, start, attendees):
+    return {
+        "id": event_id,
+        "calendar_id": "primary",
+        "summary": f"Meeting {event_id}",
+        "description": "",
+        "start_time": start,
+        "end_time": start,
+        "event_status": "past",
+        "attendees": [{"email": email, "name": ""} for email in attendees],
+    }
+
+
+EMAILS = [
+    {
+        "thread_id": "t1",
+        "messages": [
+            message(
+                "m1",
+                "t1",
+                "Jane <jane@acme.com>",
+                "me@godmodehq.com",
+                "Mon, 3 Mar 2025 10:00:00 +0000",
+            ),
+            message(
+                "m2",
+                "t1",
+                "me@godmodehq.com",
+                "jane@acme.com, bob@beta.io",
+                "Tue, 4 Mar 2025 09:00:00 +0000",
+            ),
+        ],
+    },
+    {
+        "thread_id": "t2",
+        "messages": [
+            message(
+                "m3",
+                "t2",
+                "Bob <bob@beta.io>",
+                "me@godmodehq.com",
+                "Tue, 4 Mar 2025 09:00:00 +0000",
+            ),
+        ],
+    },
+]
+# 10:30 in New York is after the 09:00 UTC email of the same day
+EVENTS = [
+    event("e1", "2025-03-04T10:30:00-05:00", ["jane@acme.com"]),
+    event("e2", "2025-03-02T08:00:00+01:00", ["carol@gamma.org"]),
+]
+
+
+@pytest.fixture
+def timeline(tmp_path):
+    creator = PersonTimelineCreator(
+        domain_registry=InternalDomainRegistry(["godmodehq.com"])
+    )
+    creator.email_file = str(tmp_path / "primary_emails.json")
+    creator.calendar_file = str(tmp_path / "calendar_events.json")
+    creator.output_file = str(tmp_path / "person_timeline.json")
+    creator.index_file = str(tmp_path / "person_index.json")
+
+    def build(threads, events, rebuild=False):
+        with open(creator.email_file, "w") as f:
+            json.dump({"threads": threads}, f)
+        with open(creator.calendar_file, "w") as f:
+            json.dump(build_calendar_output(events, {}), f)
+        data = creator.create_person_timeline(rebuild=rebuild)
+        return {key: data[key] for key in ("people", "interactions")}
+
+    return build
+
+
+def test_calendar_timestamps_sort_with_email_in_utc(timeline):
+    data = timeline(EMAILS, [EVENTS[0]])
+    jane = next(p for p in data["people"] if p["email"] == "jane@acme.com")
+
+    assert data["interactions"]["calendar:primary:e1"]["timestamp"] == (
+        "2025-03-04T15:30:00+00:00"
+    )
+    assert jane["interaction_ids"] == [
+        "calendar:primary:e1",
+        "email:m2",
+        "email:m1",
+    ]
+
+
+def test_incremental_runs_match_a_full_rebuild(timeline):
+    first = timeline(EMAILS, EVENTS)
+    assert first == timeline(EMAILS, EVENTS, rebuild=True)
+    # A run with nothing new leaves the timeline as it was
+    assert timeline(EMAILS, EVENTS) == first
+
+    # Edit a message, drop a thread and an event: Bob and Carol lose
+    # their only interactions, Jane's e1 moves to the top
+    edited = [
+        {
+            "thread_id": "t1",
+            "messages": [
+                EMAILS[0]["messages"][0],
+                {
+                    **EMAILS[0]["messages"][1],
+                    "subject": "Re: Hello",
+                    "to": "jane@acme.com",
+                },
+            ],
+        }
+    ]
+    incremental = timeline(edited, EVENTS[:1])
+
+    assert incremental == timeline(edited, EVENTS[:1], rebuild=True)
+    assert [p["email"] for p in incremental["people"]] == ["jane@acme.com"]
+    assert incremental["people"][0]["email_count"] == 2
+    assert incremental["people"][0]["event_count"] == 1
+    assert set(incremental["interactions"]) == {
+        "email:m1",
+        "email:m2",
+        "calendar:primary:e1",
+    }
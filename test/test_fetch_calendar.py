@@ -0,0 +1,114 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prod", "inbox"
+    )
+)
+import fetch_calendar
+from calendar_record import CalendarEvents
+from fetch_calendar import CalendarFetcher
+
+START = datetime(2026, 3, 2, 9, tzinfo=timezone.utc)
+
+
+class FakeCalendarApi:
+    """Calendar v3 stand-in: bounded listing for full syncs, changes for tokens"""
+
+    def __init__(self):
+        self.stored = {}
+        self.changed = set()
+        self.fail_listing = False
+
+    def add(self, event_id, start):
+        self.stored[event_id] = {
+            "id": event_id,
+            "summary": event_id,
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": (start + timedelta(hours=1)).isoformat()},
+        }
+        self.changed.add(event_id)
+
+    def calendarList(self):
+        return self
+
+    def events(self):
+        return self
+
+    def list(self, **params):
+        self.params = params
+        return self
+
+    def execute(self, http=None):
+        if "calendarId" not in self.params:
+            if self.fail_listing:
+                raise TimeoutError("calendarList timed out")
+            return {"items": [{"id": "primary", "summary": "Primary"}]}
+        if self.params.get("syncToken"):
+            items = [self.stored[event_id] for event_id in self.changed]
+        else:
+            items = [
+                event
+                for event in self.stored.values()
+                if self.params["timeMin"] <= event["start"]["dateTime"]
+                and (
+                    "timeMax" not in self.params
+                    or event["start"]["dateTime"] < self.params["timeMax"]
+                )
+            ]
+        self.changed = set()
+        return {"items": items, "nextSyncToken": "token"}
+
+
+@pytest.fixture
+def sync(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    api = FakeCalendarApi()
+    clock = {"now": START}
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock["now"]
+
+    monkeypatch.setattr(fetch_calendar, "datetime", FrozenDatetime)
+
+    def run(days_later=0):
+        clock["now"] = START + timedelta(days=days_later)
+        fetcher = CalendarFetcher(max_concurrency=1)
+        fetcher.authenticate = lambda: None
+        fetcher.get_service = lambda: api
+        fetcher.get_http = lambda: None
+        fetcher.sync_events(weeks_back=4, weeks_forward=0)
+        return [e["id"] for e in CalendarEvents.load(fetcher.output_file).events]
+
+    return api, run
+
+
+def test_future_event_appears_once_it_has_taken_place(sync):
+    api, run = sync
+    api.add("earlier", START - timedelta(days=2))
+    api.add("booked-ahead", START + timedelta(days=1))
+
+    assert run() == ["earlier"]
+    assert run(days_later=3) == ["earlier", "booked-ahead"]
+
+
+def test_failed_calendar_listing_keeps_the_store(sync):
+    api, run = sync
+    api.add("earlier", START - timedelta(days=2))
+    run()
+
+    api.fail_listing = True
+    with pytest.raises(TimeoutError):
+        run(days_later=1)
+
+    api.fail_listing = False
+    api.add("later", START + timedelta(hours=12))
+    # Still incremental: the token survived, and the stored event with it
+    assert run(days_later=1) == ["earlier", "later"]
+    assert api.params.get("syncToken") == "token"
@@ -0,0 +1,163 @@
+import base64
+import os
+import sys
+
+import httplib2
+import pytest
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prod", "inbox"
+    )
+)
+import fetch_gmail
+from fetch_gmail import GmailFetcher
+
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(fetch_gmail.time, "sleep", lambda seconds: None)
+    fetcher = GmailFetcher(batch_size=2, max_concurrency=1, max_retries=2)
+    fetcher.get_service = lambda: None
+    return fetcher
+
+
+def scripted_batches(fetcher, failures):
+    """Make execute_batch raise the given errors in turn, then succeed"""
+    failures = list(failures)
+
+    def execute_batch(service, message_ids, format="full"):
+        if failures:
+            raise failures.pop(0)
+        return {m: {"id": m} for m in message_ids}, [], {}
+
+    fetcher.execute_batch = execute_batch
+
+
+def test_dropped_connections_are_retried(fetcher):
+    scripted_batches(fetcher, [ConnectionResetError(), TimeoutError()])
+
+    messages = list(fetcher.fetch_messages(["m1", "m2", "m3"]))
+
+    assert sorted(m["id"] for m in messages) == ["m1", "m2", "m3"]
+    assert fetcher.failed_messages == {}
+
+
+def test_unreachable_gmail_fails_the_batch_not_the_fetch(fetcher):
+    scripted_batches(fetcher, [httplib2.ServerNotFoundError("no dns")] * 3)
+
+    messages = list(fetcher.fetch_messages(["m1", "m2", "m3"]))
+
+    # The first batch gives up after its retries; the second goes through
+    assert [m["id"] for m in messages] == ["m3"]
+    assert set(fetcher.failed_messages) == {"m1", "m2"}
+    assert "ServerNotFoundError" in fetcher.failed_messages["m1"]
+
+
+def make_message(message_id, thread_id, labels):
+    body = base64.urlsafe_b64encode(f"Body of {message_id}".encode()).decode()
+    return {
+        "id": message_id,
+        "threadId": thread_id,
+        "labelIds": labels,
+        "snippet": f"Snippet of {message_id}",
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": [
+                {"name": "Subject", "value": f"Subject {message_id}"},
+                {"name": "From", "value": "Jane Doe <jane@example.com>"},
+                {"name": "To", "value": "me@godmodehq.com"},
+                {"name": "Date", "value": "Mon, 3 Mar 2025 10:00:00 +0000"},
+            ],
+            "body": {"data": body},
+        },
+    }
+
+
+class FakeGmailApi:
+    """Just enough of users().getProfile / history().list for a sync"""
+
+    def __init__(self, history):
+        self.history_records = history
+        self.call = None
+
+    def users(self):
+        return self
+
+    def history(self):
+        return self
+
+    def getProfile(self, userId):
+        self.call = "profile"
+        return self
+
+    def list(self, **params):
+        self.call = "history"
+        return self
+
+    def execute(self):
+        if self.call == "profile":
+            return {"emailAddress": "me@godmodehq.com", "historyId": "200"}
+        return {"history": self.history_records, "historyId": "200"}
+
+
+def test_sync_only_downloads_messages_still_in_primary(fetcher):
+    primary = ["INBOX", "CATEGORY_PERSONAL"]
+    fetcher.store_messages(
+        [make_message("kept", "t1", primary), make_message("moved", "t2", primary)]
+    )
+    fetcher.save_sync_state("me@godmodehq.com", "100")
+
+    def entry(message_id, thread_id, labels):
+        return {
+            "message": {"id": message_id, "threadId": thread_id, "labelIds": labels}
+        }
+
+    fetcher.authenticate = lambda: None
+    fetcher.get_service = lambda: FakeGmailApi(
+        [
+            {"messagesAdded": [entry("new", "t3", primary)]},
+            {"messagesAdded": [entry("promo", "t4", ["INBOX", "CATEGORY_PROMOTIONS"])]},
+            {"labelsAdded": [entry("moved", "t2", ["INBOX", "CATEGORY_SOCIAL"])]},
+            {"labelsAdded": [entry("kept", "t1", primary + ["STARRED"])]},
+        ]
+    )
+    requested = []
+
+    def fetch_messages(message_ids, format="full"):
+        fetcher.failed_messages = {}
+        requested.extend(message_ids)
+        return [
+            make_message(m, "t3" if m == "new" else "t1", primary) for m in message_ids
+        ]
+
+    fetcher.fetch_messages = fetch_messages
+
+    fetcher.sync_primary_emails()
+
+    assert requested == ["kept", "new"]
+    threads = dict(fetcher.store.iter_threads())
+    assert set(threads) == {"t1", "t3"}
+    assert fetcher.load_sync_state()["me@godmodehq.com"]["history_id"] == "200"
+
+
+def test_metadata_refresh_keeps_bodies_and_reads_each_partition_once(
+    fetcher, monkeypatch
+):
+    primary = ["INBOX", "CATEGORY_PERSONAL"]
+    messages = [make_message(f"m{i}", f"t{i % 3}", primary) for i in range(8)]
+    fetcher.store_messages(messages)
+
+    reads = []
+    read_partition = fetcher.store.read_partition
+    monkeypatch.setattr(
+        fetcher.store,
+        "read_partition",
+        lambda partition: reads.append(partition) or read_partition(partition),
+    )
+    fetcher.store_messages(messages, include_body=False)
+
+    assert len(reads) == len(set(reads))
+    threads = dict(fetcher.store.iter_threads())
+    assert all(m["body"].startswith("Body of") for t in threads.values() for m in t)
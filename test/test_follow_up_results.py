@@ -0,0 +1,64 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prod", "inbox"
+    )
+)
+from follow_up_cache import DecisionCache, still_current
+from follow_up_results import FollowUpResultSink, completed_people, latest_results
+
+NOW = datetime(2026, 3, 10, 12, tzinfo=timezone.utc)
+
+
+def result(email, analyzed_at, last_interaction_date, **fields):
+    return {
+        "person_email": email,
+        "analyzed_at": analyzed_at,
+        "last_interaction_date": last_interaction_date,
+        **fields,
+    }
+
+
+def test_results_only_stand_within_their_age_band():
+    # Two days old at analysis, three now: crosses into the next band
+    crossed = result("a@x.com", "2026-03-09T12:00:00+00:00", "2026-03-07T10:00:00Z")
+    same_band = result("b@x.com", "2026-03-09T12:00:00+00:00", "2026-02-20T10:00:00Z")
+
+    assert not still_current(crossed, "2026-03-07T10:00:00Z", NOW)
+    assert still_current(same_band, "2026-02-20T10:00:00Z", NOW)
+    # A newer interaction since the analysis invalidates it
+    assert not still_current(same_band, "2026-03-10T09:00:00Z", NOW)
+    assert not still_current({"person_email": "c@x.com"}, None, NOW)
+
+
+def test_resume_skips_failed_and_stale_results(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    sink = FollowUpResultSink(path).open()
+    sink.append(result("a@x.com", "2026-03-09T12:00:00+00:00", "2026-02-20T10:00:00Z"))
+    sink.append({"person_email": "b@x.com", "last_interaction_date": None})
+    sink.append({"person_email": "c@x.com", "error": "timeout"})
+    sink.close()
+
+    assert "analyzed_at" in latest_results(path)["b@x.com"]
+    assert completed_people(path) == {"a@x.com", "b@x.com"}
+    assert completed_people(path, lambda r: r["person_email"] == "a@x.com") == {
+        "a@x.com"
+    }
+
+
+def test_decision_cache_saves_every_few_decisions(tmp_path):
+    path = tmp_path / "decisions.json"
+    cache = DecisionCache(str(path), save_every=3)
+
+    for i in range(2):
+        cache.put(f"k{i}", {"follow_up_needed": False})
+        cache.save_if_due()
+    assert not path.exists()
+
+    cache.put("k2", {"follow_up_needed": True})
+    cache.save_if_due()
+    assert set(DecisionCache(str(path)).load().entries) == {"k0", "k1", "k2"}
+    assert cache.unsaved == 0
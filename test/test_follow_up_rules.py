@@ -0,0 +1,83 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prod", "inbox"
+    )
+)
+from domain_registry import InternalDomainRegistry
+from follow_up_rules import prefilter_person
+
+NOW = datetime(2025, 3, 10, 12, 0, tzinfo=timezone.utc)
+REGISTRY = InternalDomainRegistry(["godmodehq.com", "troylabs.io"])
+USER_EMAILS = {"mert@godmodehq.com"}
+
+
+def email(sender, direction, timestamp, body=""):
+    return {
+        "type": "email",
+        "direction": direction,
+        "from": sender,
+        "timestamp": timestamp,
+        "body": body,
+        "thread_id": "t1",
+    }
+
+
+def person(*interactions, address="jane@example.com"):
+    return {"email": address, "name": "Jane", "interactions": list(interactions)}
+
+
+def prefilter(p):
+    return prefilter_person(p, NOW, REGISTRY, USER_EMAILS)
+
+
+def test_ambiguous_conversations_go_to_the_model():
+    p = person(
+        email("Jane <jane@example.com>", "inbound", "2025-03-01T10:00:00+00:00"),
+        email("Mert <mert@godmodehq.com>", "outbound", "2025-02-28T10:00:00+00:00"),
+    )
+    assert prefilter(p) is None
+
+
+def test_recent_email_needs_no_follow_up_yet():
+    p = person(
+        email("Mert <mert@godmodehq.com>", "outbound", "2025-03-09T18:00:00+00:00"),
+    )
+    assert prefilter(p)["rule"] == "very_recent"
+
+
+def test_inbound_only_mail_is_a_newsletter_or_never_engaged():
+    newsletter = person(
+        email("News <noreply@example.com>", "inbound", "2025-03-01T10:00:00+00:00"),
+        address="noreply@example.com",
+    )
+    cold = person(email("jane@example.com", "inbound", "2025-03-01T10:00:00+00:00"))
+    assert prefilter(newsletter)["rule"] == "newsletter"
+    assert prefilter(cold)["rule"] == "no_outbound"
+
+
+def test_colleague_run_threads_are_skipped():
+    p = person(
+        email("Ana <ana@troylabs.io>", "outbound", "2025-03-01T10:00:00+00:00"),
+    )
+    decision = prefilter(p)
+    assert decision["rule"] == "colleague_thread"
+    assert decision["follow_up_needed"] is False
+
+
+def test_declined_meeting_was_not_held():
+    meeting = {
+        "type": "calendar",
+        "timestamp": "2025-03-05T10:00:00+00:00",
+        "status": "confirmed",
+        "attendees": [
+            {"email": "jane@example.com", "response_status": "declined"},
+            {"email": "mert@godmodehq.com", "self": True},
+        ],
+    }
+    assert prefilter(person(meeting))["rule"] == "meeting_not_held"
+    meeting["attendees"][0]["response_status"] = "accepted"
+    assert prefilter(person(meeting)) is None
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prod", "inbox"
+    )
+)
+from follow_up_runner import FollowUpJob, FollowUpRunner, RateLimitedError
+
+
+def jobs(count):
+    return [FollowUpJob(key=f"p{i}", tokens=100, payload=i) for i in range(count)]
+
+
+def test_retries_rate_limited_jobs_and_reports_each_result():
+    attempts = {}
+    reported = []
+
+    def analyze(payload):
+        attempts[payload] = attempts.get(payload, 0) + 1
+        if payload == 1 and attempts[payload] < 3:
+            raise RateLimitedError(retry_after=0)
+        return {"follow_up_needed": payload == 1}
+
+    runner = FollowUpRunner(analyze, lambda job, result: reported.append(job.key))
+    results = asyncio.run(runner.run(jobs(3)))
+
+    assert attempts == {0: 1, 1: 3, 2: 1}
+    assert results["p1"] == {"follow_up_needed": True}
+    assert sorted(reported) == ["p0", "p1", "p2"]
+
+
+def test_gives_up_after_max_retries():
+    calls = []
+
+    def analyze(payload):
+        calls.append(payload)
+        raise RateLimitedError(retry_after=0)
+
+    runner = FollowUpRunner(analyze, lambda job, result: None, max_retries=2)
+    results = asyncio.run(runner.run(jobs(1)))
+
+    assert len(calls) == 3
+    assert "error" in results["p0"]
+
+
+def test_failures_are_results_not_crashes():
+    def analyze(payload):
+        raise ValueError("bad output")
+
+    runner = FollowUpRunner(analyze, lambda job, result: None)
+
+    assert asyncio.run(runner.run(jobs(1))) == {"p0": {"error": "bad output"}}
+
+
+def test_never_exceeds_concurrency():
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def analyze(payload):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return {}
+
+    runner = FollowUpRunner(analyze, lambda job, result: None, concurrency=2)
+    asyncio.run(runner.run(jobs(8)))
+
+    assert peak[0] == 2
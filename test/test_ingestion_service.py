@@ -0,0 +1,234 @@
+import asyncio
+import base64
+import json
+import os
+import sys
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.append(
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prod", "inbox"
+    )
+)
+from email_store import EmailStore
+from ingestion_service import Account, InboxIngestionService
+
+
+def make_message(message_id, thread_id, labels):
+    body = base64.urlsafe_b64encode(f"Body of {message_id}".encode()).decode()
+    return {
+        "id": message_id,
+        "threadId": thread_id,
+        "labelIds": labels,
+        "snippet": f"Snippet of {message_id}",
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": [
+                {"name": "Subject", "value": f"Subject {message_id}"},
+                {"name": "From", "value": "Jane Doe <jane@example.com>"},
+                {"name": "To", "value": "me@godmodehq.com"},
+                {"name": "Date", "value": "Mon, 3 Mar 2025 10:00:00 +0000"},
+            ],
+            "body": {"data": body},
+        },
+    }
+
+
+def make_fake_google_api(mailboxes, page_size=2, fail_once=(), drop=None):
+    """A local stand-in for the OAuth, Gmail and Calendar endpoints we call.
+
+    drop maps message ids to how many of their requests lose the connection.
+    """
+    tokens = {}
+    failed = set()
+    drop = dict(drop or {})
+
+    def account_for(request):
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if token not in tokens:
+            raise web.HTTPUnauthorized()
+        return mailboxes[tokens[token]]
+
+    def paginate(request, items, key):
+        start = int(request.query.get("pageToken", 0))
+        page = {key: items[start : start + page_size]}
+        if start + page_size < len(items):
+            page["nextPageToken"] = str(start + page_size)
+        return web.json_response(page)
+
+    async def token(request):
+        data = await request.post()
+        access_token = f"token-{data['refresh_token']}"
+        tokens[access_token] = data["refresh_token"]
+        return web.json_response({"access_token": access_token, "expires_in": 3600})
+
+    async def list_messages(request):
+        mailbox = account_for(request)
+        labels = set(request.query.getall("labelIds"))
+        ids = [
+            {"id": m["id"], "threadId": m["threadId"]}
+            for m in mailbox["messages"]
+            if labels <= set(m["labelIds"])
+        ]
+        return paginate(request, ids, "messages")
+
+    async def get_message(request):
+        mailbox = account_for(request)
+        message_id = request.match_info["message_id"]
+        if message_id in fail_once and message_id not in failed:
+            failed.add(message_id)
+            return web.json_response({"error": "rate limited"}, status=429)
+        if drop.get(message_id, 0) > 0:
+            drop[message_id] -= 1
+            request.transport.close()
+            raise ConnectionResetError()
+        message = next(m for m in mailbox["messages"] if m["id"] == message_id)
+        return web.json_response(message)
+
+    async def list_calendars(request):
+        return paginate(request, account_for(request)["calendars"], "items")
+
+    async def list_events(request):
+        events = account_for(request)["events"].get(request.match_info["calendar_id"])
+        if events is None:
+            return web.json_response({"error": "not found"}, status=404)
+        return paginate(request, events, "items")
+
+    app = web.Application()
+    app.router.add_post("/token", token)
+    app.router.add_get("/gmail/v1/users/me/messages", list_messages)
+    app.router.add_get("/gmail/v1/users/me/messages/{message_id}", get_message)
+    app.router.add_get("/calendar/v3/users/me/calendarList", list_calendars)
+    app.router.add_get("/calendar/v3/calendars/{calendar_id}/events", list_events)
+    return app
+
+
+MAILBOXES = {
+    "refresh-a": {
+        "messages": [
+            make_message("a1", "ta", ["INBOX", "CATEGORY_PERSONAL"]),
+            make_message("a2", "ta", ["SENT"]),
+            make_message("a3", "tb", ["INBOX", "CATEGORY_PERSONAL"]),
+            make_message("a4", "tc", ["INBOX", "CATEGORY_PROMOTIONS"]),
+        ],
+        "calendars": [{"id": "primary", "summary": "Work"}],
+        "events": {
+            "primary": [
+                {
+                    "id": "e1",
+                    "summary": "Intro call",
+                    "start": {"dateTime": "2025-03-01T10:00:00Z"},
+                    "end": {"dateTime": "2025-03-01T10:30:00Z"},
+                    "attendees": [{"email": "jane@example.com"}],
+                }
+            ]
+        },
+    },
+    "refresh-b": {
+        "messages": [make_message("b1", "tx", ["SENT"])],
+        "calendars": [],
+        "events": {},
+    },
+}
+
+
+def run_service(tmp_path, fail_once=(), drop=None, mailboxes=MAILBOXES):
+    async def run():
+        server = TestServer(
+            make_fake_google_api(mailboxes, fail_once=fail_once, drop=drop)
+        )
+        await server.start_server()
+        try:
+            service = InboxIngestionService(
+                [
+                    Account("alice", "refresh-a", "client", "secret"),
+                    Account("bob", "refresh-b", "client", "secret"),
+                ],
+                data_dir=str(tmp_path),
+                api_base_url=str(server.make_url("")),
+                token_url=str(server.make_url("/token")),
+                account_concurrency=2,
+                max_retries=2,
+            )
+            return await service.run()
+        finally:
+            await server.close()
+
+    return asyncio.run(run())
+
+
+def test_ingests_every_account_into_its_own_store(tmp_path):
+    summaries = {s["account_id"]: s for s in run_service(tmp_path)}
+
+    assert summaries["alice"]["messages"] == 3
+    assert summaries["alice"]["events"] == 1
+    assert summaries["bob"]["messages"] == 1
+    assert summaries["bob"]["errors"] == 0
+
+    threads = dict(EmailStore(str(tmp_path / "alice" / "emails")).iter_threads())
+    assert set(threads) == {"ta", "tb"}
+    assert {m["id"] for m in threads["ta"]} == {"a1", "a2"}
+    assert threads["tb"][0]["body"] == "Body of a3"
+
+    with open(tmp_path / "alice" / "calendar_events.json") as f:
+        assert [e["id"] for e in json.load(f)["events"]] == ["e1"]
+
+
+def test_retries_rate_limited_messages(tmp_path):
+    summaries = {s["account_id"]: s for s in run_service(tmp_path, fail_once=["a1"])}
+
+    assert summaries["alice"]["messages"] == 3
+    assert summaries["alice"]["errors"] == 0
+    assert summaries["alice"]["latency_p50_ms"] is not None
+
+
+def test_retries_dropped_connections(tmp_path):
+    summaries = {s["account_id"]: s for s in run_service(tmp_path, drop={"a1": 1})}
+
+    assert summaries["alice"]["messages"] == 3
+    assert summaries["alice"]["errors"] == 0
+
+
+def test_message_that_keeps_dropping_is_recorded_not_fatal(tmp_path):
+    summaries = {s["account_id"]: s for s in run_service(tmp_path, drop={"a1": 10})}
+
+    assert summaries["alice"]["messages"] == 2
+    assert summaries["alice"]["errors"] == 1
+    threads = dict(EmailStore(str(tmp_path / "alice" / "emails")).iter_threads())
+    assert {m["id"] for m in threads["ta"]} == {"a2"}
+
+
+def test_calendar_ids_are_escaped_and_failures_isolated(tmp_path):
+    holiday = "en.usa#holiday@group.v.calendar.google.com"
+    alice = MAILBOXES["refresh-a"]
+    mailboxes = {
+        **MAILBOXES,
+        "refresh-a": {
+            **alice,
+            "calendars": alice["calendars"]
+            + [
+                {"id": holiday, "summary": "Holidays"},
+                {"id": "gone@group.calendar.google.com", "summary": "Old team"},
+            ],
+            "events": {
+                **alice["events"],
+                holiday: [
+                    {
+                        "id": "h1",
+                        "summary": "Holiday",
+                        "start": {"date": "2025-03-03"},
+                        "end": {"date": "2025-03-04"},
+                    }
+                ],
+            },
+        },
+    }
+
+    summaries = {s["account_id"]: s for s in run_service(tmp_path, mailboxes=mailboxes)}
+
+    assert summaries["alice"]["events"] == 2
+    assert summaries["alice"]["errors"] == 1
+    with open(tmp_path / "alice" / "calendar_events.json") as f:
+        assert {e["id"] for e in json.load(f)["events"]} == {"e1", "h1"}
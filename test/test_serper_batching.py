@@ -0,0 +1,68 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extension.drivers.serper_web_search_driver.serper_cache import SerperResultCache
+from extension.drivers.serper_web_search_driver.serper_session import SerperError
+from extension.drivers.serper_web_search_driver.serper_web_search_driver import (
+    SerperWebSearchDriver,
+)
+
+
+def organic(query):
+    return {
+        "organic": [
+            {"link": f"https://example.com/{query}", "title": query, "snippet": ""}
+        ]
+    }
+
+
+class StubSession:
+    """Answers each batch with one response per query unless told otherwise"""
+
+    def __init__(self, answer=None):
+        self.answer = answer
+        self.batches = []
+
+    def post(self, endpoint, payload):
+        self.batches.append([item["q"] for item in payload])
+        if self.answer is not None:
+            return self.answer
+        return [organic(item["q"]) for item in payload]
+
+
+def driver(session, **kwargs):
+    return SerperWebSearchDriver(api_key="key", session=session, **kwargs)
+
+
+def test_search_many_maps_responses_back_to_queries():
+    session = StubSession()
+
+    results = driver(session, batch_size=2).search_many(["a", "b", "a", "c"])
+
+    assert session.batches == [["a", "b"], ["c"]]
+    assert list(results) == ["a", "b", "c"]
+    assert [r[0]["url"] for r in results.values()] == [
+        "https://example.com/a",
+        "https://example.com/b",
+        "https://example.com/c",
+    ]
+
+
+def test_search_many_only_sends_uncached_queries():
+    session = StubSession()
+    search = driver(session, cache=SerperResultCache())
+    search.search_many(["a", "b"])
+
+    results = search.search_many(["b", "c"])
+
+    assert session.batches == [["a", "b"], ["c"]]
+    assert results["b"][0]["url"] == "https://example.com/b"
+
+
+@pytest.mark.parametrize("answer", [{"message": "bad request"}, [organic("a")]])
+def test_search_many_rejects_malformed_batch_answers(answer):
+    with pytest.raises(SerperError):
+        driver(StubSession(answer)).search_many(["a", "b"])
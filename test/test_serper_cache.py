@@ -0,0 +1,72 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extension.drivers.serper_web_search_driver.serper_cache import (
+    DAY,
+    HOUR,
+    MemoryCacheBackend,
+    SerperResultCache,
+    SqliteCacheBackend,
+    cache_key,
+    ttl_for,
+)
+
+
+def test_ttl_by_type_capped_by_date_range():
+    assert ttl_for("news") == 2 * HOUR
+    assert ttl_for("places") == 30 * DAY
+    assert ttl_for("unknown") == DAY
+    assert ttl_for("places", "d") == HOUR
+    # A wide date range never makes a fast-moving type live longer
+    assert ttl_for("news", "y") == 2 * HOUR
+
+
+def test_cache_key_ignores_query_case_and_spacing():
+    assert cache_key("search", {"q": "Acme  Funding"}) == cache_key(
+        "search", {"q": "acme funding", "num": 10}
+    )
+    assert cache_key("search", {"q": "acme"}) != cache_key("news", {"q": "acme"})
+
+
+def test_expired_entries_miss(tmp_path):
+    memory = MemoryCacheBackend()
+    disk = SqliteCacheBackend(path=str(tmp_path / "results.sqlite3"))
+    cache = SerperResultCache(backends=[memory, disk])
+
+    cache.set("key", [{"url": "https://acme.com"}], ttl=-1)
+
+    assert cache.get("key") is None
+    assert cache.metrics.misses == 1
+
+
+def test_disk_hits_are_promoted_to_memory(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    SerperResultCache(backends=[SqliteCacheBackend(path=path)]).set(
+        "key", [{"url": "https://acme.com"}], ttl=HOUR
+    )
+
+    memory = MemoryCacheBackend()
+    cache = SerperResultCache(backends=[memory, SqliteCacheBackend(path=path)])
+
+    assert cache.get("key") == [{"url": "https://acme.com"}]
+    assert memory.get("key") is not None
+    assert cache.get("key") == [{"url": "https://acme.com"}]
+    assert cache.metrics.tier_hits == {
+        "SqliteCacheBackend": 1,
+        "MemoryCacheBackend": 1,
+    }
+    assert cache.blocking
+
+
+def test_memory_backend_evicts_least_recently_used():
+    memory = MemoryCacheBackend(max_entries=2)
+    cache = SerperResultCache(backends=[memory])
+    cache.set("a", [1], ttl=HOUR)
+    cache.set("b", [2], ttl=HOUR)
+    cache.get("a")
+    cache.set("c", [3], ttl=HOUR)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [1]
+    assert not cache.blocking
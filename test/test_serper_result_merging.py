@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extension.drivers.serper_web_search_driver.serper_result_merging import (
+    canonicalize_url,
+    group_by_domain,
+    merge_results,
+)
+
+
+def test_canonicalize_url_collapses_mirrors_and_tracking():
+    variants = [
+        "https://www.example.com/news/launch/?utm_source=x&id=7#top",
+        "http://m.Example.com/news/launch?id=7&fbclid=abc",
+        "https://example.com/news/launch/amp/?id=7",
+    ]
+    assert {canonicalize_url(url) for url in variants} == {
+        "https://example.com/news/launch?id=7"
+    }
+    assert canonicalize_url("https://example.com/a?id=1") != canonicalize_url(
+        "https://example.com/a?id=2"
+    )
+
+
+def test_canonicalize_url_keeps_prefixes_that_are_the_domain():
+    assert canonicalize_url("https://amp.dev/documentation") == (
+        "https://amp.dev/documentation"
+    )
+    assert canonicalize_url("https://m.com/x") == "https://m.com/x"
+    assert canonicalize_url("https://www.bbc.co.uk/news") == "https://bbc.co.uk/news"
+
+
+def test_merge_results_keeps_best_position_and_queries():
+    merged = merge_results(
+        {
+            "acme funding": [
+                {"url": "https://acme.com/post?utm_campaign=x", "position": 4},
+                {"url": "https://news.bbc.co.uk/acme", "position": 5},
+            ],
+            "acme series b": [{"url": "https://www.acme.com/post/", "position": 1}],
+        }
+    )
+
+    assert len(merged) == 2
+    assert merged[0]["url"] == "https://acme.com/post"
+    assert merged[0]["position"] == 1
+    assert merged[0]["queries"] == ["acme funding", "acme series b"]
+    assert list(group_by_domain(merged)) == ["acme.com", "bbc.co.uk"]
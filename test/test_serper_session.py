@@ -0,0 +1,94 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from extension.drivers.serper_web_search_driver import serper_session
+from extension.drivers.serper_web_search_driver.serper_session import (
+    SerperAuthError,
+    SerperConnectionError,
+    SerperError,
+    SerperRateLimitError,
+    SerperServerError,
+    SerperSession,
+    backoff_delay,
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.reason = "reason"
+        self.headers = headers or {}
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakeTransport:
+    """Stands in for the pooled requests session, answering from a script"""
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        answer = self.answers[min(self.calls, len(self.answers) - 1)]
+        self.calls += 1
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    def install(*answers):
+        fake = FakeTransport(answers)
+        monkeypatch.setattr(serper_session, "get_session", lambda: fake)
+        return fake
+
+    return install
+
+
+def session():
+    return SerperSession(api_key="key", max_retries=2, backoff_base=0, backoff_max=0)
+
+
+def test_retries_until_serper_answers(transport):
+    fake = transport(
+        FakeResponse(429),
+        requests.ConnectionError("reset"),
+        FakeResponse(200, {"organic": []}),
+    )
+
+    assert session().post("search", {"q": "acme"}) == {"organic": []}
+    assert fake.calls == 3
+
+
+@pytest.mark.parametrize(
+    "answer, error, calls",
+    [
+        (FakeResponse(401), SerperAuthError, 1),
+        (FakeResponse(400), SerperError, 1),
+        (FakeResponse(429, headers={"Retry-After": "0"}), SerperRateLimitError, 3),
+        (FakeResponse(503), SerperServerError, 3),
+        (requests.ConnectionError("reset"), SerperConnectionError, 3),
+    ],
+)
+def test_maps_failures_to_typed_errors(transport, answer, error, calls):
+    fake = transport(answer)
+
+    with pytest.raises(error) as raised:
+        session().post("search", {"q": "acme"})
+
+    assert type(raised.value) is error
+    assert fake.calls == calls
+
+
+def test_backoff_delay_honours_retry_after_up_to_the_cap():
+    assert backoff_delay(0, 0.5, 20.0, retry_after=3) == 3
+    assert backoff_delay(0, 0.5, 20.0, retry_after=120) == 20.0
+    assert 0 <= backoff_delay(10, 0.5, 20.0) <= 20.0